@@ -0,0 +1,22 @@
+# analytics.py
+import numpy as np
+import pandas as pd
+
+def rollup_frame(rows) -> pd.DataFrame:
+    """
+    period x mood count table from db.get_mood_rollup rows
+    (empty DataFrame when the user has no history).
+
+    One pass over the rows: the period strings are parsed as one
+    datetime64 array and the counts are scattered straight into the
+    table, instead of going through DataFrame.pivot.
+    """
+    if not rows:
+        return pd.DataFrame(columns=["period", "mood", "n"])
+    period, mood, n = zip(*rows)
+    periods, pi = np.unique(np.array(period, dtype="datetime64[D]"), return_inverse=True)
+    moods, mi = np.unique(np.array(mood), return_inverse=True)
+    counts = np.zeros((len(periods), len(moods)), dtype=np.int64)
+    counts[pi, mi] = n
+    return pd.DataFrame(counts, index=pd.DatetimeIndex(periods.astype("datetime64[ns]"), name="period"),
+                        columns=pd.Index(moods.astype(object), name="mood"))
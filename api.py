@@ -0,0 +1,307 @@
+# api.py
+"""
+Headless HTTP API for the recommendation flow (ASGI: Starlette + uvicorn).
+
+Workers are stateless: auth is an HMAC-signed bearer token (API_SECRET) and
+all state lives in the database, so any number of worker processes can sit
+behind a load balancer.
+
+    POST /token          {"username", "password"}            -> {"token", "expires_in"}
+    POST /recommend      {"text", "energy"} or {"mood", "cursor", "vector"} -> playlist page
+    GET  /history?limit=N                                      -> streamed JSON array
+    POST /events         {"song_id", "kind": "play"|"skip"|"like"}  (feeds the ranker)
+    GET  /search?q=...&mood=&limit=                            -> matching library songs
+    POST /songs:bulk     CSV body (text/csv) or JSON [{title, artist, mood, url, valence, arousal}]
+    GET  /healthz
+    GET  /metrics[?format=json]  (Bearer $METRICS_TOKEN)       -> Prometheus text (or JSON) span metrics
+
+    API_SECRET=... python api.py [--host 0.0.0.0] [--port 8000] [--workers 4] [--db app.db]
+
+History rows are committed before /recommend returns (DB_WRITE_MODE=sync),
+so /history on any worker sees them; DB_WRITE_MODE=batched trades that for
+write throughput (see db.WRITE_MODE).
+
+Behind a reverse proxy, set TRUSTED_PROXIES to its address(es) so the login
+throttle sees client IPs from X-Forwarded-For; otherwise the header is ignored.
+"""
+import argparse
+import contextlib
+import json
+import os
+import secrets
+import tempfile
+import time
+from pathlib import Path
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+import archive
+import auth
+import db
+import metrics
+import service
+from importer import import_csv
+from moodspace import mood_for_vector
+
+MAX_HISTORY = 100_000
+STREAM_BATCH = 1000
+MAX_BULK_BYTES = 512 * 1024 * 1024
+# bearer token for /metrics (SQL text, span names); unset means the endpoint is off
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+# comma-separated addresses of reverse proxies whose X-Forwarded-For is believed
+TRUSTED_PROXIES = frozenset(p.strip() for p in os.getenv("TRUSTED_PROXIES", "").split(",") if p.strip())
+
+if os.getenv("APP_DB"):
+    db.DB_PATH = Path(os.environ["APP_DB"])
+# a request's history row may be read back by another worker (and a killed worker
+# would lose its queue), so commit per insert unless DB_WRITE_MODE says otherwise
+db.WRITE_MODE = os.getenv("DB_WRITE_MODE", "sync")
+
+def _error(status, message):
+    return JSONResponse({"error": message}, status_code=status)
+
+def _user_id(request: Request):
+    header = request.headers.get("authorization", "")
+    if not header.lower().startswith("bearer "):
+        return None
+    return auth.verify_token(header[7:].strip())
+
+def _client_ip(request: Request):
+    """The peer address, or behind a TRUSTED_PROXIES hop the last X-Forwarded-For entry it did not add."""
+    peer = request.client.host if request.client else None
+    fwd = request.headers.get("x-forwarded-for")
+    if not fwd or peer not in TRUSTED_PROXIES:
+        return peer  # anyone can send the header; only a known proxy's copy is believed
+    hops = [h.strip() for h in fwd.split(",") if h.strip()]
+    return next((h for h in reversed(hops) if h not in TRUSTED_PROXIES), hops[0] if hops else peer)
+
+async def _json_body(request: Request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+def _too_large(request: Request, limit):
+    """True when the declared Content-Length alone is over `limit` (the body is still counted as it streams)."""
+    declared = request.headers.get("content-length", "")
+    return declared.isdigit() and int(declared) > limit
+
+async def token(request: Request):
+    body = await _json_body(request)
+    if not (isinstance(body, dict) and isinstance(body.get("username"), str) and body["username"]
+            and isinstance(body.get("password"), str) and body["password"]):
+        return _error(400, "username and password are required (strings)")
+    ok, data = await run_in_threadpool(auth.login, body["username"], body["password"], _client_ip(request))
+    if not ok:
+        return _error(401, data)
+    return JSONResponse({"token": auth.issue_token(data["id"]), "expires_in": auth.TOKEN_TTL_S})
+
+async def recommend(request: Request):
+    user_id = _user_id(request)
+    if user_id is None:
+        return _error(401, "missing or invalid token")
+    body = await _json_body(request)
+    if not isinstance(body, dict):
+        return _error(400, "JSON object expected")
+    energy = body.get("energy", "Auto")
+    if energy not in service.ENERGY_LEVELS:
+        return _error(400, f"energy must be one of {list(service.ENERGY_LEVELS)}")
+    try:
+        limit = max(1, min(int(body.get("limit", service.PAGE_SIZE)), 200))
+        page = await run_in_threadpool(service.recommend_for_user, user_id, str(body.get("text") or ""),
+                                       energy, body.get("mood"), body.get("cursor"), limit, body.get("vector"))
+    except (TypeError, ValueError) as e:
+        return _error(400, str(e))
+    return JSONResponse({k: page[k] for k in ("mood", "vector", "next_cursor", "tracks", "latency_ms", "timed_out",
+                                              "errors")})
+
+async def history(request: Request):
+    user_id = _user_id(request)
+    if user_id is None:
+        return _error(401, "missing or invalid token")
+    try:
+        limit = max(0, min(int(request.query_params.get("limit", 1000)), MAX_HISTORY))
+    except ValueError:
+        return _error(400, "limit must be an integer")
+
+    async def rows():
+        it = archive.iter_mood_history(user_id, limit=limit, batch=STREAM_BATCH)  # hot rows, then archived
+        first = True
+        yield "["
+        while True:
+            batch = await run_in_threadpool(lambda: [r for _, r in zip(range(STREAM_BATCH), it)])
+            if not batch:
+                break
+            parts = [json.dumps({"detected_mood": r["detected_mood"], "created_at": r["created_at"]})
+                     for r in batch]
+            yield ("" if first else ",") + ",".join(parts)
+            first = False
+        yield "]"
+
+    return StreamingResponse(rows(), media_type="application/json")
+
+async def events(request: Request):
+    user_id = _user_id(request)
+    if user_id is None:
+        return _error(401, "missing or invalid token")
+    body = await _json_body(request)
+    if not isinstance(body, dict) or not isinstance(body.get("song_id"), int):
+        return _error(400, "song_id (integer) and kind are required")
+    try:
+        await run_in_threadpool(db.record_event, user_id, body["song_id"], body.get("kind"))
+    except ValueError as e:
+        return _error(400, str(e))
+    return JSONResponse({"ok": True}, status_code=201)
+
+async def search(request: Request):
+    if _user_id(request) is None:
+        return _error(401, "missing or invalid token")
+    try:
+        limit = max(1, min(int(request.query_params.get("limit", 20)), 100))
+    except ValueError:
+        return _error(400, "limit must be an integer")
+    rows = await run_in_threadpool(db.search_songs, request.query_params.get("q", ""), limit,
+                                   request.query_params.get("mood") or None)
+    return JSONResponse([{k: r[k] for k in ("id", "title", "artist", "mood", "url")} for r in rows])
+
+def _song_row(s):
+    """bulk_add_songs row from one JSON song; TypeError / KeyError for wrong field types."""
+    def number(v):
+        if v is not None and (isinstance(v, bool) or not isinstance(v, (int, float))):
+            raise TypeError("valence/arousal must be numbers")
+        return v
+    if not isinstance(s, dict):
+        raise TypeError("song must be an object")
+    title, artist, mood, url = s["title"], s["artist"], s.get("mood"), s.get("url")
+    if not (isinstance(title, str) and isinstance(artist, str) and isinstance(mood, (str, type(None)))
+            and isinstance(url, (str, type(None)))):
+        raise TypeError("title, artist, mood and url must be strings")
+    valence, arousal = number(s.get("valence")), number(s.get("arousal"))
+    return title, artist, mood or mood_for_vector((s["valence"], s["arousal"])), url, valence, arousal
+
+async def songs_bulk(request: Request):
+    if _user_id(request) is None:
+        return _error(401, "missing or invalid token")
+    if _too_large(request, MAX_BULK_BYTES):
+        return _error(413, "upload too large")
+    ctype = request.headers.get("content-type", "")
+    if ctype.startswith("application/json"):
+        raw, size = bytearray(), 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > MAX_BULK_BYTES:
+                return _error(413, "upload too large")
+            raw += chunk
+        try:
+            body = json.loads(raw)
+        except ValueError:
+            body = None
+        if not isinstance(body, list):
+            return _error(400, "JSON array of songs expected")
+        try:
+            rows = [_song_row(s) for s in body]
+        except (KeyError, TypeError, ValueError):
+            return _error(400, "each song needs text title and artist, a mood or valence/arousal, "
+                               "and an optional text url")
+        bad = [r for r in rows if db.normalize_mood(r[2]) not in db.MOODS
+               or any(v is not None and not -1 <= v <= 1 for v in r[4:])]
+        if bad:
+            return _error(400, f"{len(bad)} songs have an unknown mood or an out-of-range vector")
+        inserted = await run_in_threadpool(db.bulk_add_songs, rows)
+        return JSONResponse({"rows": len(rows), "inserted": inserted, "duplicates": len(rows) - inserted})
+
+    # CSV: spool the streamed body to disk, then import it chunk by chunk
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as buf:
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > MAX_BULK_BYTES:
+                return _error(413, "upload too large")
+            buf.write(chunk)
+        buf.seek(0)
+        try:
+            stats = await run_in_threadpool(import_csv, buf)
+        except ValueError as e:
+            return _error(400, str(e))
+    return JSONResponse(stats)
+
+async def healthz(request: Request):
+    return JSONResponse({"ok": True, "schema_version": db.SCHEMA_VERSION})
+
+async def metrics_endpoint(request: Request):
+    if not METRICS_TOKEN:
+        return _error(404, "metrics are disabled; set METRICS_TOKEN to enable them")
+    header = request.headers.get("authorization", "")
+    if not (header.lower().startswith("bearer ")
+            and secrets.compare_digest(header[7:].strip().encode(), METRICS_TOKEN.encode())):
+        return _error(401, "missing or invalid metrics token")
+    if request.query_params.get("format") == "json":
+        return Response(metrics.to_json(), media_type="application/json")
+    return PlainTextResponse(metrics.to_prometheus(), media_type="text/plain; version=0.0.4")
+
+routes = [
+    Route("/token", token, methods=["POST"]),
+    Route("/recommend", recommend, methods=["POST"]),
+    Route("/history", history, methods=["GET"]),
+    Route("/events", events, methods=["POST"]),
+    Route("/search", search, methods=["GET"]),
+    Route("/songs:bulk", songs_bulk, methods=["POST"]),
+    Route("/healthz", healthz, methods=["GET"]),
+    Route("/metrics", metrics_endpoint, methods=["GET"]),
+]
+_PATHS = {r.path for r in routes}
+
+class RequestTimer:
+    """ASGI middleware: one "api METHOD /path" span per request, until the response is sent."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not metrics.ENABLED:
+            return await self.app(scope, receive, send)
+        t0, status = time.perf_counter(), [500]
+
+        async def send_and_note(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+        try:
+            await self.app(scope, receive, send_and_note)
+        finally:
+            path = scope["path"] if scope["path"] in _PATHS else "other"  # keep label cardinality bounded
+            metrics.observe(f"api {scope['method']} {path}", time.perf_counter() - t0, error=status[0] >= 500)
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    db.init_db()
+    yield
+    db.close_writers()  # commit queued history rows while the pool is still open
+    db.close_pool()
+
+app = Starlette(routes=routes, lifespan=lifespan, middleware=[Middleware(RequestTimer)])
+
+def main():
+    import uvicorn
+    ap = argparse.ArgumentParser(description="Run the recommendation HTTP API.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--db", help="SQLite file (default: app.db, or $APP_DB)")
+    args = ap.parse_args()
+    if args.db:
+        os.environ["APP_DB"] = args.db  # read again by each worker on import
+    if not os.getenv("API_SECRET"):
+        # workers inherit the environment, so they all share this one; set API_SECRET
+        # yourself when running several hosts behind a load balancer
+        os.environ["API_SECRET"] = secrets.token_hex(32)
+        print("API_SECRET not set; generated a secret for this run (tokens die on restart).")
+    uvicorn.run("api:app", host=args.host, port=args.port, workers=args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,30 @@
 # app.py
 import os
 import io
-import pandas as pd
-import matplotlib.pyplot as plt
 import streamlit as st
 
-from db import init_db, fetch_songs_by_mood, insert_mood, bulk_add_songs, delete_all_songs
-from db import add_song, get_mood_history
+# pandas, matplotlib, the importer and the recommender stack (NumPy, VADER) are
+# imported where they are first needed, so the login screen paints without them
+from db import init_db_once, bulk_add_songs, delete_all_songs, MOODS
+from db import add_song, new_playlist_cursor, library_version, latest_history_id, rollups_version
+from db import search_songs, record_event, latest_event_id
 from auth import signup, login
-from mood import detect_mood
-from voice import transcribe_audio
-from providers_spotify import search_tracks_by_mood
-from providers_youtube import tracks_from_db_rows, youtube_search_link
+from voice import submit_transcription, get_transcription
+from providers_youtube import youtube_search_link
+from cache import cached, playlist_cache, chart_cache
+from metrics import span
 
 st.set_page_config(page_title="Mood Music Pro", page_icon="🎧", layout="wide")
 
-# ---------- Init DB once ----------
-init_db()
+@st.fragment(run_every=1.0)
+def wait_for_transcription(job_id):
+    job = get_transcription(job_id)
+    if job is None or job["status"] in ("done", "failed"):
+        st.rerun()
+    st.info("Transcribing audio… you can keep using the page.")
+
+# ---------- Init DB once (per process, not per rerun) ----------
+init_db_once()
 
 # ---------- Session State ----------
 if "user" not in st.session_state:
@@ -33,7 +41,7 @@ with st.sidebar:
             u = st.text_input("Username", key="login_user")
             p = st.text_input("Password", type="password", key="login_pass")
             if st.button("Login"):
-                ok, data = login(u, p)
+                ok, data = login(u, p, ip=st.context.ip_address)
                 if ok:
                     st.session_state.user = data["id"]
                     st.session_state.username = data["username"]
@@ -44,7 +52,7 @@ with st.sidebar:
             u2 = st.text_input("New username", key="su_user")
             p2 = st.text_input("New password", type="password", key="su_pass")
             if st.button("Create account"):
-                ok, msg = signup(u2, p2)
+                ok, msg = signup(u2, p2, ip=st.context.ip_address)
                 if ok:
                     st.success(msg)
                 else:
@@ -62,6 +70,8 @@ if st.session_state.user is None:
     st.info("Please log in or sign up to continue.")
     st.stop()
 
+from service import detect_user_mood, playlist, ENERGY_LEVELS
+
 # ---------- Input: text or voice ----------
 colA, colB = st.columns([2,1])
 with colA:
@@ -69,52 +79,75 @@ with colA:
     user_text = st.text_input("Type here:", placeholder="e.g., I'm feeling pumped for my workout!")
     upl = st.file_uploader("…or upload a short voice note (mp3/wav/m4a)", type=["mp3","wav","m4a"])
     if upl is not None and not user_text.strip():
-        with st.spinner("Transcribing audio…"):
-            text_from_audio = transcribe_audio(upl.read(), upl.name)
-        if text_from_audio:
-            st.success(f"Transcribed: “{text_from_audio}”")
-            user_text = text_from_audio
+        # transcribed in the background; identical uploads reuse the same job
+        job_id = submit_transcription(upl.getvalue(), upl.name)
+        job = get_transcription(job_id) or {"status": "pending"}
+        if job["status"] in ("pending", "running"):
+            wait_for_transcription(job_id)
+        elif job["text"]:
+            st.success(f"Transcribed: “{job['text']}”")
+            user_text = job["text"]
         else:
             st.warning("Couldn’t transcribe this audio. Try a clearer clip or type your mood.")
 with colB:
-    energy = st.selectbox("Energy tweak", ["Auto","Relax","Moderate","Hype"])
+    energy = st.selectbox("Energy tweak", list(ENERGY_LEVELS))
 
 # ---------- Detect mood ----------
 if st.button("Generate Playlist", use_container_width=True):
-    mood = detect_mood(user_text)
-    # small manual tweak
-    if energy == "Relax" and mood in {"energetic","happy"}:
-        mood = "calm" if mood == "energetic" else "neutral"
-    if energy == "Hype" and mood in {"neutral","calm"}:
-        mood = "energetic"
-
-    insert_mood(st.session_state.user, user_text, mood)
+    mood, vector = detect_user_mood(st.session_state.user, user_text, energy)
     st.session_state["last_mood"] = mood
+    st.session_state["last_vector"] = vector
+    # random starting point, kept stable across reruns until the next Generate
+    st.session_state["playlist_cursor"] = new_playlist_cursor(mood)
 
 if "last_mood" in st.session_state:
     mood = st.session_state["last_mood"]
     st.success(f"Detected mood: **{mood}**")
 
-    # ---------- Tracks from DB ----------
-    db_rows = fetch_songs_by_mood(mood, limit=50)
-    db_tracks = tracks_from_db_rows(db_rows)
-
-    # ---------- Optional Spotify ----------
-    sp_tracks = search_tracks_by_mood(mood, limit=10)
+    # ---------- Library + Spotify (+ YouTube) in parallel ----------
+    cursor = st.session_state.get("playlist_cursor")
+    user = st.session_state.user
+    vector = st.session_state.get("last_vector")
+    rec = cached(st.session_state, "_playlist", playlist_cache,
+                 (mood, vector, energy, user, library_version(), latest_event_id(user), cursor),
+                 lambda: playlist(mood, cursor=cursor, user_id=user, vector=vector),
+                 store_if=lambda r: not r["timed_out"] and not r["errors"])  # retry partial results
+    for_you = rec["by_provider"].get("for_you", [])
+    nearby = rec["by_provider"].get("nearby", [])
+    db_tracks = rec["by_provider"].get("library", [])
+    next_cursor = rec["next_cursor"]
+    sp_tracks = rec["by_provider"].get("spotify", [])
 
     # ---------- Fallback to YouTube search if empty ----------
     results = db_tracks[:]
-    if not results and not sp_tracks:
+    if not results and not for_you and not nearby and not sp_tracks:
         # show some ready search links (works without keys)
         st.info("No local songs found. Showing YouTube search results instead.")
         st.markdown(f"[Open YouTube for **{mood}**]( {youtube_search_link(mood + ' music playlist')} )")
 
     # ---------- UI: Show tracks ----------
-    # ---------- UI: Show tracks ----------
+    if for_you:
+        st.subheader("✨ Picked for you")
+        for t in for_you:
+            c_link, c_like, c_skip = st.columns([8, 1, 1])
+            c_link.markdown(f"- [{t['title']} — {t['artist']}]({t['url']})")
+            if c_like.button("👍", key=f"like_{t['id']}", help="More like this"):
+                record_event(user, t["id"], "like")
+                st.rerun()
+            if c_skip.button("⏭", key=f"skip_{t['id']}", help="Not now"):
+                record_event(user, t["id"], "skip")
+                st.rerun()
+    if nearby:
+        st.subheader("🎯 Closest to how you feel")
+        for t in nearby:
+            st.markdown(f"- [{t['title']} — {t['artist']}]({t['url']})")
     if results:
         st.subheader("🎵 From your Library")
         for t in results:
             st.markdown(f"- [{t['title']} — {t['artist']}]({t['url']})")
+        if next_cursor and st.button("More like this"):
+            st.session_state["playlist_cursor"] = next_cursor
+            st.rerun()
     if sp_tracks:
         st.subheader("🟢 Spotify suggestions")
         for t in sp_tracks:
@@ -124,6 +157,18 @@ if "last_mood" in st.session_state:
             st.markdown(line)
 
 
+# ---------- Library search ----------
+st.divider()
+query = st.text_input("🔎 Search your library", placeholder="title or artist, e.g. upt funk")
+if query.strip():
+    found = search_songs(query, limit=25)
+    if found:
+        import pandas as pd
+        st.dataframe(pd.DataFrame([dict(r) for r in found])[["title", "artist", "mood", "url"]],
+                     hide_index=True, width="stretch")
+    else:
+        st.caption("No matching songs.")
+
 # ---------- Admin / Data entry ----------
 st.divider()
 st.subheader("📥 Add songs to your Library")
@@ -176,61 +221,54 @@ with cA:
     with st.form("manual_add"):
         t = st.text_input("Title")
         a = st.text_input("Artist")
-        m = st.selectbox("Mood", ["happy","sad","neutral","calm","energetic"])
+        m = st.selectbox("Mood", list(MOODS))
         u = st.text_input("URL (YouTube/Spotify, optional)")
         if st.form_submit_button("Add song"):
             if t and a and m:
-                add_song(t, a, m, u if u else None)
-                st.success("Song added.")
+                if add_song(t, a, m, u if u else None):
+                    st.success("Song added.")
+                else:
+                    st.info("That song is already in your library.")
 
 with cB:
     st.write("Upload CSV: columns = title,artist,mood,url")
     csv = st.file_uploader("Choose CSV", type=["csv"], key="csv_up")
-    if csv is not None:
+    if csv is not None and st.button("Import CSV"):
+        bar = st.progress(0.0, text="Importing…")
+        total = max(csv.size, 1)
         try:
-            df = pd.read_csv(csv)
-            need_cols = {"title","artist","mood"}
-            if not need_cols.issubset(set(map(str.lower, df.columns))):
-                st.error("CSV must have columns: title, artist, mood [, url]")
-            else:
-                # Normalize columns
-                cols = {c.lower(): c for c in df.columns}
-                rows = []
-                for _, r in df.iterrows():
-                    title = r[cols["title"]]
-                    artist = r[cols["artist"]]
-                    mood = str(r[cols["mood"]]).lower()
-                    url = r[cols["url"]] if "url" in cols else None
-                    rows.append((title, artist, mood, url))
-                bulk_add_songs(rows)
-                st.success(f"Imported {len(rows)} songs.")
+            from importer import import_csv
+            stats = import_csv(csv, progress=lambda s: bar.progress(min(csv.tell() / total, 1.0),
+                                                                    text=f"{s['rows']} rows read…"))
+            bar.progress(1.0, text="Done")
+            st.success(f"Imported {stats['inserted']} songs "
+                       f"({stats['duplicates']} duplicates skipped, {stats['invalid']} invalid rows).")
         except Exception as e:
             st.error(f"CSV error: {e}")
 
 # ---------- Analytics ----------
 st.divider()
 st.subheader("📊 Mood analytics")
-hist = get_mood_history(st.session_state.user, limit=5000)
-if hist:
-    df = pd.DataFrame([{"mood": r["detected_mood"], "created_at": pd.to_datetime(r["created_at"])} for r in hist])
-    # weekly
-    df["week"] = df["created_at"].dt.to_period("W").dt.start_time
-    df["month"] = df["created_at"].dt.to_period("M").dt.start_time
-
+history_id = latest_history_id(st.session_state.user)
+mood_charts = {}
+if history_id:  # pandas/matplotlib are only loaded once a chart has to be rendered
+    import charts
+    rollups = rollups_version()
+    for gran in ("W", "M"):
+        # rendered once per new history row or rollup rewrite (reclassify, rebuild);
+        # other reruns reuse the PNG / Vega-Lite spec
+        with span("ui.analytics.charts"):
+            mood_charts[gran] = cached(st.session_state, f"_chart_{gran}", chart_cache,
+                                       (st.session_state.user, history_id, rollups, gran, charts.RENDERER),
+                                       lambda: charts.mood_chart(st.session_state.user, gran))
+if mood_charts.get("W") is not None:
     col1, col2 = st.columns(2)
     with col1:
         st.markdown("**Weekly mood counts**")
-        weekly = df.groupby(["week","mood"]).size().unstack(fill_value=0)
-        fig1, ax1 = plt.subplots()
-        weekly.plot(kind="bar", ax=ax1)
-        ax1.set_ylabel("Count")
-        st.pyplot(fig1)
+        charts.show(mood_charts["W"])
     with col2:
         st.markdown("**Monthly mood counts**")
-        monthly = df.groupby(["month","mood"]).size().unstack(fill_value=0)
-        fig2, ax2 = plt.subplots()
-        monthly.plot(kind="bar", ax=ax2)
-        ax2.set_ylabel("Count")
-        st.pyplot(fig2)
+        if mood_charts["M"] is not None:
+            charts.show(mood_charts["M"])
 else:
     st.info("No mood history yet. Generate a playlist to start building analytics.")
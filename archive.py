@@ -0,0 +1,383 @@
+# archive.py
+"""
+Retention for mood_history: rows older than the hot window (HOT_DAYS) are
+moved out of SQLite into zstd-compressed Parquet files.
+
+    <archive dir>/month=YYYY-MM/bucket=NN/part-<first id>-<last id>.parquet
+
+with bucket = user_id % USER_BUCKETS (one directory per user would mean
+thousands of tiny files a month). A run streams old rows out by id in
+BATCH_ROWS chunks into one ParquetWriter per open partition, each chunk
+sorted by (user_id, id) so row-group statistics skip other users; memory
+stays flat however much is archived. Partitions that pile up more than
+MAX_PARTS files from repeated runs are merged.
+
+mood_rollups are left alone (mood_history has no delete trigger), so the
+analytics charts keep the full history; db.rebuild_mood_rollups() folds
+archived rows back in (archived_day_counts) when the rollups are recomputed.
+
+Every multi-step change (write parts, then delete rows; merge parts) is
+recorded in a _pending.json manifest before it is applied and replayed by
+the next run after a crash, so rows are never lost or archived twice.
+
+Reads union the hot rows with a memory-mapped scan of the archive that only
+opens the user's bucket in the requested months and skips row groups by
+their user_id statistics: iter_mood_history (API /history) and mood_counts
+(long-range analytics).
+
+    python archive.py [--hot-days 90] [--every SECONDS] [--vacuum] [--db app.db]
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import db
+from metrics import timed
+
+HOT_DAYS = int(os.getenv("HISTORY_HOT_DAYS", "90"))
+USER_BUCKETS = 16
+BATCH_ROWS = 50_000
+MAX_OPEN_WRITERS = 64
+MAX_PARTS = 8          # per partition, before they are merged into one
+DELETE_CHUNK = 50_000
+MANIFEST = "_pending.json"
+GENERATION = "_generation"  # touched whenever the set of part files changes
+READ_THREADS = 8
+
+SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("user_id", pa.int64()),
+    ("text_input", pa.string()),
+    ("detected_mood", pa.string()),
+    ("valence", pa.float64()),
+    ("arousal", pa.float64()),
+    ("created_at", pa.timestamp("s")),
+])
+_TS = "%Y-%m-%d %H:%M:%S"  # SQLite CURRENT_TIMESTAMP format
+
+def archive_dir():
+    """HISTORY_ARCHIVE_DIR, else "<db name>_archive" next to the database."""
+    return db.history_archive_dir()
+
+# ---------- Manifest: intent log for multi-step changes ----------
+def _write_manifest(root, step):
+    tmp = root / (MANIFEST + ".tmp")
+    tmp.write_text(json.dumps(step))
+    os.replace(tmp, root / MANIFEST)
+
+def _apply(root, step):
+    """Idempotent: rename finished temp parts, remove replaced parts, delete archived rows."""
+    for tmp, final in step.get("renames", []):
+        if (root / tmp).exists():
+            os.replace(root / tmp, root / final)
+    for old in step.get("remove", []):
+        (root / old).unlink(missing_ok=True)
+    (root / GENERATION).touch()
+    rows = step.get("delete_rows")
+    if rows:
+        _delete_rows(rows["cutoff"], rows["last_id"])
+    (root / MANIFEST).unlink(missing_ok=True)
+
+def _recover(root):
+    path = root / MANIFEST
+    if path.exists():
+        _apply(root, json.loads(path.read_text()))
+    for stray in root.glob("month=*/bucket=*/.part-*.tmp"):  # crashed before its manifest: rows are still hot
+        stray.unlink()
+
+def _delete_rows(cutoff, last_id):
+    while True:
+        with db.conn_cursor() as (con, cur):
+            cur.execute("""
+                DELETE FROM mood_history WHERE id IN (
+                    SELECT id FROM mood_history WHERE id <= ? AND created_at < ? ORDER BY id LIMIT ?)
+            """, (last_id, cutoff, DELETE_CHUNK))
+            if cur.rowcount < DELETE_CHUNK:
+                return
+
+# ---------- Compaction ----------
+class _Partitions:
+    """Open ParquetWriters by (month, bucket), least recently used closed first."""
+
+    def __init__(self, root):
+        self.root = root
+        self.open = {}   # key -> [writer, tmp name, first id, last id]
+        self.done = []   # (tmp name, final name)
+
+    def write(self, key, table):
+        w = self.open.pop(key, None)
+        if w is None:
+            if len(self.open) >= MAX_OPEN_WRITERS:
+                self._close(next(iter(self.open)))
+            month, bucket = key
+            part_dir = self.root / f"month={month}" / f"bucket={bucket:02d}"
+            part_dir.mkdir(parents=True, exist_ok=True)
+            first = pc.min(table["id"]).as_py()
+            tmp = part_dir / f".part-{first}.tmp"
+            w = [pq.ParquetWriter(tmp, SCHEMA, compression="zstd"), tmp, first, first]
+        self.open[key] = w  # re-inserted: most recently used last
+        w[0].write_table(table)
+        w[3] = max(w[3], pc.max(table["id"]).as_py())
+
+    def _close(self, key):
+        writer, tmp, first, last = self.open.pop(key)
+        writer.close()
+        self.done.append((str(tmp.relative_to(self.root)),
+                          str(tmp.with_name(f"part-{first}-{last}.parquet").relative_to(self.root))))
+
+    def close_all(self):
+        for key in list(self.open):
+            self._close(key)
+        return self.done
+
+def _to_table(rows):
+    cols = list(zip(*rows))
+    created = pc.strptime(pa.array(cols[6], pa.string()), format=_TS, unit="s")
+    return pa.table([pa.array(cols[0], pa.int64()), pa.array(cols[1], pa.int64()), pa.array(cols[2], pa.string()),
+                     pa.array(cols[3], pa.string()), pa.array(cols[4], pa.float64()),
+                     pa.array(cols[5], pa.float64()), created], schema=SCHEMA)
+
+@timed("archive.compact")
+def compact(hot_days=HOT_DAYS, now=None, batch=BATCH_ROWS, progress=None):
+    """
+    Move mood_history rows older than `hot_days` into the archive.
+    Returns dict(rows, files, merged, seconds).
+    """
+    t0 = time.perf_counter()
+    root = archive_dir()
+    root.mkdir(parents=True, exist_ok=True)
+    _recover(root)
+    db.flush_writes()
+    cutoff = ((now or datetime.utcnow()) - timedelta(days=hot_days)).strftime(_TS)
+
+    parts, after, total = _Partitions(root), 0, 0
+    try:
+        while True:
+            with db.conn_cursor() as (con, cur):
+                cur.execute("""
+                    SELECT id, user_id, text_input, detected_mood, valence, arousal, created_at
+                    FROM mood_history WHERE id > ? AND created_at < ? ORDER BY id LIMIT ?
+                """, (after, cutoff, batch))
+                rows = cur.fetchall()
+            if not rows:
+                break
+            groups = {}
+            for i, r in enumerate(rows):
+                groups.setdefault((r["created_at"][:7], r["user_id"] % USER_BUCKETS), []).append(i)
+            table = _to_table(rows)
+            for key, idx in groups.items():
+                parts.write(key, table.take(idx).sort_by([("user_id", "ascending"), ("id", "ascending")]))
+            after = rows[-1]["id"]
+            total += len(rows)
+            if progress:
+                progress({"rows": total, "last_id": after})
+    finally:
+        renames = parts.close_all()
+    if renames:
+        step = {"renames": renames, "delete_rows": {"cutoff": cutoff, "last_id": after}}
+        _write_manifest(root, step)
+        _apply(root, step)
+    merged = _merge_small_partitions(root)
+    return {"rows": total, "files": len(renames), "merged": merged, "seconds": time.perf_counter() - t0}
+
+def _merge_small_partitions(root):
+    merged = 0
+    for part_dir in sorted(root.glob("month=*/bucket=*")):
+        files = sorted(part_dir.glob("part-*.parquet"))
+        if len(files) <= MAX_PARTS:
+            continue
+        ids = [tuple(int(x) for x in f.stem.split("-")[1:]) for f in files]
+        first, last = min(a for a, _ in ids), max(b for _, b in ids)
+        tmp = part_dir / f".part-{first}.tmp"
+        with pq.ParquetWriter(tmp, SCHEMA, compression="zstd") as writer:
+            for f in files:  # one file in memory at a time
+                writer.write_table(pq.ParquetFile(f).read().sort_by([("user_id", "ascending"), ("id", "ascending")]))
+        step = {"renames": [[str(tmp.relative_to(root)), str((part_dir / f"part-{first}-{last}.parquet")
+                                                                .relative_to(root))]],
+                "remove": [str(f.relative_to(root)) for f in files]}
+        _write_manifest(root, step)
+        _apply(root, step)
+        merged += 1
+    return merged
+
+# ---------- Read path ----------
+_pool = ThreadPoolExecutor(max_workers=READ_THREADS, thread_name_prefix="archive")
+_listing = (None, None, {})  # (root, generation mtime, {bucket: [(month, path, metadata)]})
+
+def _parts():
+    """Part files by bucket with their footers, re-listed only after a compaction (any process) changed them."""
+    global _listing
+    root = archive_dir().resolve()
+    try:
+        stamp = (root / GENERATION).stat().st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    if _listing[:2] != (root, stamp):
+        by_bucket = {}
+        for path in sorted(root.glob("month=*/bucket=*/part-*.parquet")):
+            month, bucket = path.parent.parent.name[6:], int(path.parent.name[7:])
+            by_bucket.setdefault(bucket, []).append((month, str(path), pq.read_metadata(path)))
+        _listing = (root, stamp, by_bucket)
+    return _listing[2]
+
+def _row_groups(md, user_id):
+    """Row groups whose user_id statistics admit `user_id` (chunks are sorted by user, so most do not)."""
+    col = SCHEMA.get_field_index("user_id")
+    keep = []
+    for i in range(md.num_row_groups):
+        st = md.row_group(i).column(col).statistics
+        if user_id is None or st is None or not st.has_min_max or st.min <= user_id <= st.max:
+            keep.append(i)
+    return keep
+
+def _read_part(path, md, groups, read, columns, user_id, since, until):
+    t = pq.ParquetFile(path, metadata=md, memory_map=True).read_row_groups(groups, columns=read, use_threads=False)
+    # Parquet has no seconds unit: stored as ms, back to the schema's type
+    t = t.set_column(t.schema.get_field_index("created_at"), "created_at",
+                     t["created_at"].cast(SCHEMA.field("created_at").type))
+    mask = None
+    def both(m):
+        return m if mask is None else pc.and_(mask, m)
+    if user_id is not None:
+        mask = both(pc.equal(t["user_id"], user_id))
+    if since:
+        mask = both(pc.greater_equal(t["created_at"], pa.scalar(datetime.strptime(since, _TS), pa.timestamp("s"))))
+    if until:
+        mask = both(pc.less(t["created_at"], pa.scalar(datetime.strptime(until, _TS), pa.timestamp("s"))))
+    return (t.filter(mask) if mask is not None else t).select(columns)
+
+def _scan(columns, user_id=None, since=None, until=None):
+    """
+    Archived rows (selected columns) for one user or everyone, created_at in
+    [since, until): month directories outside the range are skipped, then
+    row groups by their user_id statistics; the remaining files are read
+    memory-mapped, READ_THREADS at a time (pyarrow releases the GIL).
+    """
+    parts = _parts()
+    files = parts.get(user_id % USER_BUCKETS, []) if user_id is not None else [f for b in parts.values() for f in b]
+    lo, hi = since[:7] if since else None, until[:7] if until else None
+    read = list(dict.fromkeys(columns + ["user_id", "created_at"]))
+    jobs = []
+    for month, path, md in files:
+        if (lo and month < lo) or (hi and month > hi):
+            continue
+        groups = _row_groups(md, user_id)
+        if groups:
+            jobs.append((path, md, groups, read, columns, user_id, since, until))
+    tables = list(_pool.map(lambda job: _read_part(*job), jobs)) if len(jobs) > 1 else [_read_part(*j) for j in jobs]
+    return pa.concat_tables(tables) if tables else SCHEMA.empty_table().select(columns)
+
+def archived_history(user_id, limit=1000):
+    """A user's archived rows, newest first, shaped like db.iter_mood_history rows."""
+    if limit <= 0:
+        return []
+    table = _scan(["id", "detected_mood", "created_at"], user_id)
+    table = table.sort_by([("created_at", "descending"), ("id", "descending")]).slice(0, limit)
+    stamps = table["created_at"].cast(pa.string()).to_pylist()  # "YYYY-MM-DD HH:MM:SS", as SQLite stores it
+    return [{"id": i, "detected_mood": m, "created_at": c}
+            for i, m, c in zip(table["id"].to_pylist(), table["detected_mood"].to_pylist(), stamps)]
+
+def iter_mood_history(user_id, limit=1000, batch=1000):
+    """db.iter_mood_history continued into the archive (archived rows are all older than hot ones)."""
+    n = 0
+    for row in db.iter_mood_history(user_id, limit=limit, batch=batch):
+        n += 1
+        yield row
+    if n < limit:
+        yield from archived_history(user_id, limit - n)
+
+def _raw_counts(user_id, since=None, until=None, counts=None):
+    """Count raw rows, hot and archived, into `counts`."""
+    counts = {} if counts is None else counts
+    sql, args = "SELECT detected_mood, COUNT(*) FROM mood_history WHERE user_id=?", [user_id]
+    if since is not None:
+        sql, args = sql + " AND created_at >= ?", args + [since]
+    if until is not None:
+        sql, args = sql + " AND created_at < ?", args + [until]
+    with db.conn_cursor() as (con, cur):
+        for mood, n in cur.execute(sql + " GROUP BY detected_mood", args).fetchall():
+            counts[mood] = counts.get(mood, 0) + n
+    for r in _scan(["detected_mood"], user_id, since, until)["detected_mood"].value_counts().to_pylist():
+        counts[r["values"]] = counts.get(r["values"], 0) + r["counts"]
+    return counts
+
+def _month_floor(ts):
+    return ts[:7] + "-01 00:00:00"
+
+def _next_month(ts):
+    y, m = int(ts[:4]), int(ts[5:7])
+    return f"{y + m // 12:04d}-{m % 12 + 1:02d}-01 00:00:00"
+
+@timed("archive.mood_counts")
+def mood_counts(user_id, since=None, until=None):
+    """
+    {mood: n} over [since, until) ("YYYY-MM-DD HH:MM:SS", UTC) across hot and
+    archived rows. Whole months inside the range come from the monthly
+    mood_rollups (kept for archived rows too); only the partial months at
+    either end are counted from raw rows.
+    """
+    db.flush_writes()
+    lo = None if since is None else (since if since == _month_floor(since) else _next_month(since))
+    hi = None if until is None else _month_floor(until)
+    if lo is not None and hi is not None and lo >= hi:  # no whole month inside: count it all raw
+        return _raw_counts(user_id, since, until)
+    sql, args = ("SELECT mood, SUM(n) FROM mood_rollups WHERE user_id=? AND granularity='M'", [user_id])
+    if lo is not None:
+        sql, args = sql + " AND period_start >= ?", args + [lo[:10]]
+    if hi is not None:
+        sql, args = sql + " AND period_start < ?", args + [hi[:10]]
+    with db.conn_cursor() as (con, cur):
+        counts = dict(cur.execute(sql + " GROUP BY mood", args).fetchall())
+    if lo is not None and since < lo:
+        _raw_counts(user_id, since, lo, counts)
+    if hi is not None and hi < until:
+        _raw_counts(user_id, hi, until, counts)
+    return {m: n for m, n in counts.items() if n}
+
+def archived_day_counts(user_id=None):
+    """(user_id, day, mood, n) per-day counts of archived rows, for db.rebuild_mood_rollups."""
+    t = _scan(["user_id", "detected_mood", "created_at"], user_id)
+    t = t.append_column("day", pc.strftime(t["created_at"], format="%Y-%m-%d"))
+    t = t.group_by(["user_id", "day", "detected_mood"]).aggregate([("user_id", "count")])
+    return list(zip(t["user_id"].to_pylist(), t["day"].to_pylist(), t["detected_mood"].to_pylist(),
+                    t["user_id_count"].to_pylist()))
+
+def rebuild_rollups(user_id=None):
+    """db.rebuild_mood_rollups, which reads the archive itself; kept for existing callers."""
+    db.rebuild_mood_rollups(user_id)
+
+def vacuum():
+    """Give the space of deleted rows back to the filesystem (rewrites the whole database file)."""
+    with db.conn_cursor() as (con, cur):
+        cur.execute("VACUUM")
+        cur.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+def main():
+    ap = argparse.ArgumentParser(description="Archive mood_history rows older than the hot window to Parquet.")
+    ap.add_argument("--hot-days", type=int, default=HOT_DAYS)
+    ap.add_argument("--every", type=float, default=0, help="repeat every N seconds (0: run once)")
+    ap.add_argument("--vacuum", action="store_true", help="VACUUM after archiving to shrink the file")
+    ap.add_argument("--db", type=Path, default=db.DB_PATH)
+    args = ap.parse_args()
+    db.DB_PATH = args.db
+    db.init_db()
+    while True:
+        stats = compact(args.hot_days, progress=lambda s: print(f"\r{s['rows']} rows archived…", end=""))
+        print(f"\narchived {stats['rows']} rows into {stats['files']} files "
+              f"({stats['merged']} partitions merged) in {stats['seconds']:.1f}s -> {archive_dir()}")
+        if args.vacuum and stats["rows"]:
+            vacuum()
+        if not args.every:
+            break
+        time.sleep(args.every)
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,220 @@
 # auth.py
+import hashlib
+import hmac
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
 import bcrypt
-from db import get_user, add_user
+from db import get_user, add_user, update_password_hash
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))   # changing it rehashes users on their next login
+AUTH_WORKERS = int(os.getenv("AUTH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_TIMEOUT_S = 10.0
+
+MAX_ATTEMPTS = 5           # failed attempts allowed per username and per IP ...
+ATTEMPT_WINDOW_S = 300     # ... within this sliding window
+MAX_SIGNUPS = 20           # accounts created per IP in the same window
+THROTTLE_KEYS = 50_000     # usernames/IPs tracked at once; the least recently failed go first
+VERIFIED_TTL_S = 300       # recently verified (username, password, hash) skip bcrypt
+VERIFIED_CACHE_SIZE = 1024
+TOKEN_TTL_S = 24 * 3600
+# comma-separated usernames allowed on the admin pages (pages/admin.py)
+ADMIN_USERS = frozenset(u.strip() for u in os.getenv("ADMIN_USERS", "").split(",") if u.strip())
+
+# ---------- bcrypt off the script thread ----------
+_pool = None
+_pool_lock = threading.Lock()
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # bcrypt releases the GIL while hashing, so threads run it in parallel;
+            # worker processes would re-import Streamlit's __main__ (the page script)
+            _pool = ThreadPoolExecutor(max_workers=AUTH_WORKERS, thread_name_prefix="bcrypt")
+        return _pool
+
+def _hashpw(plain: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(plain, bcrypt.gensalt(rounds))
+
+def _checkpw(plain: bytes, hashed: bytes) -> bool:
+    try:
+        return bcrypt.checkpw(plain, hashed)
+    except Exception:
+        return False
 
-def hash_password(plain: str) -> str:
-    return bcrypt.hashpw(plain.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+def hash_password(plain: str, rounds: int = None) -> str:
+    fut = _executor().submit(_hashpw, plain.encode("utf-8"), rounds or BCRYPT_ROUNDS)
+    return fut.result(timeout=HASH_TIMEOUT_S).decode("utf-8")
 
 def verify_password(plain: str, hashed: str) -> bool:
     try:
-        return bcrypt.checkpw(plain.encode("utf-8"), hashed.encode("utf-8"))
+        fut = _executor().submit(_checkpw, plain.encode("utf-8"), hashed.encode("utf-8"))
+        return fut.result(timeout=HASH_TIMEOUT_S)
     except Exception:
         return False
 
-def signup(username: str, password: str):
-    if get_user(username):
+def hash_rounds(hashed: str) -> int:
+    """Cost factor of a "$2b$12$..." hash (0 if unparseable)."""
+    try:
+        return int(hashed.split("$")[2])
+    except (IndexError, ValueError):
+        return 0
+
+# ---------- attempt throttling ----------
+class Throttle:
+    """
+    Sliding-window counter of failed attempts per key (username or IP).
+    Keys are kept in order of their latest failure, so fail() drops expired
+    ones from the front as it goes and memory stays bounded by max_keys
+    however many addresses show up.
+    """
+
+    def __init__(self, max_attempts=MAX_ATTEMPTS, window_s=ATTEMPT_WINDOW_S, max_keys=THROTTLE_KEYS):
+        self.max_attempts, self.window_s, self.max_keys = max_attempts, window_s, max_keys
+        self._fails = OrderedDict()  # key -> deque of failure times, least recently failed first
+        self._lock = threading.Lock()
+
+    def _recent(self, key, now):
+        q = self._fails.get(key)
+        while q and now - q[0] > self.window_s:
+            q.popleft()
+        if q is not None and not q:
+            del self._fails[key]
+        return q
+
+    def retry_after(self, *keys) -> float:
+        """Seconds until any of `keys` may try again (0 if allowed now)."""
+        now = time.monotonic()
+        wait = 0.0
+        with self._lock:
+            for k in keys:
+                q = self._recent(k, now) if k else None
+                if q and len(q) >= self.max_attempts:
+                    wait = max(wait, self.window_s - (now - q[0]))
+        return wait
+
+    def fail(self, *keys):
+        now = time.monotonic()
+        with self._lock:
+            for k in keys:
+                if k:
+                    self._fails.setdefault(k, deque()).append(now)
+                    self._fails.move_to_end(k)
+            self._prune(now)
+
+    def _prune(self, now):
+        while self._fails:
+            key, q = next(iter(self._fails.items()))
+            if len(self._fails) <= self.max_keys and now - q[-1] <= self.window_s:
+                break  # the oldest latest-failure is still live, so every later key is too
+            del self._fails[key]
+
+    def __len__(self):
+        return len(self._fails)
+
+    def reset(self, key):
+        with self._lock:
+            self._fails.pop(key, None)
+
+_throttle = Throttle()
+_signups = Throttle(max_attempts=MAX_SIGNUPS)
+
+# ---------- verified-login cache ----------
+# keyed by an HMAC under a per-process secret, so plaintext passwords are never stored
+_cache_key = secrets.token_bytes(32)
+_verified = OrderedDict()
+_verified_lock = threading.Lock()
+
+def _verified_token(username, password, hashed):
+    msg = "\0".join((username, password, hashed)).encode("utf-8")
+    return hmac.new(_cache_key, msg, hashlib.sha256).digest()
+
+def _recently_verified(token) -> bool:
+    with _verified_lock:
+        at = _verified.get(token)
+        if at is None or time.monotonic() - at > VERIFIED_TTL_S:
+            _verified.pop(token, None)
+            return False
+        return True
+
+def _remember(token):
+    with _verified_lock:
+        _verified[token] = time.monotonic()
+        _verified.move_to_end(token)
+        while len(_verified) > VERIFIED_CACHE_SIZE:
+            _verified.popitem(last=False)
+
+def _rehash_later(user_id, password):
+    """Upgrade a hash made with an old cost factor without delaying the login."""
+    fut = _executor().submit(_hashpw, password.encode("utf-8"), BCRYPT_ROUNDS)
+    fut.add_done_callback(lambda f: f.exception() is None
+                          and update_password_hash(user_id, f.result().decode("utf-8")))
+
+# ---------- public API ----------
+def signup(username: str, password: str, ip: str = None):
+    ip_key = f"ip:{ip}" if ip else None
+    wait = max(_throttle.retry_after(ip_key), _signups.retry_after(ip_key))
+    if wait:
+        return False, f"Too many attempts. Try again in {int(wait) + 1} s."
+    try:
+        add_user(username, hash_password(password))
+    except sqlite3.IntegrityError:
+        _throttle.fail(ip_key)  # probing for taken usernames counts like a failed login
         return False, "Username already exists."
-    add_user(username, hash_password(password))
+    _signups.fail(ip_key)  # every account costs a hash; its own, larger budget
     return True, "Account created. Please log in."
 
-def login(username: str, password: str):
+def login(username: str, password: str, ip: str = None):
+    user_key, ip_key = f"user:{username}", (f"ip:{ip}" if ip else None)
+    wait = _throttle.retry_after(user_key, ip_key)
+    if wait:
+        return False, f"Too many attempts. Try again in {int(wait) + 1} s."
     u = get_user(username)
     if not u:
+        _throttle.fail(ip_key)
         return False, "User not found."
-    if not verify_password(password, u["password_hash"]):
-        return False, "Invalid password."
+    token = _verified_token(username, password, u["password_hash"])
+    if not _recently_verified(token):
+        if not verify_password(password, u["password_hash"]):
+            _throttle.fail(user_key, ip_key)
+            return False, "Invalid password."
+        _remember(token)
+        if hash_rounds(u["password_hash"]) != BCRYPT_ROUNDS:
+            _rehash_later(u["id"], password)
+    _throttle.reset(user_key)
     return True, u
+
+# ---------- stateless API tokens ----------
+# "<user_id>.<expires>.<hmac>" signed with API_SECRET, so any worker sharing the
+# secret can verify a token without a session store.
+def _api_secret() -> bytes:
+    secret = os.getenv("API_SECRET")
+    if not secret:
+        raise RuntimeError("API_SECRET is not set")
+    return secret.encode("utf-8")
+
+def issue_token(user_id: int, ttl: int = TOKEN_TTL_S) -> str:
+    payload = f"{int(user_id)}.{int(time.time()) + ttl}"
+    sig = hmac.new(_api_secret(), payload.encode("ascii"), hashlib.sha256).hexdigest()
+    return f"{payload}.{sig}"
+
+def verify_token(token: str):
+    """user_id for a valid, unexpired token, else None."""
+    try:
+        user_id, expires, sig = token.split(".")
+        payload = f"{user_id}.{expires}"
+        good = hmac.new(_api_secret(), payload.encode("ascii"), hashlib.sha256).hexdigest()
+        if hmac.compare_digest(sig, good) and int(expires) > time.time():
+            return int(user_id)
+    except (ValueError, AttributeError):
+        pass
+    return None
+
+def is_admin(username) -> bool:
+    return username is not None and username in ADMIN_USERS
@@ -0,0 +1,77 @@
+# benchmarks/bench_analytics.py
+"""
+Analytics data prep per rerun for a heavy user: the old path (get_mood_history
++ per-row pd.to_datetime + groupby week/month) vs reading mood_rollups.
+
+    python -m benchmarks.bench_analytics [--rows 100000] [--reps 20]
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+import db
+from analytics import rollup_frame
+
+MOODS = ["happy", "sad", "neutral", "calm", "energetic"]
+
+
+def legacy_prep(user_id, limit):
+    hist = db.get_mood_history(user_id, limit=limit)
+    df = pd.DataFrame([{"mood": r["detected_mood"], "created_at": pd.to_datetime(r["created_at"])} for r in hist])
+    df["week"] = df["created_at"].dt.to_period("W").dt.start_time
+    df["month"] = df["created_at"].dt.to_period("M").dt.start_time
+    weekly = df.groupby(["week", "mood"]).size().unstack(fill_value=0)
+    monthly = df.groupby(["month", "mood"]).size().unstack(fill_value=0)
+    return weekly, monthly
+
+
+def rollup_prep(user_id):
+    return rollup_frame(db.get_mood_rollup(user_id, "W")), rollup_frame(db.get_mood_rollup(user_id, "M"))
+
+
+def _ms(fn, reps):
+    out = []
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t0)
+    return statistics.median(out) * 1e3
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=100_000, help="history rows for the benchmarked user")
+    ap.add_argument("--reps", type=int, default=20)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        db.DB_PATH = Path(d) / "bench.db"
+        db.init_db()
+        rnd = random.Random(0)
+        t0 = datetime(2021, 1, 1)
+        rows = [(1, "bench", rnd.choice(MOODS),
+                 (t0 + timedelta(minutes=i * 15)).strftime("%Y-%m-%d %H:%M:%S")) for i in range(args.rows)]
+        start = time.perf_counter()
+        with db.conn_cursor() as (con, cur):
+            cur.executemany("INSERT INTO mood_history (user_id, text_input, detected_mood, created_at) "
+                            "VALUES (?,?,?,?)", rows)
+        print(f"insert {args.rows} rows with rollup triggers: {time.perf_counter() - start:.2f}s")
+
+        legacy_w, _ = legacy_prep(1, args.rows)
+        new_w, _ = rollup_prep(1)
+        assert (legacy_w.values == new_w.values).all(), "rollup counts differ from legacy aggregation"
+
+        print(f"legacy, limit=5000   {_ms(lambda: legacy_prep(1, 5000), args.reps):>10.2f} ms")
+        print(f"legacy, all rows     {_ms(lambda: legacy_prep(1, args.rows), max(1, args.reps // 5)):>10.2f} ms")
+        print(f"rollup tables        {_ms(lambda: rollup_prep(1), args.reps):>10.2f} ms")
+        db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# benchmarks/bench_api.py
+"""
+Load test for api.py: starts the server on a throwaway database, then fires
+POST /recommend from concurrent client threads and reports req/s and
+latency percentiles for each worker count.
+
+    python -m benchmarks.bench_api [--requests 2000] [--concurrency 32] [--workers 1 4]
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _call(port, method, path, body=None, token=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    conn.request(method, path, json.dumps(body) if body is not None else None, headers)
+    resp = conn.getresponse()
+    data = resp.read()
+    conn.close()
+    return resp.status, data
+
+
+def _wait_ready(port, proc, timeout=30):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if proc.poll() is not None:
+            raise RuntimeError("api server exited during startup")
+        try:
+            if _call(port, "GET", "/healthz")[0] == 200:
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("api server did not become ready")
+
+
+def _seed(path):
+    sys.path.insert(0, str(ROOT))
+    import auth
+    import db
+    db.DB_PATH = Path(path)
+    db.init_db()
+    db.bulk_add_songs([(f"Song {i}", f"Artist {i % 200}", db.MOODS[i % 5], None) for i in range(20_000)])
+    auth.signup("bench", "bench-pw")
+    db.close_pool()
+
+
+def _run(port, n, concurrency):
+    status, data = _call(port, "POST", "/token", {"username": "bench", "password": "bench-pw"})
+    assert status == 200, data
+    token = json.loads(data)["token"]
+    texts = ["great day, so happy", "tired and sad", "let's go party", "quiet evening", "ok"]
+
+    def one(i):
+        t0 = time.perf_counter()
+        status, _ = _call(port, "POST", "/recommend", {"text": texts[i % len(texts)], "limit": 20}, token)
+        return status, time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as ex:
+        results = list(ex.map(one, range(n)))
+    wall = time.perf_counter() - t0
+    lat = sorted(dt for _, dt in results)
+    errors = sum(1 for s, _ in results if s != 200)
+    pct = lambda p: lat[min(len(lat) - 1, int(p * len(lat)))] * 1e3
+    return n / wall, pct(0.5), pct(0.99), errors
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "bench.db")
+        _seed(path)
+        env = dict(os.environ, API_SECRET="bench-secret", SPOTIFY_CLIENT_ID="", SPOTIFY_CLIENT_SECRET="",
+                   AUTH_WORKERS="1")
+        print(f"{args.requests} POST /recommend, {args.concurrency} concurrent clients")
+        for workers in args.workers:
+            port = _free_port()
+            proc = subprocess.Popen([sys.executable, "api.py", "--port", str(port), "--workers", str(workers),
+                                     "--db", path], cwd=ROOT, env=env,
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                _wait_ready(port, proc)
+                rps, p50, p99, errors = _run(port, args.requests, args.concurrency)
+                print(f"  {workers:>2} workers  {rps:>8.1f} req/s   p50 {p50:6.1f} ms   p99 {p99:6.1f} ms"
+                      f"   errors {errors}")
+            finally:
+                proc.terminate()
+                proc.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
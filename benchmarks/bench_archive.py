@@ -0,0 +1,132 @@
+# benchmarks/bench_archive.py
+"""
+mood_history retention: database size, online backup time and long-range
+analytics before and after archive.compact() moves everything older than
+the hot window to Parquet (followed by VACUUM).
+
+History is synthetic: --rows clicks spread over --days for --users users,
+with realistic free-text inputs. The long-range query is a user's mood
+counts over the whole period (archive.mood_counts: whole months from the
+rollups, the partial edge months from SQLite plus the archive scan); results
+are checked to be identical,
+as are the first --history rows of the user's history and the rollups
+after archive.rebuild_rollups().
+
+    python -m benchmarks.bench_archive [--rows 1000000] [--users 500] [--days 730] [--hot-days 90]
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import archive
+import db
+
+PHRASES = ["feeling pumped for my workout", "so tired after a long day at work", "chilling with friends tonight",
+           "can't stop smiling today", "rainy sunday, just want to sleep", "party at the beach later!",
+           "stressed about exams next week", "meditating before bed", "a pretty normal tuesday honestly"]
+
+
+def _fill(n, users, days, rnd):
+    start = datetime.utcnow() - timedelta(days=days)
+    step = days * 86400 / n
+    batch = []
+    with db.conn_cursor() as (con, cur):
+        cur.executemany("INSERT INTO users (username, password_hash) VALUES (?, '')",
+                        [(f"u{u}",) for u in range(1, users + 1)])
+    for i in range(n):
+        at = (start + timedelta(seconds=i * step)).strftime("%Y-%m-%d %H:%M:%S")
+        text = f"{rnd.choice(PHRASES)} {rnd.choice(PHRASES)}"
+        batch.append((rnd.randint(1, users), text, rnd.choice(db.MOODS), rnd.uniform(-1, 1), rnd.uniform(-1, 1), at))
+        if len(batch) == 50_000:
+            with db.conn_cursor() as (con, cur):
+                cur.executemany("INSERT INTO mood_history (user_id, text_input, detected_mood, valence, arousal, "
+                                "created_at) VALUES (?,?,?,?,?,?)", batch)
+            batch = []
+    if batch:
+        with db.conn_cursor() as (con, cur):
+            cur.executemany("INSERT INTO mood_history (user_id, text_input, detected_mood, valence, arousal, "
+                            "created_at) VALUES (?,?,?,?,?,?)", batch)
+
+
+def _size_mb(path):
+    return sum(p.stat().st_size for p in Path(path).parent.glob(Path(path).name + "*")) / 2**20
+
+
+def _backup_s(dest):
+    t0 = time.perf_counter()
+    with db.conn_cursor() as (con, cur):
+        target = db._connect(dest)
+        con.backup(target)
+        target.close()
+    return time.perf_counter() - t0
+
+
+def _measure(label, users, reps, rnd, since, history):
+    with db.conn_cursor() as (con, cur):
+        cur.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    backup = _backup_s(str(Path(db.DB_PATH).with_suffix(".bak")))
+    sample = [rnd.randint(1, users) for _ in range(reps)]
+    times, results = [], {}
+    for u in sample:
+        t0 = time.perf_counter()
+        results[u] = archive.mood_counts(u, since=since)
+        times.append(time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    hist = {u: [(r["detected_mood"], r["created_at"]) for r in archive.iter_mood_history(u, limit=history)]
+            for u in sample[:5]}
+    hist_ms = (time.perf_counter() - t0) / 5 * 1e3
+    print(f"{label:<8} db {_size_mb(db.DB_PATH):>8.1f} MiB   backup {backup * 1e3:>7.0f} ms   "
+          f"long-range counts p50 {statistics.median(times) * 1e3:>7.2f} ms   "
+          f"history({history}) {hist_ms:>7.2f} ms")
+    return results, hist
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--users", type=int, default=500)
+    ap.add_argument("--days", type=int, default=730)
+    ap.add_argument("--hot-days", type=int, default=90)
+    ap.add_argument("--reps", type=int, default=50)
+    ap.add_argument("--history", type=int, default=5000)
+    args = ap.parse_args()
+    rnd = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as d:
+        db.DB_PATH = Path(d) / "history.db"
+        db.init_db()
+        t0 = time.perf_counter()
+        _fill(args.rows, args.users, args.days, rnd)
+        archive.vacuum()
+        print(f"{args.rows} rows / {args.users} users / {args.days} days generated in "
+              f"{time.perf_counter() - t0:.0f}s; hot window {args.hot_days} days")
+        since = (datetime.utcnow() - timedelta(days=args.days + 1)).strftime("%Y-%m-%d %H:%M:%S")
+        with db.conn_cursor() as (con, cur):
+            rollups = cur.execute("SELECT * FROM mood_rollups ORDER BY 1, 2, 3, 4").fetchall()
+
+        before, hist_before = _measure("before", args.users, args.reps, random.Random(1), since, args.history)
+        stats = archive.compact(args.hot_days)
+        t0 = time.perf_counter()
+        archive.vacuum()
+        vac = time.perf_counter() - t0
+        parquet = sum(p.stat().st_size for p in archive.archive_dir().rglob("*.parquet")) / 2**20
+        print(f"compact  {stats['rows']} rows -> {stats['files']} files ({parquet:.1f} MiB parquet) "
+              f"in {stats['seconds']:.1f}s, VACUUM {vac:.1f}s")
+        after, hist_after = _measure("after", args.users, args.reps, random.Random(1), since, args.history)
+
+        assert before == after, "long-range counts differ after archiving"
+        assert hist_before == hist_after, "history differs after archiving"
+        archive.rebuild_rollups()
+        with db.conn_cursor() as (con, cur):
+            assert [tuple(r) for r in rollups] == [tuple(r) for r in cur.execute(
+                "SELECT * FROM mood_rollups ORDER BY 1, 2, 3, 4").fetchall()], "rollups differ after rebuild"
+        print("counts, history and rebuilt rollups match")
+        db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# benchmarks/bench_auth.py
+"""
+Logins/sec through auth.login with the bcrypt thread pool sized to 1, 4
+and 16 workers, plus the verified-login cache hit rate path.
+
+    python -m benchmarks.bench_auth [--users 64] [--rounds 10] [--threads 32]
+"""
+import argparse
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import bcrypt
+
+import auth
+import db
+
+
+def _reset_pool(workers):
+    if auth._pool is not None:
+        auth._pool.shutdown()
+    auth._pool = None
+    auth.AUTH_WORKERS = workers
+    auth._executor().submit(int).result()  # start workers outside the timed section
+
+
+def _logins(users, threads):
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(threads) as ex:
+        ok = sum(r[0] for r in ex.map(lambda u: auth.login(u, "secret"), users))
+    dt = time.perf_counter() - t0
+    assert ok == len(users), "login failed"
+    return len(users) / dt
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=64)
+    ap.add_argument("--rounds", type=int, default=10)
+    ap.add_argument("--threads", type=int, default=32)
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        db.DB_PATH = Path(d) / "bench.db"
+        db.init_db()
+        auth.BCRYPT_ROUNDS = args.rounds
+        auth._throttle = auth.Throttle(max_attempts=10**9)
+        pw = bcrypt.hashpw(b"secret", bcrypt.gensalt(args.rounds)).decode()
+        users = [f"user{i}" for i in range(args.users)]
+        for u in users:
+            db.add_user(u, pw)
+
+        print(f"bcrypt cost {args.rounds}, {args.users} logins from {args.threads} threads")
+        for w in args.workers:
+            _reset_pool(w)
+            auth._verified.clear()
+            print(f"  {w:>3} workers   {_logins(users, args.threads):>10.1f} logins/s")
+        print(f"  cached        {_logins(users, args.threads):>10.1f} logins/s (verified-login cache)")
+        auth._pool.shutdown()
+        db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
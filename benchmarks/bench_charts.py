@@ -0,0 +1,120 @@
+# benchmarks/bench_charts.py
+"""
+Chart work per rerun of the analytics block and peak RSS growth over many
+reruns, for two years of weekly + monthly rollups:
+
+  legacy        plt.subplots() + DataFrame.plot(kind="bar") + st.pyplot's
+                savefig (dpi 200, tight bbox); figures never closed
+  legacy+close  the same with plt.close(fig) afterwards
+  png           charts.png_chart on every rerun (a new history row each time)
+  png cached    charts.render through cache.cached, as appp.py does
+  vega          charts.vega_spec + the JSON Streamlit would send
+
+Each variant runs in a fresh subprocess, so RSS growth is its own.
+
+    python -m benchmarks.bench_charts [--reruns 1000] [--variants legacy png ...]
+"""
+import argparse
+import io
+import json
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+
+VARIANTS = ("legacy", "legacy+close", "png", "png cached", "vega")
+WARMUP = 10
+
+
+def _frames(weeks=104, seed=0):
+    from analytics import rollup_frame
+    rnd = random.Random(seed)
+    moods = ["calm", "energetic", "happy", "neutral", "sad"]
+    start = date(2024, 1, 1)
+    weekly = [((start + timedelta(weeks=w)).isoformat(), m, rnd.randint(0, 60)) for w in range(weeks) for m in moods]
+    monthly = {}
+    for period, m, n in weekly:
+        key = (period[:8] + "01", m)
+        monthly[key] = monthly.get(key, 0) + n
+    return (rollup_frame([r for r in weekly if r[2]]),
+            rollup_frame(sorted((p, m, n) for (p, m), n in monthly.items())))
+
+
+def _legacy(frames, close):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    def rerun(i):
+        for frame in frames:
+            fig, ax = plt.subplots()
+            frame.plot(kind="bar", ax=ax)
+            ax.set_ylabel("Count")
+            fig.savefig(io.BytesIO(), format="png", dpi=200, bbox_inches="tight")
+            if close:
+                plt.close(fig)
+    return rerun
+
+
+def _variant(name, frames):
+    import charts
+    from cache import cached, chart_cache
+    if name.startswith("legacy"):
+        return _legacy(frames, close=name.endswith("close"))
+    if name == "png":
+        return lambda i: [charts.png_chart(f, g) for f, g in zip(frames, "WM")]
+    if name == "vega":
+        return lambda i: [json.dumps(charts.vega_spec(f, g)) for f, g in zip(frames, "WM")]
+    session = {}
+    return lambda i: [cached(session, f"_chart_{g}", chart_cache, (1, 1, 0, g, "png"), lambda: charts.render(f, g))
+                      for f, g in zip(frames, "WM")]
+
+
+def _rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _worker(name, reruns):
+    frames = _frames()
+    rerun = _variant(name, frames)
+    for i in range(WARMUP):
+        rerun(i)
+    rss0, times = _rss_mb(), []
+    for i in range(reruns):
+        t0 = time.perf_counter()
+        rerun(i)
+        times.append(time.perf_counter() - t0)
+    figures = 0
+    if "matplotlib.pyplot" in sys.modules:
+        figures = len(sys.modules["matplotlib.pyplot"].get_fignums())
+    times.sort()
+    print(json.dumps({"p50_ms": statistics.median(times) * 1e3, "p95_ms": times[int(len(times) * 0.95)] * 1e3,
+                      "rss_mb": rss0, "growth_mb": _rss_mb() - rss0, "figures": figures}))
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        return _worker(sys.argv[2], int(sys.argv[3]))
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--reruns", type=int, default=1000)
+    ap.add_argument("--variants", nargs="+", choices=VARIANTS, default=list(VARIANTS))
+    args = ap.parse_args()
+
+    print(f"{args.reruns} reruns, weekly + monthly chart each")
+    print(f"{'variant':<14}{'p50 ms':>10}{'p95 ms':>10}{'RSS MB':>10}{'growth MB':>11}{'open figs':>11}")
+    for name in args.variants:
+        out = subprocess.run([sys.executable, "-m", "benchmarks.bench_charts", "--worker", name,
+                              str(args.reruns)], capture_output=True, text=True)
+        if out.returncode:
+            print(f"{name:<14}failed: {(out.stderr.strip().splitlines() or ['?'])[-1]}")
+            continue
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{name:<14}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['rss_mb']:>10.1f}{r['growth_mb']:>11.1f}"
+              f"{r['figures']:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# benchmarks/bench_db_pool.py
+"""
+Reads/sec and writes/sec through db.conn_cursor at 1, 8 and 32 threads,
+pooled connections vs the old connect-per-call path.
+
+    python -m benchmarks.bench_db_pool [--ops 2000]
+"""
+import argparse
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import db
+
+
+@contextmanager
+def legacy_conn_cursor():
+    con = sqlite3.connect(db.DB_PATH)
+    con.row_factory = sqlite3.Row
+    cur = con.cursor()
+    try:
+        yield con, cur
+        con.commit()
+    finally:
+        con.close()
+
+
+def _read(cc):
+    with cc() as (con, cur):
+        cur.execute("SELECT title, artist, mood, url FROM songs WHERE mood=? LIMIT 30", ("happy",))
+        cur.fetchall()
+
+
+def _write(cc):
+    with cc() as (con, cur):
+        cur.execute("INSERT INTO mood_history (user_id, text_input, detected_mood) VALUES (?,?,?)",
+                    (1, "bench", "happy"))
+
+
+def _run(fn, cc, threads, ops):
+    per_thread = max(1, ops // threads)
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(per_thread):
+                fn(cc)
+        except sqlite3.OperationalError as e:
+            errors.append(e)
+
+    ts = [threading.Thread(target=worker) for _ in range(threads)]
+    t0 = time.perf_counter()
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    dt = time.perf_counter() - t0
+    return per_thread * threads / dt, len(errors)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ops", type=int, default=2000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        db.DB_PATH = Path(d) / "bench.db"
+        db.init_db()
+        db.bulk_add_songs([(f"Song {i}", f"Artist {i % 50}", "happy", None) for i in range(1000)])
+
+        print(f"{'mode':<8}{'threads':>8}{'reads/s':>12}{'writes/s':>12}{'errors':>8}")
+        for name, cc in (("legacy", legacy_conn_cursor), ("pooled", db.conn_cursor)):
+            for threads in (1, 8, 32):
+                r, er = _run(_read, cc, threads, args.ops)
+                w, ew = _run(_write, cc, threads, args.ops)
+                print(f"{name:<8}{threads:>8}{r:>12.0f}{w:>12.0f}{er + ew:>8}")
+        db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
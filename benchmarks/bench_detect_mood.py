@@ -0,0 +1,70 @@
+# benchmarks/bench_detect_mood.py
+"""
+Throughput (texts/sec) of the one-at-a-time legacy detect_mood loop vs
+mood.detect_moods: cold cache, warm cache and process-pool mode.
+
+    python -m benchmarks.bench_detect_mood [--n 50000] [--distinct 0.5] [--processes 4]
+"""
+import argparse
+import os
+import random
+import time
+
+import mood
+
+WORDS = ("i am so happy sad tired going to the gym tonight want to dance chill relax "
+         "feeling pumped for my workout awful day peace sleep party with friends").split()
+
+
+def legacy_detect_mood(text):
+    if not text or not text.strip():
+        return "neutral"
+    t = text.lower()
+    comp = mood._analyzer().polarity_scores(t)["compound"]
+    if comp >= 0.5:
+        if any(k in t for k in mood.KEY_HYPE):
+            return "energetic"
+        return "happy"
+    if comp <= -0.4:
+        return "sad"
+    if any(k in t for k in mood.KEY_CALM):
+        return "calm"
+    if any(k in t for k in mood.KEY_HYPE):
+        return "energetic"
+    return "neutral"
+
+
+def _rate(label, fn, n):
+    t0 = time.perf_counter()
+    out = fn()
+    dt = time.perf_counter() - t0
+    print(f"{label:<28}{n / dt:>14.0f} texts/s")
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=50_000)
+    ap.add_argument("--distinct", type=float, default=0.5, help="fraction of distinct texts")
+    ap.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    args = ap.parse_args()
+
+    rnd = random.Random(0)
+    pool = [" ".join(rnd.choice(WORDS) for _ in range(rnd.randint(3, 14)))
+            for _ in range(max(1, int(args.n * args.distinct)))]
+    texts = [rnd.choice(pool) for _ in range(args.n)]
+
+    base = _rate("legacy loop", lambda: [legacy_detect_mood(t) for t in texts], args.n)
+    mood.clear_cache()
+    cold = _rate("detect_moods (cold)", lambda: mood.detect_moods(texts), args.n)
+    warm = _rate("detect_moods (warm)", lambda: mood.detect_moods(texts), args.n)
+    mood.clear_cache()
+    saved, mood.PARALLEL_MIN_BATCH = mood.PARALLEL_MIN_BATCH, 0
+    par = _rate(f"detect_moods ({args.processes} procs)",
+                lambda: mood.detect_moods(texts, processes=args.processes), args.n)
+    mood.PARALLEL_MIN_BATCH = saved
+    assert base == cold == warm == par, "batch results differ from detect_mood"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# benchmarks/bench_import.py
+"""
+CSV import rows/sec and peak Python memory: the old read-everything +
+iterrows + single executemany path vs importer.import_csv.
+
+    python -m benchmarks.bench_import [--rows 2000000] [--legacy-rows 200000]
+"""
+import argparse
+import csv
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+
+import db
+from importer import import_csv
+
+
+def legacy_import(path):
+    df = pd.read_csv(path)
+    cols = {c.lower(): c for c in df.columns}
+    rows = []
+    for _, r in df.iterrows():
+        url = r[cols["url"]] if "url" in cols else None
+        rows.append((r[cols["title"]], r[cols["artist"]], str(r[cols["mood"]]).lower(), url))
+    db.bulk_add_songs(rows)
+    return len(rows)
+
+
+def _write_csv(path, n, dup_rate=0.05):
+    rnd = random.Random(n)
+    moods = list(db.MOODS) + ["Happy", " SAD "]
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["title", "artist", "mood", "url"])
+        for i in range(n):
+            j = rnd.randrange(i) if i and rnd.random() < dup_rate else i
+            w.writerow([f"Song {j}", f"Artist {j % 9973}", moods[j % len(moods)],
+                        f"https://example.com/{j}" if j % 3 else ""])
+
+
+def _measure(fn, *args):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    out = fn(*args)
+    dt = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return out, dt, peak / 2**20
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=2_000_000)
+    ap.add_argument("--legacy-rows", type=int, default=200_000, help="0 skips the legacy run")
+    ap.add_argument("--chunksize", type=int, default=50_000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        for label, n in (("legacy", args.legacy_rows), ("chunked", args.rows)):
+            if not n:
+                continue
+            src = Path(d) / f"{label}.csv"
+            _write_csv(src, n)
+            db.DB_PATH = Path(d) / f"{label}.db"
+            db.init_db()
+            if label == "legacy":
+                _, dt, peak = _measure(legacy_import, src)
+            else:
+                _, dt, peak = _measure(import_csv, src, args.chunksize)
+            print(f"{label:<8} {n:>10} rows  {n / dt:>10.0f} rows/s  peak {peak:>8.1f} MiB (tracemalloc)")
+            db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# benchmarks/bench_metrics.py
+"""
+Cost of the instrumentation itself: a span around nothing, a @timed no-op,
+and a single-row indexed query through the timed vs plain cursor, each with
+metrics enabled and disabled.
+
+    python -m benchmarks.bench_metrics [--n 200000]
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import db
+import metrics
+
+
+@metrics.timed("bench.noop")
+def _noop():
+    return None
+
+
+def _per_call_ns(fn, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e9
+
+
+def _span():
+    with metrics.span("bench.span"):
+        pass
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200_000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        db.DB_PATH = Path(d) / "metrics.db"
+        db.init_db()
+        db.add_user("bench", "x")
+        query = lambda: db.get_user("bench")
+        print(f"{'':<24} {'enabled':>10} {'disabled':>10}")
+        for label, fn, n in (("span (empty block)", _span, args.n), ("@timed no-op", _noop, args.n),
+                             ("indexed query", query, args.n // 10)):
+            out = []
+            for flag in (True, False):
+                metrics.set_enabled(flag)
+                fn()
+                out.append(_per_call_ns(fn, n))
+            print(f"{label:<24} {out[0] / 1e3:>8.2f}us {out[1] / 1e3:>8.2f}us")
+        db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
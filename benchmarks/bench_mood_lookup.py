@@ -0,0 +1,80 @@
+# benchmarks/bench_mood_lookup.py
+"""
+p50/p99 latency of the song-by-mood and history-by-user queries against
+catalog size: legacy LOWER(mood)=LOWER(?) scan vs the indexed schema.
+
+    python -m benchmarks.bench_mood_lookup [--sizes 10000 100000 1000000]
+"""
+import argparse
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import db
+
+MOODS = ["happy", "sad", "neutral", "calm", "energetic"]
+LEGACY_SONGS = "SELECT title, artist, mood, IFNULL(url,'') as url FROM songs WHERE LOWER(mood)=LOWER(?) LIMIT ?"
+LEGACY_HISTORY = "SELECT detected_mood, created_at FROM mood_history WHERE user_id=? ORDER BY created_at DESC LIMIT ?"
+
+
+def _fill(con, n):
+    rnd = random.Random(n)
+    con.executemany("INSERT INTO songs (title, artist, mood, url) VALUES (?,?,?,?)",
+                    ((f"Song {i}", f"Artist {i % 5000}", rnd.choice(MOODS), None) for i in range(n)))
+    con.executemany("INSERT INTO mood_history (user_id, text_input, detected_mood, created_at) VALUES (?,?,?,?)",
+                    ((rnd.randrange(1000), "bench", rnd.choice(MOODS),
+                      f"2024-{1 + i % 12:02d}-{1 + i % 28:02d} 12:00:00") for i in range(n)))
+    con.commit()
+
+
+def _pct(samples):
+    s = sorted(samples)
+    return statistics.median(s) * 1e3, s[int(len(s) * 0.99) - 1] * 1e3
+
+
+def _time(fn, reps):
+    out = []
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t0)
+    return _pct(out)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    ap.add_argument("--reps", type=int, default=200)
+    args = ap.parse_args()
+
+    print(f"{'rows':>10} {'query':<8} {'legacy p50/p99 ms':>20} {'indexed p50/p99 ms':>20}")
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as d:
+            legacy_path = Path(d) / "legacy.db"
+            con = sqlite3.connect(legacy_path)
+            con.executescript("".join(sql + ";" for sql in db.MIGRATIONS[0][1]))
+            _fill(con, n)
+
+            db.DB_PATH = Path(d) / "indexed.db"
+            db.init_db()
+            with db.conn_cursor() as (c, cur):
+                _fill(c, n)
+                cur.execute("ANALYZE")
+
+            rnd = random.Random(0)
+            old = _time(lambda: con.execute(LEGACY_SONGS, (rnd.choice(MOODS).upper(), 50)).fetchall(), args.reps)
+            new = _time(lambda: db.fetch_songs_by_mood(rnd.choice(MOODS).upper(), limit=50), args.reps)
+            print(f"{n:>10} {'songs':<8} {old[0]:>9.3f}/{old[1]:<10.3f} {new[0]:>9.3f}/{new[1]:<10.3f}")
+
+            old = _time(lambda: con.execute(LEGACY_HISTORY, (rnd.randrange(1000), 5000)).fetchall(), args.reps)
+            new = _time(lambda: db.get_mood_history(rnd.randrange(1000), limit=5000), args.reps)
+            print(f"{n:>10} {'history':<8} {old[0]:>9.3f}/{old[1]:<10.3f} {new[0]:>9.3f}/{new[1]:<10.3f}")
+            con.close()
+            db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
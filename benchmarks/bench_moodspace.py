@@ -0,0 +1,79 @@
+# benchmarks/bench_moodspace.py
+"""
+Mood-space kNN at catalog scale: index build and memory, query latency of
+the grid index vs a linear scan over the packed array, and the cost of
+appending new songs incrementally.
+
+Points mimic a real library: most songs carry only a label (clustered in
+their region, see db.MOOD_SPREAD), the rest have their own coordinates.
+
+    python -m benchmarks.bench_moodspace [--tracks 1000000] [--labelled 0.8] [--k 50]
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+import db
+from moodspace import MoodIndex
+
+
+def _points(n, labelled, rng):
+    centres = np.array(list(db.MOOD_POINTS.values()), np.float32)
+    m = int(n * labelled)
+    clustered = centres[rng.integers(len(centres), size=m)] + rng.uniform(-db.MOOD_SPREAD, db.MOOD_SPREAD, (m, 2))
+    free = np.clip(rng.normal(0, 0.5, (n - m, 2)), -1, 1)
+    return np.concatenate((clustered, free)).astype(np.float32)
+
+
+def _ms(fn, queries):
+    out = []
+    for q in queries:
+        t0 = time.perf_counter()
+        fn(q)
+        out.append(time.perf_counter() - t0)
+    out.sort()
+    return statistics.median(out) * 1e3, out[max(0, int(len(out) * 0.99) - 1)] * 1e3
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tracks", type=int, default=1_000_000)
+    ap.add_argument("--labelled", type=float, default=0.8, help="share of songs with only a mood label")
+    ap.add_argument("--k", type=int, default=50)
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--append", type=int, default=10_000)
+    args = ap.parse_args()
+    rng = np.random.default_rng(0)
+
+    points = _points(args.tracks, args.labelled, rng)
+    ids = np.arange(1, args.tracks + 1, dtype=np.int64)
+    index = MoodIndex()
+    t0 = time.perf_counter()
+    index.add(ids, points)
+    index.compact()
+    print(f"{args.tracks} tracks: build {(time.perf_counter() - t0) * 1e3:.0f} ms, "
+          f"index {index.nbytes / 2**20:.1f} MiB ({index.nbytes / args.tracks:.1f} B/track)")
+
+    queries = np.clip(rng.normal(0, 0.6, (args.queries, 2)), -1, 1).astype(np.float32)
+    grid = _ms(lambda q: index.search(q, args.k), queries)
+    brute = _ms(lambda q: index.search_brute(q, args.k), queries[:max(10, args.queries // 10)])
+    print(f"k={args.k}  grid p50 {grid[0]:.3f} ms  p99 {grid[1]:.3f} ms   "
+          f"linear scan p50 {brute[0]:.2f} ms  p99 {brute[1]:.2f} ms")
+
+    new = _points(args.append, args.labelled, rng)
+    t0 = time.perf_counter()
+    for start in range(0, args.append, 100):  # songs trickling in, 100 at a time
+        index.add(ids[-1] + 1 + np.arange(start, min(start + 100, args.append)), new[start:start + 100])
+    dt = time.perf_counter() - t0
+    tail = _ms(lambda q: index.search(q, args.k), queries[:100])
+    print(f"append {args.append} in batches of 100: {dt * 1e3:.0f} ms total; "
+          f"query with {index._tail_n} in tail p50 {tail[0]:.3f} ms")
+    t0 = time.perf_counter()
+    index.compact()
+    print(f"compact: {(time.perf_counter() - t0) * 1e3:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
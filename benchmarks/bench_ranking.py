@@ -0,0 +1,68 @@
+# benchmarks/bench_ranking.py
+"""
+ranking.rank latency for one request: 10k-track candidate window, a user
+with a few hundred feedback events, with and without the per-artist cap.
+Also reports the one-off cost of building a mood partition.
+
+    python -m benchmarks.bench_ranking [--songs 200000] [--events 500] [--reps 500]
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+import db
+import ranking
+
+
+def _ms(fn, reps):
+    out = []
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t0)
+    out.sort()
+    return statistics.median(out) * 1e3, out[max(0, int(len(out) * 0.99) - 1)] * 1e3
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--songs", type=int, default=200_000, help="songs in the benchmarked mood")
+    ap.add_argument("--events", type=int, default=500, help="feedback events for the user")
+    ap.add_argument("--candidates", type=int, default=ranking.MAX_CANDIDATES)
+    ap.add_argument("--reps", type=int, default=500)
+    args = ap.parse_args()
+    rnd = random.Random(3)
+
+    with tempfile.TemporaryDirectory() as d:
+        db.DB_PATH = Path(d) / "bench.db"
+        db.init_db()
+        db.bulk_add_songs([(f"Song {i}", f"Artist {int(rnd.paretovariate(1.2)) % 20000}", "happy", None)
+                           for i in range(args.songs)])
+        now = int(time.time())
+        db.bulk_record_events([(1, rnd.randint(1, args.songs), rnd.choice(("play", "play", "skip", "like")), now)
+                               for _ in range(args.events)])
+        db.bulk_record_events([(u, rnd.randint(1, args.songs), "play", now)
+                               for u in range(2, 200) for _ in range(50)])
+
+        t0 = time.perf_counter()
+        ranking.partition("happy")
+        print(f"partition build: {args.songs} songs in {(time.perf_counter() - t0) * 1e3:.0f} ms (cached after)")
+
+        rng = np.random.default_rng(0)
+        print(f"{args.candidates} candidates, {args.events} user events")
+        for label, cap in (("rank k=50", None), ("rank k=50, cap 3/artist", 3)):
+            p50, p99 = _ms(lambda: ranking.rank(1, "happy", 50, max_per_artist=cap, rng=rng,
+                                                max_candidates=args.candidates), args.reps)
+            print(f"  {label:<26} p50 {p50:6.2f} ms   p99 {p99:6.2f} ms")
+        p50, p99 = _ms(lambda: db.fetch_songs_page("happy", 50, db.new_playlist_cursor("happy"), 3), args.reps)
+        print(f"  {'fetch_songs_page (unranked)':<26} p50 {p50:6.2f} ms   p99 {p99:6.2f} ms")
+        db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
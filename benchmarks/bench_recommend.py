@@ -0,0 +1,71 @@
+# benchmarks/bench_recommend.py
+"""
+End-to-end recommendation latency with stub providers, one of them slowed
+down: sequential calls (the old appp.py flow) vs recommend.recommend with
+a deadline.
+
+    python -m benchmarks.bench_recommend [--requests 200] [--slow 2.0] [--deadline 0.3]
+"""
+import argparse
+import random
+import statistics
+import time
+from collections import OrderedDict
+
+import recommend
+
+
+def _stub(name, mean_s, jitter_s=0.01):
+    rnd = random.Random(name)
+
+    def provider(mood, limit, **_):
+        time.sleep(max(0.0, rnd.gauss(mean_s, jitter_s)))
+        return [{"title": f"Song {i}", "artist": f"{name} artist {i % 7}", "url": "", "preview_url": None}
+                for i in range(limit)]
+    return provider
+
+
+def _pcts(samples):
+    s = sorted(samples)
+    return statistics.median(s) * 1e3, s[max(0, int(len(s) * 0.99) - 1)] * 1e3
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--slow", type=float, default=2.0, help="latency of the slowed provider (s)")
+    ap.add_argument("--deadline", type=float, default=0.3)
+    args = ap.parse_args()
+
+    providers = OrderedDict([
+        ("library", _stub("library", 0.01)),
+        ("spotify", _stub("spotify", 0.12)),
+        ("youtube", _stub("youtube", 0.001)),
+        ("slow", _stub("slow", args.slow)),
+    ])
+    n_seq = max(3, args.requests // 20)
+    seq = []
+    for _ in range(n_seq):
+        t0 = time.perf_counter()
+        for fn in providers.values():
+            fn("happy", 20)
+        seq.append(time.perf_counter() - t0)
+
+    fan, served = [], []
+    for _ in range(args.requests):
+        t0 = time.perf_counter()
+        rec = recommend.recommend("happy", 20, deadline_s=args.deadline, providers=providers)
+        fan.append(time.perf_counter() - t0)
+        served.append(len(rec["merged"]))
+
+    p50, p99 = _pcts(seq)
+    print(f"sequential ({n_seq} req)      p50 {p50:>8.1f} ms  p99 {p99:>8.1f} ms")
+    p50, p99 = _pcts(fan)
+    print(f"fan-out, {args.deadline * 1e3:.0f} ms budget    p50 {p50:>8.1f} ms  p99 {p99:>8.1f} ms  "
+          f"avg tracks {statistics.mean(served):.1f}")
+    for name, s in recommend.provider_stats().items():
+        print(f"  {name:<8} calls {s['calls']:>5}  mean {s['mean_ms']:>8.1f} ms  max {s['max_ms']:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
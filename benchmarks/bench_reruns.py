@@ -0,0 +1,71 @@
+# benchmarks/bench_reruns.py
+"""
+Streamlit reruns/sec of appp.py for a logged-in user with a playlist on
+screen, with the result caches on and off. Drives the script headlessly
+through streamlit.testing.
+
+    python -m benchmarks.bench_reruns [--reruns 50] [--history 2000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from streamlit.testing.v1 import AppTest
+
+APP = str(Path(__file__).resolve().parent.parent / "appp.py")
+
+
+def _session(history):
+    import auth
+    import cache
+    import db
+    db.init_db()
+    auth.signup("bench", "bench-pw")
+    user = db.get_user("bench")
+    db.bulk_add_songs([(f"Song {i}", f"Artist {i % 40}", db.MOODS[i % 5], None) for i in range(5000)])
+    with db.conn_cursor() as (con, cur):
+        cur.executemany("INSERT INTO mood_history (user_id, text_input, detected_mood, created_at) VALUES (?,?,?,"
+                        "datetime('now', ?))", [(user["id"], "x", db.MOODS[i % 5], f"-{i} hours")
+                                                for i in range(history)])
+    at = AppTest.from_file(APP, default_timeout=120)
+    at.session_state["user"] = user["id"]
+    at.session_state["username"] = "bench"
+    at.session_state["last_mood"] = "happy"
+    at.run()
+    assert not at.exception, at.exception
+    return at, cache
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--reruns", type=int, default=50)
+    ap.add_argument("--history", type=int, default=2000)
+    args = ap.parse_args()
+    sys.path.insert(0, str(Path(APP).parent))
+
+    with tempfile.TemporaryDirectory() as d:
+        os.chdir(d)  # appp.py uses the relative app.db
+        at, cache = _session(args.history)
+        for enabled in (False, True):
+            cache.ENABLED = enabled
+            for c in (cache.playlist_cache, cache.chart_cache):
+                c.clear()
+                c.hits = c.misses = c.session_hits = 0
+            for slot in ("_playlist", "_chart_W", "_chart_M"):
+                if slot in at.session_state:
+                    del at.session_state[slot]
+            t0 = time.perf_counter()
+            for _ in range(args.reruns):
+                at.run()
+            dt = time.perf_counter() - t0
+            print(f"cache {'on ' if enabled else 'off'}  {args.reruns / dt:>8.2f} reruns/s  "
+                  f"({dt / args.reruns * 1e3:.1f} ms/rerun)")
+        print("playlist", cache.playlist_cache.stats())
+        print("charts", cache.chart_cache.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/bench_sampling.py
+"""
+Latency of picking k random tracks for a mood: ORDER BY RANDOM() vs
+db.sample_songs_by_mood, plus one fetch_songs_page call, by catalog size.
+
+    python -m benchmarks.bench_sampling [--sizes 10000 1000000 10000000] [--k 50]
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import db
+
+MOODS = ["happy", "sad", "neutral", "calm", "energetic"]
+
+
+def _fill(n, chunk=200_000):
+    rnd = random.Random(n)
+    for start in range(0, n, chunk):
+        rows = [(f"Song {i}", f"Artist {int(rnd.paretovariate(1.2)) % 20000}", rnd.choice(MOODS), None)
+                for i in range(start, min(n, start + chunk))]
+        db.bulk_add_songs(rows)
+    with db.conn_cursor() as (con, cur):
+        cur.execute("ANALYZE")
+
+
+def _ms(fn, reps):
+    out = []
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t0)
+    out.sort()
+    return statistics.median(out) * 1e3, out[int(len(out) * 0.99) - 1] * 1e3
+
+
+def _order_by_random(mood, k):
+    with db.conn_cursor() as (con, cur):
+        cur.execute(f"SELECT {db.SONG_COLS} FROM songs WHERE mood=? ORDER BY RANDOM() LIMIT ?", (mood, k))
+        return cur.fetchall()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000, 10_000_000])
+    ap.add_argument("--k", type=int, default=50)
+    ap.add_argument("--reps", type=int, default=50)
+    args = ap.parse_args()
+
+    print(f"{'rows':>10} {'ORDER BY RANDOM() p50/p99':>26} {'sample p50/p99':>20} {'page(cap=3) p50/p99':>22}")
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as d:
+            db.DB_PATH = Path(d) / "bench.db"
+            db.init_db()
+            _fill(n)
+            rnd = random.Random(1)
+            old = _ms(lambda: _order_by_random(rnd.choice(MOODS), args.k), max(3, args.reps // 10))
+            new = _ms(lambda: db.sample_songs_by_mood(rnd.choice(MOODS), args.k, max_per_artist=3, rng=rnd),
+                      args.reps)
+
+            def page():
+                mood = rnd.choice(MOODS)
+                db.fetch_songs_page(mood, args.k, db.new_playlist_cursor(mood, rnd), max_per_artist=3)
+
+            pg = _ms(page, args.reps)
+            print(f"{n:>10} {old[0]:>12.2f}/{old[1]:<13.2f} {new[0]:>9.2f}/{new[1]:<10.2f} {pg[0]:>10.2f}/{pg[1]:<11.2f}")
+            db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
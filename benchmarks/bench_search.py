@@ -0,0 +1,96 @@
+# benchmarks/bench_search.py
+"""
+db.search_songs latency at catalog scale: whole words, two-word queries,
+short and longer prefixes, and typos (fuzzy term substitution), against a
+LIKE '%q%' scan for reference. Also times dedupe.find_duplicates.
+
+    python -m benchmarks.bench_search [--rows 1000000] [--reps 200]
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import db
+from dedupe import find_duplicates
+
+SYLLABLES = ["ka", "lo", "mi", "ra", "ne", "to", "su", "vi", "da", "ge", "po", "lin", "mar", "sha", "ton",
+             "ber", "ly", "que", "zen", "dor", "fu", "nk", "ste", "ri", "an", "el", "cho", "wa", "by", "ot"]
+
+
+def _vocabulary(rnd, n):
+    return sorted({"".join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4))) for _ in range(n)})
+
+
+def _fill(n, rnd, chunk=200_000):
+    words = _vocabulary(rnd, 40_000)
+    artists = [" ".join(rnd.choice(words).capitalize() for _ in range(rnd.randint(1, 2))) for _ in range(50_000)]
+    for start in range(0, n, chunk):
+        rows = [(" ".join(rnd.choice(words).capitalize() for _ in range(rnd.randint(1, 4))),
+                 artists[int(rnd.paretovariate(1.2)) % len(artists)], rnd.choice(db.MOODS), None)
+                for _ in range(start, min(n, start + chunk))]
+        db.bulk_add_songs(rows)
+
+
+def _typo(word, rnd):
+    i = rnd.randrange(1, len(word))
+    return word[:i] + word[i + 1:]  # drop one letter (never the first)
+
+
+def _ms(fn, queries):
+    out = []
+    for q in queries:
+        t0 = time.perf_counter()
+        fn(q)
+        out.append(time.perf_counter() - t0)
+    out.sort()
+    return statistics.median(out) * 1e3, out[max(0, int(len(out) * 0.99) - 1)] * 1e3
+
+
+def _like(q):
+    with db.conn_cursor() as (con, cur):
+        return cur.execute("SELECT id FROM songs WHERE title LIKE ? OR artist LIKE ? LIMIT 20",
+                           (f"%{q}%", f"%{q}%")).fetchall()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--reps", type=int, default=200)
+    args = ap.parse_args()
+    rnd = random.Random(7)
+
+    with tempfile.TemporaryDirectory() as d:
+        db.DB_PATH = Path(d) / "bench.db"
+        db.init_db()
+        t0 = time.perf_counter()
+        _fill(args.rows, rnd)
+        print(f"{args.rows} songs loaded (FTS kept in sync by triggers) in {time.perf_counter() - t0:.1f}s")
+
+        with db.conn_cursor() as (con, cur):
+            sample = cur.execute("SELECT title, artist FROM songs ORDER BY RANDOM() LIMIT ?",
+                                 (args.reps,)).fetchall()
+        first = [r["title"].split()[0].lower() for r in sample]
+        cases = {
+            "word": first,
+            "title word + artist": [f"{r['title'].split()[-1]} {r['artist'].split()[0]}" for r in sample],
+            "prefix (2 chars)": [w[:2] for w in first],
+            "prefix (4 chars)": [w[:4] for w in first],
+            "typo": [_typo(w, rnd) for w in first],
+        }
+        print(f"{'query':<22} {'search p50/p99 ms':>20} {'LIKE scan p50/p99 ms':>24}")
+        for name, queries in cases.items():
+            fts = _ms(lambda q: db.search_songs(q, 20), queries)
+            like = _ms(_like, queries[:max(3, len(queries) // 20)])
+            print(f"{name:<22} {fts[0]:>9.2f}/{fts[1]:<10.2f} {like[0]:>12.2f}/{like[1]:<11.2f}")
+
+        t0 = time.perf_counter()
+        groups = find_duplicates()
+        print(f"find_duplicates: {len(groups)} groups in {time.perf_counter() - t0:.1f}s")
+        db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# benchmarks/bench_spotify_cache.py
+"""
+Spotify provider against a local stub server: cold vs cache-hit latency,
+upstream calls saved by caching + single-flight, and the stale fallback
+when the upstream is slower than the per-call timeout.
+
+    python -m benchmarks.bench_spotify_cache [--delay 0.15] [--calls 2000] [--threads 16]
+"""
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import providers_spotify
+
+
+class StubSpotify(BaseHTTPRequestHandler):
+    delay = 0.0
+    hits = 0
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, body):
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):  # token endpoint
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._json({"access_token": "stub", "token_type": "Bearer", "expires_in": 3600})
+
+    def do_GET(self):  # /v1/search
+        StubSpotify.hits += 1
+        time.sleep(StubSpotify.delay)
+        items = [{"name": f"Track {i}", "artists": [{"name": f"Artist {i}"}],
+                  "external_urls": {"spotify": f"https://open.spotify.com/track/{i}"}, "preview_url": None}
+                 for i in range(10)]
+        self._json({"tracks": {"items": items}})
+
+
+def _ms(fn, reps):
+    out = []
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t0)
+    return statistics.median(out) * 1e3
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--delay", type=float, default=0.15, help="stub upstream latency (s)")
+    ap.add_argument("--calls", type=int, default=2000)
+    ap.add_argument("--threads", type=int, default=16)
+    args = ap.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubSpotify)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    os.environ.update(SPOTIFY_CLIENT_ID="stub", SPOTIFY_CLIENT_SECRET="stub",
+                      SPOTIFY_TOKEN_URL=base + "/api/token", SPOTIFY_API_URL=base + "/v1")
+    StubSpotify.delay = args.delay
+
+    p = providers_spotify.SpotifyProvider()
+    moods = list(providers_spotify.QMAP)
+    cold = _ms(lambda: (p.clear(), p.search("bench cold", 10)), 5)
+    hit = _ms(lambda: p.search("bench cold", 10), 1000)
+    print(f"cold (upstream) latency  {cold:>9.3f} ms")
+    print(f"cache-hit latency        {hit:>9.3f} ms")
+
+    p = providers_spotify.SpotifyProvider()
+    StubSpotify.hits = 0
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as ex:
+        list(ex.map(lambda i: p.search(providers_spotify.QMAP[moods[i % len(moods)]], 10), range(args.calls)))
+    dt = time.perf_counter() - t0
+    print(f"{args.calls} searches on {args.threads} threads: {StubSpotify.hits} upstream calls "
+          f"({args.calls - StubSpotify.hits} saved), {args.calls / dt:.0f} searches/s, stats={p.stats}")
+
+    p = providers_spotify.SpotifyProvider(ttl=0, timeout=args.delay / 3)
+    StubSpotify.delay = 0
+    p.search("stale", 10)
+    StubSpotify.delay = args.delay
+    t0 = time.perf_counter()
+    out = p.search("stale", 10)
+    print(f"slow upstream, ttl expired: answered in {(time.perf_counter() - t0) * 1e3:.1f} ms "
+          f"with {len(out)} stale tracks, stats={p.stats}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
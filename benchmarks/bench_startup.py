@@ -0,0 +1,89 @@
+# benchmarks/bench_startup.py
+"""
+Cold-start cost of the Streamlit app, each measurement in a fresh interpreter:
+
+- import time of every app module (cumulative, from python -X importtime)
+- time to first paint: interpreter start until the login screen script run
+  finishes (driven headlessly through streamlit.testing), and the same for a
+  logged-in rerun, which is where the deferred imports are paid
+
+    python -m benchmarks.bench_startup [--runs 3]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+MODULES = ["db", "auth", "cache", "mood", "voice", "providers_spotify", "recommend", "service",
+           "analytics", "importer", "ranking", "moodspace", "streamlit"]
+
+FIRST_PAINT = """
+import sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, {root!r})
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app!r}, default_timeout=120)
+{setup}
+at.run()
+assert not at.exception, at.exception
+t1 = time.perf_counter()
+print("FIRST_PAINT", t1 - t0)
+heavy = [m for m in ("pandas", "matplotlib", "vaderSentiment", "speech_recognition", "numpy", "spotipy")
+         if m in sys.modules]
+print("LOADED", ",".join(heavy) or "-")
+"""
+
+LOGGED_IN = """
+import auth, db
+db.init_db()
+auth.signup("bench", "bench-pw")
+at.session_state["user"] = db.get_user("bench")["id"]
+at.session_state["username"] = "bench"
+"""
+
+
+def _import_ms(module):
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT,
+                         capture_output=True, text=True).stderr
+    for line in out.splitlines():
+        m = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\S+)$", line)
+        if m and m.group(2) == module:
+            return int(m.group(1)) / 1000
+    return float("nan")
+
+
+def _first_paint(setup, runs):
+    times, loaded = [], ""
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as d:  # appp.py uses the relative app.db
+            code = FIRST_PAINT.format(root=str(ROOT), app=str(ROOT / "appp.py"), setup=setup)
+            out = subprocess.run([sys.executable, "-c", code], cwd=d, capture_output=True, text=True,
+                                 env=dict(os.environ, AUTH_WORKERS="1")).stdout
+        for line in out.splitlines():
+            if line.startswith("FIRST_PAINT"):
+                times.append(float(line.split()[1]))
+            elif line.startswith("LOADED"):
+                loaded = line.split()[1]
+    return (statistics.median(times) * 1e3 if times else float("nan")), loaded
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=3)
+    args = ap.parse_args()
+
+    print("import time (cumulative, fresh interpreter each)")
+    for m in MODULES:
+        print(f"  {m:<20} {statistics.median(_import_ms(m) for _ in range(args.runs)):>8.1f} ms")
+    for label, setup in (("login screen", ""), ("logged-in page", LOGGED_IN)):
+        ms, loaded = _first_paint(setup, args.runs)
+        print(f"first paint, {label:<15} {ms:>8.0f} ms   heavy modules loaded: {loaded}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# benchmarks/bench_voice_decode.py
+"""
+Per-clip decode latency and peak RSS: the old temp-file + pydub WAV export
+path vs voice.decode_to_pcm (in-memory, ffmpeg pipe). Recognition is stubbed
+out so only decode is measured. Each measurement runs in a fresh subprocess;
+peak RSS includes the ffmpeg child.
+
+Needs ffmpeg on PATH (and pydub for the legacy column).
+
+    python -m benchmarks.bench_voice_decode [--seconds 10 60] [--formats wav mp3 m4a]
+"""
+import argparse
+import json
+import math
+import resource
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from pathlib import Path
+
+
+def legacy_decode(file_bytes, filename):
+    import speech_recognition as sr
+    from pydub import AudioSegment
+    suffix = Path(filename).suffix.lower()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_in:
+        tmp_in.write(file_bytes)
+        tmp_in_path = Path(tmp_in.name)
+    wav_path = tmp_in_path
+    if suffix != ".wav":
+        AudioSegment.from_file(tmp_in_path).export(tmp_in_path.with_suffix(".wav"), format="wav")
+        wav_path = tmp_in_path.with_suffix(".wav")
+    r = sr.Recognizer()
+    with sr.AudioFile(str(wav_path)) as source:
+        audio = r.record(source)
+    for p in {tmp_in_path, wav_path}:
+        p.unlink(missing_ok=True)
+    return audio
+
+
+def new_decode(file_bytes, filename):
+    import voice
+    return list(voice._chunks(voice.decode_to_pcm(file_bytes)))
+
+
+def _decoded_s(chunks):
+    import voice
+    return sum(len(c.frame_data) for c in chunks) / (voice.SAMPLE_RATE * voice.SAMPLE_WIDTH)
+
+
+def _make_clip(path, seconds, fmt):
+    """44.1 kHz stereo tone, encoded to `fmt` with ffmpeg."""
+    wav = path.with_suffix(".src.wav")
+    with wave.open(str(wav), "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(44100)
+        frame = [struct.pack("<hh", int(8000 * math.sin(i * 0.0627)), 0) for i in range(44100)]
+        w.writeframes(b"".join(frame) * seconds)
+    out = path.with_suffix("." + fmt)
+    subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-i", str(wav), str(out)], check=True)
+    return out
+
+
+def _worker(impl, clip, seconds):
+    data = Path(clip).read_bytes()
+    fn = legacy_decode if impl == "legacy" else new_decode
+    t0 = time.perf_counter()
+    out = fn(data, clip)
+    dt = time.perf_counter() - t0
+    # a decode that silently loses audio (e.g. an m4a read from a pipe) must not look fast
+    if impl == "new" and abs(_decoded_s(out) - seconds) > 0.5:
+        sys.exit(f"decoded {_decoded_s(out):.2f} s of a {seconds} s clip")
+    rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+              resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    print(json.dumps({"ms": dt * 1e3, "rss_mb": rss / 1024}))
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        return _worker(sys.argv[2], sys.argv[3], float(sys.argv[4]))
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seconds", type=int, nargs="+", default=[10, 60])
+    ap.add_argument("--formats", nargs="+", default=["wav", "mp3", "m4a"])
+    args = ap.parse_args()
+    if not shutil.which("ffmpeg"):
+        sys.exit("ffmpeg not found on PATH")
+
+    print(f"{'clip':<12}{'legacy ms':>12}{'legacy MB':>12}{'in-mem ms':>12}{'in-mem MB':>12}")
+    with tempfile.TemporaryDirectory() as d:
+        for secs in args.seconds:
+            for fmt in args.formats:
+                clip = _make_clip(Path(d) / f"clip{secs}", secs, fmt)
+                cells, errors = [], []
+                for impl in ("legacy", "new"):
+                    out = subprocess.run([sys.executable, "-m", "benchmarks.bench_voice_decode", "--worker",
+                                          impl, str(clip), str(secs)], capture_output=True, text=True)
+                    if out.returncode:
+                        cells += ["failed", "-"]
+                        errors.append(f"{impl}: {(out.stderr.strip().splitlines() or ['?'])[-1]}")
+                        continue
+                    res = json.loads(out.stdout.strip().splitlines()[-1])
+                    cells += [f"{res['ms']:.1f}", f"{res['rss_mb']:.1f}"]
+                print(f"{f'{secs}s {fmt}':<12}" + "".join(f"{c:>12}" for c in cells))
+                for e in errors:
+                    print(f"    {e}")
+
+
+if __name__ == "__main__":
+    main()
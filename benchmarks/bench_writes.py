@@ -0,0 +1,83 @@
+# benchmarks/bench_writes.py
+"""
+insert_mood on the click path: committed per call (DB_WRITE_MODE=sync) vs
+queued for the write-behind flusher (batched). Concurrent "users" insert
+rows back to back while an analytics reader polls latest_history_id; reports
+per-click latency and end-to-end rows/sec (including the final flush, so
+batched throughput only counts committed rows).
+
+    python -m benchmarks.bench_writes [--users 8] [--clicks 2000] [--readers 1]
+"""
+import argparse
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import db
+
+
+def _run(mode, users, clicks, readers):
+    db.WRITE_MODE = mode
+    latencies = [[] for _ in range(users)]
+    done = threading.Event()
+
+    def click(u):
+        out = latencies[u]
+        for i in range(clicks):
+            t0 = time.perf_counter()
+            db.insert_mood(u + 1, f"feeling good {i}", "happy", (0.6, 0.3))
+            out.append(time.perf_counter() - t0)
+
+    def read():
+        while not done.is_set():
+            db.latest_history_id(1)
+            time.sleep(0.01)
+
+    reader_threads = [threading.Thread(target=read) for _ in range(readers)]
+    for t in reader_threads:
+        t.start()
+    writers = [threading.Thread(target=click, args=(u,)) for u in range(users)]
+    t0 = time.perf_counter()
+    for t in writers:
+        t.start()
+    for t in writers:
+        t.join()
+    db.flush_writes()
+    elapsed = time.perf_counter() - t0
+    done.set()
+    for t in reader_threads:
+        t.join()
+
+    flat = sorted(x for per in latencies for x in per)
+    with db.conn_cursor() as (con, cur):
+        committed = cur.execute("SELECT COUNT(*) FROM mood_history").fetchone()[0]
+    assert committed == users * clicks, (committed, users * clicks)
+    return (users * clicks / elapsed, statistics.median(flat) * 1e3,
+            flat[int(len(flat) * 0.99) - 1] * 1e3, flat[-1] * 1e3)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=8)
+    ap.add_argument("--clicks", type=int, default=2000, help="inserts per user")
+    ap.add_argument("--readers", type=int, default=1)
+    args = ap.parse_args()
+
+    print(f"{args.users} users x {args.clicks} inserts, {args.readers} reader(s)")
+    print(f"{'mode':<8} {'rows/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for mode in ("sync", "batched"):
+        with tempfile.TemporaryDirectory() as d:
+            db.DB_PATH = Path(d) / "writes.db"
+            db.init_db()
+            with db.conn_cursor() as (con, cur):
+                cur.executemany("INSERT INTO users (username, password_hash) VALUES (?, '')",
+                                [(f"u{u}",) for u in range(args.users)])
+            rate, p50, p99, worst = _run(mode, args.users, args.clicks, args.readers)
+            print(f"{mode:<8} {rate:>9.0f} {p50:>8.3f} {p99:>8.3f} {worst:>8.1f}")
+            db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+# benchmarks/datagen.py
+"""
+Reproducible synthetic data for the benchmark suite: song catalogs (10k to
+10M rows), users and multi-year mood_history / listening events, all from
+one seed.
+
+The shapes follow what a real library looks like rather than uniform noise:
+artists are Zipf-distributed (a few artists own most of the catalog), moods
+are skewed towards happy/energetic, some titles are re-releases ("Remastered",
+"feat.") of others, part of the catalog carries valence/arousal and a URL.
+Users' activity is log-normal with a personal mood mix, history
+timestamps follow a daily cycle, and song plays favour popular songs.
+
+    python -m benchmarks.datagen --db bench.db [--songs 1000000] [--users 1000] [--years 3]
+    python -m benchmarks.datagen --csv catalog.csv --songs 10000000
+"""
+import argparse
+import csv
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+import auth
+import db
+
+SEED = 20240601
+CHUNK = 100_000
+MOOD_WEIGHTS = {"happy": 0.30, "energetic": 0.25, "calm": 0.20, "sad": 0.15, "neutral": 0.10}
+ARTIST_ZIPF = 0.8          # artist rank r gets weight 1 / r**ARTIST_ZIPF
+SONGS_PER_ARTIST = 20      # catalog size / this = number of artists
+VECTOR_SHARE = 0.4         # songs with valence/arousal
+URL_SHARE = 0.3            # songs with a YouTube URL (the rest get a search link)
+VARIANT_SHARE = 0.02       # "Remastered" / "feat." re-releases of an earlier title
+HOURLY = np.array([1, 1, 1, 1, 1, 2, 4, 6, 7, 6, 5, 5, 6, 5, 5, 5, 6, 7, 8, 9, 9, 7, 4, 2], dtype=float)
+EVENT_MIX = {"play": 0.80, "skip": 0.15, "like": 0.05}
+PASSWORD = "bench-pw"
+
+WORDS = ("love night heart summer dance fire rain dream city lights blue gold river road home sky wild "
+         "young forever alone together midnight morning sun moon stars ocean storm highway echo shadow "
+         "golden electric paper glass silver broken sweet cold warm lost found running falling rising "
+         "dancing waiting burning shining slow fast deep high low little big last first only every "
+         "nothing something tonight yesterday tomorrow paradise heaven thunder velvet neon crystal "
+         "diamond ghost angel devil queen king rebel lover stranger friend baby honey sugar cherry").split()
+NAMES = ("the black white red neon crystal silver velvet arctic electric lunar royal wild young golden "
+         "midnight echo paper glass iron atlas nova luna aurora sierra indigo violet ivory").split()
+SUFFIXES = ("band boys kids club collective project orchestra brothers sisters society lights machine "
+            "parade hearts wolves tigers foxes").split()
+PHRASES = {
+    "happy": ["can't stop smiling today", "best day ever with my friends", "so happy about the news",
+              "feeling great and grateful"],
+    "energetic": ["feeling pumped for my workout", "party at the beach later!", "let's go, gym time",
+                  "hyped for the concert tonight"],
+    "calm": ["meditating before bed", "slow sunday morning with coffee", "just want to relax and read",
+             "peaceful walk in the park"],
+    "sad": ["so tired after a long day at work", "rainy sunday, missing home", "stressed about exams next week",
+            "feeling lonely tonight"],
+    "neutral": ["a pretty normal tuesday honestly", "commuting to work", "doing some chores", "just browsing"],
+}
+
+
+def _rng(seed=SEED):
+    return np.random.default_rng(seed)
+
+
+def _zipf_weights(n, s):
+    w = 1.0 / np.arange(1, n + 1) ** s
+    return w / w.sum()
+
+
+def _artists(n, rng):
+    first = rng.choice(NAMES, n)
+    second = rng.choice(WORDS, n)
+    third = rng.choice(SUFFIXES, n)
+    return [f"{a} {b} {c}".title() if i % 3 else f"{b} {c}".title()
+            for i, (a, b, c) in enumerate(zip(first, second, third))]
+
+
+def iter_catalog(n, seed=SEED, chunk=CHUNK):
+    """
+    Yield lists of (title, artist, mood, url, valence, arousal) rows, `chunk`
+    at a time, n in total. Deterministic for a given (n, seed); a small share
+    collide on (title, artist, mood) and are skipped on insert.
+    """
+    rng = _rng(seed)
+    artists = _artists(max(10, n // SONGS_PER_ARTIST), rng)
+    artist_p = _zipf_weights(len(artists), ARTIST_ZIPF)
+    moods = np.array(list(MOOD_WEIGHTS))
+    mood_p = np.array(list(MOOD_WEIGHTS.values()))
+    centres = np.array([db.MOOD_POINTS[m] for m in moods])
+    words = np.array(WORDS)
+    recent = []  # earlier titles that re-releases copy
+    for start in range(0, n, chunk):
+        m = min(chunk, n - start)
+        a = rng.choice(len(artists), m, p=artist_p)
+        mi = rng.choice(len(moods), m, p=mood_p)
+        nwords = rng.integers(2, 6, m)
+        w = words[rng.integers(0, len(words), (m, 5))]
+        has_vec = rng.random(m) < VECTOR_SHARE
+        vec = np.clip(centres[mi] + rng.normal(0, 0.2, (m, 2)), -1, 1).round(3)
+        has_url = rng.random(m) < URL_SHARE
+        ids = rng.integers(0, 62 ** 6, m)
+        variant = rng.random(m) < VARIANT_SHARE
+        rows = []
+        for i in range(m):
+            if variant[i] and recent:
+                title = recent[i % len(recent)] + (" - Remastered" if i % 2 else f" (feat. {artists[a[(i + 1) % m]]})")
+            else:
+                title = " ".join(w[i, :nwords[i]]).title()
+                if i % 997 == 0:
+                    recent = (recent + [title])[-64:]
+            url = f"https://www.youtube.com/watch?v={ids[i]:011x}" if has_url[i] else None
+            v, r = (float(vec[i, 0]), float(vec[i, 1])) if has_vec[i] else (None, None)
+            rows.append((title, artists[a[i]], moods[mi[i]], url, v, r))
+        yield rows
+
+
+def load_catalog(n, seed=SEED, progress=None):
+    """Insert n generated songs through db.bulk_add_songs; returns how many were new."""
+    inserted = 0
+    for rows in iter_catalog(n, seed):
+        inserted += db.bulk_add_songs(rows)
+        if progress:
+            progress(inserted)
+    return inserted
+
+
+def write_catalog_csv(path, n, seed=SEED):
+    """The same catalog as importer input (title,artist,mood,url,valence,arousal)."""
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["title", "artist", "mood", "url", "valence", "arousal"])
+        for rows in iter_catalog(n, seed):
+            w.writerows(("" if v is None else v for v in r) for r in rows)
+    return path
+
+
+def load_users(n, password=PASSWORD, prefix="user"):
+    """
+    n users named <prefix>0..; all share one bcrypt hash of `password`, so
+    they can log in without paying for n hashes here. Returns their ids.
+    """
+    hashed = auth.hash_password(password)
+    with db.conn_cursor() as (con, cur):
+        cur.executemany("INSERT OR IGNORE INTO users (username, password_hash) VALUES (?,?)",
+                        [(f"{prefix}{i}", hashed) for i in range(n)])
+        return [r[0] for r in cur.execute("SELECT id FROM users WHERE username LIKE ? ORDER BY id",
+                                          (f"{prefix}%",)).fetchall()]
+
+
+def _activity(n_users, rng):
+    w = rng.lognormal(0, 1.0, n_users)  # a few heavy users, a long tail of light ones
+    return w / w.sum()
+
+
+def load_history(user_ids, rows, years=2.0, seed=SEED, end=None, chunk=CHUNK):
+    """
+    `rows` mood_history rows over the last `years`, in time order, straight
+    into the table (the rollup triggers fire as for live inserts). Each user
+    has a personal mood mix; timestamps follow HOURLY.
+    """
+    rng = _rng(seed + 1)
+    end = end or datetime.utcnow().replace(microsecond=0)
+    span = years * 365 * 86400
+    users = np.array(user_ids)
+    activity = _activity(len(users), rng)
+    mix = rng.dirichlet(np.ones(len(MOOD_WEIGHTS)) * 0.8, len(users))
+    moods = list(MOOD_WEIGHTS)
+    centres = np.array([db.MOOD_POINTS[m] for m in moods])
+    hours = HOURLY / HOURLY.sum()
+    start = end - timedelta(seconds=span)
+    for lo in range(0, rows, chunk):
+        m = min(chunk, rows - lo)
+        # this chunk covers its own slice of the period, so ids grow with time
+        days = np.sort(rng.uniform(lo / rows, (lo + m) / rows, m)) * span // 86400
+        secs = days * 86400 + rng.choice(24, m, p=hours) * 3600 + rng.integers(0, 3600, m)
+        secs.sort()
+        u = rng.choice(len(users), m, p=activity)
+        mi = (rng.random((m, 1)) > mix[u].cumsum(axis=1)).sum(axis=1).clip(0, len(moods) - 1)
+        vec = np.clip(centres[mi] + rng.normal(0, 0.15, (m, 2)), -1, 1).round(3)
+        pick = rng.integers(0, 4, m)
+        batch = [(int(users[u[i]]), PHRASES[moods[mi[i]]][pick[i]], moods[mi[i]], float(vec[i, 0]), float(vec[i, 1]),
+                  (start + timedelta(seconds=float(secs[i]))).strftime("%Y-%m-%d %H:%M:%S")) for i in range(m)]
+        with db.conn_cursor() as (con, cur):
+            cur.executemany("INSERT INTO mood_history (user_id, text_input, detected_mood, valence, arousal, "
+                            "created_at) VALUES (?,?,?,?,?,?)", batch)
+
+
+def load_events(user_ids, n, years=2.0, seed=SEED, chunk=CHUNK):
+    """n play/skip/like events; popular songs (low Zipf rank over a shuffled id order) get most plays."""
+    rng = _rng(seed + 2)
+    with db.conn_cursor() as (con, cur):
+        song_ids = np.array([r[0] for r in cur.execute("SELECT id FROM songs").fetchall()])
+    if not len(song_ids) or not n:
+        return
+    rng.shuffle(song_ids)
+    song_p = _zipf_weights(len(song_ids), 0.9)
+    users = np.array(user_ids)
+    activity = _activity(len(users), rng)
+    kinds = list(EVENT_MIX)
+    now = time.time()
+    for lo in range(0, n, chunk):
+        m = min(chunk, n - lo)
+        s = song_ids[rng.choice(len(song_ids), m, p=song_p)]
+        u = users[rng.choice(len(users), m, p=activity)]
+        k = rng.choice(len(kinds), m, p=list(EVENT_MIX.values()))
+        at = np.sort(now - rng.uniform(0, years * 365 * 86400, m))
+        db.bulk_record_events([(int(u[i]), int(s[i]), kinds[k[i]], int(at[i])) for i in range(m)])
+
+
+def build(path, songs=100_000, users=200, years=2.0, history=200_000, events=100_000, seed=SEED, log=print):
+    """Create (or extend) the database at `path` with the full synthetic data set; returns a summary."""
+    db.DB_PATH = Path(path)
+    db.init_db()
+    t0 = time.perf_counter()
+    out = {"songs": load_catalog(songs, seed)}
+    log(f"  {out['songs']} songs in {time.perf_counter() - t0:.1f}s")
+    t1 = time.perf_counter()
+    ids = load_users(users)
+    out["users"] = len(ids)
+    load_history(ids, history, years, seed)
+    out["history"] = history
+    log(f"  {len(ids)} users, {history} history rows over {years:g} years in {time.perf_counter() - t1:.1f}s")
+    t1 = time.perf_counter()
+    load_events(ids, events, years, seed)
+    out["events"] = events
+    log(f"  {events} listening events in {time.perf_counter() - t1:.1f}s")
+    with db.conn_cursor() as (con, cur):
+        cur.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    out["seconds"] = round(time.perf_counter() - t0, 2)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Generate a synthetic catalog / user / history data set.")
+    ap.add_argument("--db", type=Path, help="database to create or extend")
+    ap.add_argument("--csv", type=Path, help="write the catalog as an importer CSV instead")
+    ap.add_argument("--songs", type=int, default=1_000_000)
+    ap.add_argument("--users", type=int, default=1000)
+    ap.add_argument("--years", type=float, default=3)
+    ap.add_argument("--history", type=int, default=None, help="default: 500 rows per user per year")
+    ap.add_argument("--events", type=int, default=None, help="default: 2 per song")
+    ap.add_argument("--seed", type=int, default=SEED)
+    args = ap.parse_args()
+    if not args.db and not args.csv:
+        ap.error("give --db and/or --csv")
+    if args.csv:
+        t0 = time.perf_counter()
+        write_catalog_csv(args.csv, args.songs, args.seed)
+        print(f"{args.songs} rows -> {args.csv} in {time.perf_counter() - t0:.1f}s")
+    if args.db:
+        history = args.history if args.history is not None else int(args.users * args.years * 500)
+        events = args.events if args.events is not None else 2 * args.songs
+        print(f"building {args.db}")
+        print(build(args.db, args.songs, args.users, args.years, history, events, args.seed))
+        db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
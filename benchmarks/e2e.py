@@ -0,0 +1,138 @@
+# benchmarks/e2e.py
+"""
+Headless end-to-end scenario: appp.py driven through streamlit.testing by
+concurrent simulated sessions against the generated data set.
+
+Each session paints the login screen, logs in as one of the generated users
+(a real bcrypt check), then repeats: type a mood and Generate, like the top
+"Picked for you" track, page with "More like this", search the library and
+rerun idly. Every step is one script run and is timed on its own.
+
+AppTest keeps its mock runtime in a process-wide global that every run
+clears when it finishes, so two sessions cannot run in one process at the
+same time. Each concurrent session slot is therefore a worker interpreter
+(all on the same database file, like several app workers behind a proxy).
+A worker logs in once untimed first, so imports are not counted.
+
+    python -m benchmarks.suite --only e2e
+"""
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import db
+from benchmarks import datagen
+from benchmarks.micro import calibrate, summarize
+
+ROOT = Path(__file__).resolve().parent.parent
+APP = str(ROOT / "appp.py")
+STEPS = ("first_paint", "login", "generate", "like", "more", "search", "rerun")
+TEXTS = [p for ps in datagen.PHRASES.values() for p in ps]
+QUERIES = ["love", "midnight ci", "summr kids", "golden river", "neon"]
+
+
+def _button(at, label):
+    return next((b for b in at.button if b.label == label), None)
+
+
+def _session(i, users, rounds, times):
+    from streamlit.testing.v1 import AppTest
+
+    def step(name, fn):
+        t0 = time.perf_counter()
+        at = fn()
+        times[name].append(time.perf_counter() - t0)
+        if at.exception:
+            raise RuntimeError(f"{name}: {at.exception[0].message}")
+
+    t0 = time.perf_counter()
+    at = AppTest.from_file(APP, default_timeout=120)
+    step("first_paint", at.run)
+    step("login", _login(at, f"user{i % users}").run)
+    for r in range(rounds):
+        at.text_input[0].input(TEXTS[(i + r) % len(TEXTS)])
+        step("generate", _button(at, "Generate Playlist").click().run)
+        like = _button(at, "👍")
+        if like is not None:
+            step("like", like.click().run)
+        more = _button(at, "More like this")
+        if more is not None:
+            step("more", more.click().run)
+        next(t for t in at.text_input if "Search" in t.label).input(QUERIES[(i + r) % len(QUERIES)])
+        step("search", at.run)
+        step("rerun", at.run)
+    return time.perf_counter() - t0
+
+
+def _login(at, username):
+    at.text_input(key="login_user").input(username)
+    at.text_input(key="login_pass").input(datagen.PASSWORD)
+    return _button(at, "Login").click()
+
+
+def _worker(db_path, sessions, users, rounds):
+    """One worker interpreter: its share of the sessions, one after another."""
+    from streamlit.runtime.scriptrunner_utils import script_run_context
+    from streamlit.testing.v1 import AppTest
+    # AppTest touches session state outside a script run: harmless, but logged for every session.
+    # A filter, because Streamlit resets its loggers' levels when it loads its config.
+    logging.getLogger(script_run_context.__name__).addFilter(lambda r: "ScriptRunContext" not in r.getMessage())
+    db.DB_PATH = Path(db_path)
+    _login(AppTest.from_file(APP, default_timeout=120).run(), "user0").run()  # warm-up, untimed
+    times, totals = {s: [] for s in STEPS}, []
+    start = time.time()
+    for i in sessions:
+        totals.append(_session(i, users, rounds, times))
+    return {"times": times, "totals": totals, "start": start, "end": time.time()}
+
+
+def run(sessions=8, concurrency=4, rounds=3, users=50, log=print):
+    """
+    `sessions` sessions, `concurrency` at a time, against the database at
+    db.DB_PATH (users user0..user<users-1> with datagen.PASSWORD). Returns
+    {"e2e.<step>": summary, "e2e.session": summary, "e2e.throughput": {...}}.
+    """
+    db.flush_writes()
+    times, totals, spans = {s: [] for s in STEPS}, [], []
+    cal = calibrate()
+    slots = [s for s in (list(range(w, sessions, concurrency)) for w in range(concurrency)) if s]
+    path = str(Path(db.DB_PATH).resolve())
+    with tempfile.TemporaryDirectory() as d:  # cwd for anything that resolves app.db relatively
+        # one session at a time per worker: one bcrypt thread is enough
+        env = dict(os.environ, AUTH_WORKERS="1",
+                   PYTHONPATH=os.pathsep.join(filter(None, [str(ROOT), os.getenv("PYTHONPATH")])))
+        procs = [subprocess.Popen([sys.executable, "-m", "benchmarks.e2e", path, str(users), str(rounds),
+                                   *map(str, s)], cwd=d, env=env, stdout=subprocess.PIPE, text=True)
+                 for s in slots]
+        for p in procs:
+            out = p.communicate()[0]
+            if p.returncode:
+                raise RuntimeError(f"e2e worker exited with {p.returncode}")
+            res = json.loads(out.strip().splitlines()[-1])
+            for name, values in res["times"].items():
+                times[name] += values
+            totals += res["totals"]
+            spans.append((res["start"], res["end"]))
+    wall = max(e for _, e in spans) - min(s for s, _ in spans)
+    cal = min(cal, calibrate())
+    results = {f"e2e.{s}": summarize(t, calibration_ms=cal) for s, t in times.items() if t}
+    results["e2e.session"] = summarize(totals, calibration_ms=cal)
+    results["e2e.throughput"] = {"sessions": sessions, "concurrency": len(slots), "rounds": rounds,
+                                 "script_runs_per_s": round(sum(map(len, times.values())) / wall, 2),
+                                 "wall_s": round(wall, 2)}
+    for name, r in results.items():
+        if "p50_ms" in r:
+            log(f"  {name:<44} p50 {r['p50_ms']:>10.1f} ms   p95 {r['p95_ms']:>10.1f} ms   ({r['calls']} runs)")
+    log(f"  {results['e2e.throughput']['script_runs_per_s']} script runs/s over {wall:.1f}s "
+        f"({sessions} sessions, {len(slots)} concurrent)")
+    return results
+
+
+if __name__ == "__main__":
+    db_path, users, rounds, *ids = sys.argv[1:]
+    print(json.dumps(_worker(db_path, [int(i) for i in ids], int(users), int(rounds))))
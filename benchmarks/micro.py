@@ -0,0 +1,503 @@
+# benchmarks/micro.py
+"""
+Micro-benchmarks for the suite: mood detection, every public db.py
+function, the request path (service / ranking / mood space), track
+conversion, the CSV import, the analytics aggregation and its charts.
+
+Each case is a function registered with @case that does its setup against
+the generated data set and returns the zero-argument operation to time.
+Cases run in registration order: reads first, then writes, and the
+destructive ones (rebuilds, delete_all_songs) last, so earlier numbers see
+the data set as generated.
+
+    python -m benchmarks.suite --only micro
+"""
+import hashlib
+import inspect
+import itertools
+import random
+import statistics
+import time
+from pathlib import Path
+
+import db
+from benchmarks import datagen
+
+CASES = []
+BUDGET_S = 0.5       # per case: stop after this long ...
+MIN_CALLS = 5        # ... but never before this many calls
+# db.py functions that are not meaningful to time in isolation
+NOT_TIMED = {"db.close_pool": "interpreter teardown", "db.close_writers": "interpreter teardown"}
+
+
+def case(name, calls=200, warmup=True):
+    """Register fn(ctx) -> op as benchmark `name` ("module.function[variant]"), timed over up to `calls` calls."""
+    def register(fn):
+        CASES.append((name, fn, calls, warmup))
+        return fn
+    return register
+
+
+def calibrate(reps=5, n=10_000):
+    """
+    Median ms of a fixed CPU-bound workload (sorting, hashing, dict churn):
+    how fast the machine is right now. Stored next to each result so
+    comparisons can factor out a machine that is busier than it was.
+    """
+    times = []
+    for _ in range(reps):
+        rnd = random.Random(0)
+        t0 = time.perf_counter()
+        data = sorted(rnd.random() for _ in range(n))
+        d = {i: hashlib.sha1(str(x).encode()).hexdigest() for i, x in enumerate(data)}
+        sum(len(v) for v in d.values())
+        times.append(time.perf_counter() - t0)
+    return round(statistics.median(times) * 1e3, 3)
+
+
+def timeit(op, calls, budget_s=BUDGET_S, warmup=True):
+    """Per-call wall times (seconds) of op(): one warm-up call, then up to `calls` or budget_s."""
+    if warmup:
+        op()
+    times, deadline = [], time.perf_counter() + budget_s
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        op()
+        t1 = time.perf_counter()
+        times.append(t1 - t0)
+        if t1 > deadline and len(times) >= MIN_CALLS:
+            break
+    return times
+
+
+def summarize(times, unit_rows=None, calibration_ms=None):
+    """Latency summary in ms as stored in the results JSON."""
+    s = sorted(times)
+    out = {"calls": len(s), "p50_ms": statistics.median(s) * 1e3,
+           "p95_ms": s[min(len(s) - 1, int(0.95 * len(s)))] * 1e3,
+           "mean_ms": statistics.fmean(s) * 1e3, "max_ms": s[-1] * 1e3}
+    if unit_rows:
+        out["rows_per_s"] = unit_rows / statistics.median(s)
+    if calibration_ms:
+        out["calibration_ms"] = calibration_ms
+    return {k: round(v, 4) if isinstance(v, float) else v for k, v in out.items()}
+
+
+def uncovered():
+    """Public db.py functions that no case times (NOT_TIMED aside)."""
+    public = {f"db.{n}" for n, f in inspect.getmembers(db, inspect.isfunction)
+              if not n.startswith("_") and f.__module__ == "db"}
+    covered = {c[0].split("[")[0] for c in CASES}
+    return sorted(public - covered - set(NOT_TIMED))
+
+
+def run(ctx, only=None, log=print):
+    """Time every registered case (or those whose name starts with one of `only`); returns {name: summary}."""
+    results = {}
+    for name, fn, calls, warmup in CASES:
+        if only and not name.startswith(tuple(only)):
+            continue
+        made = fn(ctx)
+        op, rows = made if isinstance(made, tuple) else (made, None)
+        db.flush_writes()
+        cal = calibrate()
+        results[name] = summarize(timeit(op, calls, warmup=warmup), rows, cal)
+        r = results[name]
+        log(f"  {name:<44} p50 {r['p50_ms']:>10.3f} ms   p95 {r['p95_ms']:>10.3f} ms   ({r['calls']} calls)")
+    return results
+
+
+def _cycle(items):
+    it = itertools.cycle(list(items))
+    return lambda: next(it)
+
+
+# ---------- mood ----------
+@case("mood.detect_mood[cached]", 5000)
+def _(ctx):
+    import mood
+    return lambda: mood.detect_mood("feeling pumped for my workout")
+
+
+@case("mood.detect_mood[cold]", 2000)
+def _(ctx):
+    import mood
+    n = itertools.count()
+    return lambda: mood.detect_mood(f"so tired after a long day at work, take {next(n)}")
+
+
+@case("mood.detect_moods[1000 texts]", 50)
+def _(ctx):
+    import mood
+    n = itertools.count()
+    phrases = [p for ps in datagen.PHRASES.values() for p in ps]
+
+    def op():
+        k = next(n)
+        mood.detect_moods([f"{phrases[i % len(phrases)]} {k}-{i % 500}" for i in range(1000)])
+    return op, 1000
+
+
+@case("mood.mood_vector[cold]", 2000)
+def _(ctx):
+    import mood
+    n = itertools.count()
+    return lambda: mood.mood_vector(f"party at the beach later! round {next(n)}")
+
+
+# ---------- db: connections and metadata ----------
+@case("db.get_pool", 5000)
+def _(ctx):
+    return db.get_pool
+
+
+@case("db.conn_cursor", 5000)
+def _(ctx):
+    def op():
+        with db.conn_cursor():
+            pass
+    return op
+
+
+@case("db.schema_version", 2000)
+def _(ctx):
+    return db.schema_version
+
+
+@case("db.init_db_once", 5000)
+def _(ctx):
+    return db.init_db_once
+
+
+@case("db.init_db", 200)
+def _(ctx):
+    return db.init_db
+
+
+@case("db.normalize_mood", 5000)
+def _(ctx):
+    return lambda: db.normalize_mood(" Happy ")
+
+
+@case("db.library_version", 2000)
+def _(ctx):
+    return db.library_version
+
+
+@case("db.catalog_state", 2000)
+def _(ctx):
+    return db.catalog_state
+
+
+@case("db.rollups_version", 2000)
+def _(ctx):
+    return db.rollups_version
+
+
+@case("db.get_checkpoint", 2000)
+def _(ctx):
+    return lambda: db.get_checkpoint("bench")
+
+
+# ---------- db: reads ----------
+@case("db.get_user", 2000)
+def _(ctx):
+    names = _cycle(f"user{i}" for i in range(len(ctx["users"])))
+    return lambda: db.get_user(names())
+
+
+@case("db.get_mood_history[heavy user]", 100)
+def _(ctx):
+    return lambda: db.get_mood_history(ctx["heavy"], limit=1000), 1000
+
+
+@case("db.iter_mood_history[heavy user]", 100)
+def _(ctx):
+    return lambda: sum(1 for _ in db.iter_mood_history(ctx["heavy"], limit=1000)), 1000
+
+
+@case("db.latest_history_id", 2000)
+def _(ctx):
+    users = _cycle(ctx["users"])
+    return lambda: db.latest_history_id(users())
+
+
+@case("db.get_mood_rollup[W]", 500)
+def _(ctx):
+    return lambda: db.get_mood_rollup(ctx["heavy"], "W")
+
+
+@case("db.fetch_songs_by_mood", 1000)
+def _(ctx):
+    moods = _cycle(db.MOODS)
+    return lambda: db.fetch_songs_by_mood(moods(), limit=30), 30
+
+
+@case("db.sample_songs_by_mood", 500)
+def _(ctx):
+    moods = _cycle(db.MOODS)
+    return lambda: db.sample_songs_by_mood(moods(), k=50, max_per_artist=3), 50
+
+
+@case("db.new_playlist_cursor", 2000)
+def _(ctx):
+    moods = _cycle(db.MOODS)
+    return lambda: db.new_playlist_cursor(moods())
+
+
+@case("db.fetch_songs_page", 500)
+def _(ctx):
+    cursors = _cycle([(m, db.new_playlist_cursor(m)) for m in db.MOODS])
+
+    def op():
+        m, c = cursors()
+        return db.fetch_songs_page(m, limit=50, cursor=c, max_per_artist=3)
+    return op, 50
+
+
+@case("db.artist_key", 5000)
+def _(ctx):
+    return lambda: db.artist_key(" Édith Piaf ")
+
+
+@case("db.parse_playlist_cursor", 5000)
+def _(ctx):
+    return lambda: db.parse_playlist_cursor("1200:1250")
+
+
+@case("db.fetch_songs_by_ids[50]", 1000)
+def _(ctx):
+    ids = ctx["song_ids"]
+    pages = _cycle(ids[i:i + 50] for i in range(0, len(ids) - 50, 50))
+    return lambda: db.fetch_songs_by_ids(pages()), 50
+
+
+@case("db.search_songs[prefix]", 300)
+def _(ctx):
+    queries = _cycle(["love", "midnight ci", "summer kids", "golden ri", "neon"])
+    return lambda: db.search_songs(queries())
+
+
+@case("db.search_songs[typo]", 200)
+def _(ctx):
+    queries = _cycle(["midnigt city", "summr kids", "goldn river", "electrc dream"])
+    return lambda: db.search_songs(queries())
+
+
+@case("db.latest_event_id", 2000)
+def _(ctx):
+    users = _cycle(ctx["users"])
+    return lambda: db.latest_event_id(users())
+
+
+@case("db.get_user_affinity[heavy user]", 500)
+def _(ctx):
+    return lambda: db.get_user_affinity(ctx["heavy"])
+
+
+@case("db.fetch_mood_partition", 10)
+def _(ctx):
+    return lambda: db.fetch_mood_partition("happy")
+
+
+@case("db.iter_song_points[full scan]", 5)
+def _(ctx):
+    return lambda: sum(len(b) for b in db.iter_song_points()), ctx["songs"]
+
+
+# ---------- request path ----------
+@case("providers_youtube.tracks_from_db_rows[50]", 2000)
+def _(ctx):
+    from providers_youtube import tracks_from_db_rows
+    rows = db.fetch_songs_page("happy", limit=50)[0]
+    return lambda: tracks_from_db_rows(rows), 50
+
+
+@case("ranking.rank", 200)
+def _(ctx):
+    import ranking
+    users = _cycle(ctx["users"])
+    return lambda: ranking.rank(users(), "happy", k=50, max_per_artist=3)
+
+
+@case("moodspace.nearest_songs", 1000)
+def _(ctx):
+    import moodspace
+    points = _cycle(db.MOOD_POINTS.values())
+    return lambda: moodspace.nearest_songs(points(), k=20)
+
+
+@case("service.playlist", 200)
+def _(ctx):
+    import service
+    users = _cycle(ctx["users"])
+    return lambda: service.playlist("energetic", user_id=users(), vector=(0.5, 0.7))
+
+
+# ---------- analytics ----------
+@case("analytics.rollup_frame[W, heavy user]", 200)
+def _(ctx):
+    from analytics import rollup_frame
+    return lambda: rollup_frame(db.get_mood_rollup(ctx["heavy"], "W"))
+
+
+@case("charts.mood_chart[W, png]", 10)
+def _(ctx):
+    import charts
+    return lambda: charts.mood_chart(ctx["heavy"], "W", "png")
+
+
+@case("charts.mood_chart[W, vega]", 200)
+def _(ctx):
+    import charts
+    return lambda: charts.mood_chart(ctx["heavy"], "W", "vega")
+
+
+@case("archive.mood_counts[all time]", 200)
+def _(ctx):
+    import archive
+    users = _cycle(ctx["users"])
+    return lambda: archive.mood_counts(users())
+
+
+# ---------- db: writes ----------
+@case("db.insert_mood[sync]", 500)
+def _(ctx):
+    def op():
+        db.WRITE_MODE, mode = "sync", db.WRITE_MODE
+        try:
+            db.insert_mood(ctx["heavy"], "so happy today", "happy", (0.6, 0.3))
+        finally:
+            db.WRITE_MODE = mode
+    return op
+
+
+@case("db.insert_mood[batched]", 5000)
+def _(ctx):
+    return lambda: db.insert_mood(ctx["heavy"], "so happy today", "happy", (0.6, 0.3))
+
+
+@case("db.flush_writes[500 queued]", 50)
+def _(ctx):
+    def op():
+        for _ in range(500):  # timed together with the flush: queueing is part of the batched path
+            db.insert_mood(ctx["heavy"], "rainy sunday", "sad", (-0.6, -0.3))
+        db.flush_writes()
+    return op, 500
+
+
+@case("service.detect_user_mood", 1000)
+def _(ctx):
+    import service
+    users = _cycle(ctx["users"])
+    n = itertools.count()
+    return lambda: service.detect_user_mood(users(), f"hyped for the concert tonight {next(n)}", "Hype")
+
+
+@case("db.add_user", 500)
+def _(ctx):
+    n = itertools.count()
+    return lambda: db.add_user(f"bench-new-{next(n)}", "x")
+
+
+@case("db.update_password_hash", 1000)
+def _(ctx):
+    users = _cycle(ctx["users"])
+    return lambda: db.update_password_hash(users(), ctx["password_hash"])
+
+
+@case("db.set_checkpoint", 2000)
+def _(ctx):
+    n = itertools.count()
+
+    def op():
+        with db.conn_cursor() as (con, cur):
+            db.set_checkpoint(cur, "bench", next(n))
+    return op
+
+
+@case("db.clear_checkpoint", 2000)
+def _(ctx):
+    return lambda: db.clear_checkpoint("bench")
+
+
+@case("db.record_event", 1000)
+def _(ctx):
+    users, songs = _cycle(ctx["users"]), _cycle(ctx["song_ids"])
+    kinds = _cycle(["play", "play", "skip", "like"])
+    return lambda: db.record_event(users(), songs(), kinds())
+
+
+@case("db.bulk_record_events[1000]", 50)
+def _(ctx):
+    users, songs = ctx["users"], ctx["song_ids"]
+    now = int(time.time())
+    rows = [(users[i % len(users)], songs[i % len(songs)], "play", now) for i in range(1000)]
+    return lambda: db.bulk_record_events(rows), 1000
+
+
+@case("db.add_song", 1000)
+def _(ctx):
+    n = itertools.count()
+    return lambda: db.add_song(f"Bench Single {next(n)}", "Bench Artist", "calm", None, (0.3, -0.6))
+
+
+@case("db.bulk_add_songs[1000]", 30)
+def _(ctx):
+    n = itertools.count()
+
+    def op():
+        k = next(n)
+        db.bulk_add_songs([(f"Bench Album {k} Track {i}", f"Bench Band {i % 7}", db.MOODS[i % 5], None)
+                           for i in range(1000)])
+    return op, 1000
+
+
+@case("db.delete_songs[100]", 30)
+def _(ctx):
+    n = itertools.count()
+    for k in range(40):
+        db.bulk_add_songs([(f"Bench Doomed {k}-{i}", "Bench Doomed", "sad", None) for i in range(100)])
+    with db.conn_cursor() as (con, cur):
+        ids = [r[0] for r in cur.execute("SELECT id FROM songs WHERE artist='Bench Doomed' ORDER BY id")]
+    batches = [ids[i:i + 100] for i in range(0, len(ids), 100)]
+    return lambda: db.delete_songs(batches[next(n)]), 100
+
+
+@case("importer.import_csv[50k rows]", 3)
+def _(ctx):
+    from importer import import_csv
+    src = datagen.write_catalog_csv(Path(ctx["tmp"]) / "import.csv", 50_000, seed=7)
+    n = itertools.count()
+
+    def op():
+        db.flush_writes()
+        main, db.DB_PATH = db.DB_PATH, Path(ctx["tmp"]) / f"import-{next(n)}.db"
+        try:
+            db.init_db()
+            import_csv(src)
+        finally:
+            db.close_pool()
+            db.DB_PATH = main
+    return op, 50_000
+
+
+# ---------- rebuilds and destructive ----------
+@case("db.rebuild_mood_rollups[one user]", 20)
+def _(ctx):
+    return lambda: db.rebuild_mood_rollups(ctx["heavy"])
+
+
+@case("db.rebuild_mood_rollups[all]", 3)
+def _(ctx):
+    return db.rebuild_mood_rollups, ctx["history"]
+
+
+@case("db.rebuild_scores", 3)
+def _(ctx):
+    return db.rebuild_scores, ctx["events"]
+
+
+@case("db.delete_all_songs", 1, warmup=False)
+def _(ctx):
+    return db.delete_all_songs, ctx["songs"]
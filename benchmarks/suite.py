@@ -0,0 +1,222 @@
+# benchmarks/suite.py
+"""
+Reproducible benchmark suite: generates a synthetic data set (benchmarks.
+datagen), runs the micro-benchmarks (benchmarks.micro) and the concurrent
+end-to-end Streamlit scenario (benchmarks.e2e) against it, writes the
+results as JSON and compares them with a stored baseline.
+
+A case is flagged as a regression when its p50 is more than --threshold
+slower than the baseline's and the difference exceeds --floor-ms (so
+microsecond-level noise is not flagged); the exit status is then 1. Just
+before each case a fixed pure-Python workload is timed too (micro.
+calibrate) and ratios are divided by how much that moved, so a machine
+that is busier or slower than when the baseline was taken does not flag
+everything. The baseline is only meaningful for the same profile / data
+size on the same machine; a mismatch is reported with the comparison.
+
+    python -m benchmarks.suite [--profile quick|default|large] [--songs N] [--only micro e2e]
+                               [--data bench.db] [--out results.json] [--save-baseline]
+    python -m benchmarks.suite --results results.json [--baseline other.json]   # compare only
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import db
+from benchmarks import datagen, e2e, micro
+
+ROOT = Path(__file__).resolve().parent.parent
+BASELINES = Path(__file__).resolve().parent / "baselines"
+RESULTS = Path(__file__).resolve().parent / "results"
+THRESHOLD = 0.25   # flag p50 more than 25% slower ...
+FLOOR_MS = 0.05    # ... and more than 50 us slower
+PROFILES = {
+    "quick": dict(songs=20_000, users=50, years=1, history=50_000, events=40_000,
+                  sessions=4, concurrency=2, rounds=2),
+    "default": dict(songs=100_000, users=200, years=2, history=200_000, events=200_000,
+                    sessions=8, concurrency=4, rounds=3),
+    "large": dict(songs=1_000_000, users=1000, years=3, history=1_500_000, events=2_000_000,
+                  sessions=16, concurrency=8, rounds=3),
+}
+
+
+def _git_rev():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _machine():
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "processor": platform.processor() or platform.machine()}
+
+
+def _context(tmp):
+    """What the micro cases need to know about the data set in db.DB_PATH."""
+    with db.conn_cursor() as (con, cur):
+        users = [r[0] for r in cur.execute("SELECT id FROM users WHERE username LIKE 'user%' ORDER BY id")]
+        heavy = cur.execute("SELECT user_id FROM mood_history GROUP BY user_id ORDER BY COUNT(*) DESC "
+                            "LIMIT 1").fetchone()
+        song_ids = [r[0] for r in cur.execute("SELECT id FROM songs ORDER BY random() LIMIT 2000")]
+        counts = {t: cur.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+                  for t in ("songs", "users", "mood_history", "song_events")}
+        password_hash = cur.execute("SELECT password_hash FROM users WHERE username='user0'").fetchone()
+    if not users or heavy is None or not song_ids or password_hash is None:
+        raise SystemExit("data set needs songs, users user0.. and mood_history (see benchmarks.datagen)")
+    return {"tmp": tmp, "users": users, "heavy": heavy[0], "song_ids": song_ids, "songs": counts["songs"],
+            "history": counts["mood_history"], "events": counts["song_events"],
+            "password_hash": password_hash[0], "counts": counts}
+
+
+def machine_scale(current, baseline):
+    """How much slower the machine ran the calibration than for the baseline (1.0 if unknown)."""
+    c, b = current.get("calibration_ms"), baseline.get("calibration_ms")
+    return c / b if c and b else 1.0
+
+
+def compare(current, baseline, threshold=THRESHOLD, floor_ms=FLOOR_MS):
+    """
+    Rows of (name, baseline p50, current p50, ratio, status) for every timed
+    case in either run; ratio and status are corrected by each case's machine_scale().
+    """
+    cur, base = current["results"], baseline["results"]
+    rows = []
+    for name in list(base) + [n for n in cur if n not in base]:
+        b, c = base.get(name, {}).get("p50_ms"), cur.get(name, {}).get("p50_ms")
+        if b is None and c is None:
+            continue
+        if b is None or c is None:
+            rows.append((name, b, c, None, "new" if b is None else "missing"))
+            continue
+        scale = machine_scale(cur[name], base[name])
+        ratio = c / (b * scale) if b else float("inf")
+        if ratio > 1 + threshold and c - b * scale > floor_ms:
+            status = "REGRESSION"
+        elif ratio < 1 / (1 + threshold) and b * scale - c > floor_ms:
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append((name, b, c, ratio, status))
+    return rows
+
+
+def _mismatch(current, baseline):
+    notes = []
+    for key in ("profile", "data"):
+        if current["meta"].get(key) != baseline["meta"].get(key):
+            notes.append(f"{key}: baseline {baseline['meta'].get(key)} vs now {current['meta'].get(key)}")
+    if current["meta"].get("machine") != baseline["meta"].get("machine"):
+        notes.append("recorded on a different machine / Python")
+    return notes
+
+
+def report(current, baseline, threshold=THRESHOLD, floor_ms=FLOOR_MS, log=print):
+    """Print the comparison; returns the names flagged as regressions."""
+    log(f"\ncompared with baseline from {baseline['meta'].get('created')} (rev {baseline['meta'].get('git')})")
+    for note in _mismatch(current, baseline):
+        log(f"  warning: {note}; the comparison is not like for like")
+    log(f"  calibration: this run {machine_scale(current['meta'], baseline['meta']):.2f}x the baseline's overall; "
+        "ratios are corrected per case")
+    rows = compare(current, baseline, threshold, floor_ms)
+    log(f"  {'case':<44} {'baseline':>12} {'now':>12} {'ratio':>7}")
+    for name, b, c, ratio, status in rows:
+        fmt = lambda v: "-" if v is None else f"{v:.3f} ms"
+        log(f"  {name:<44} {fmt(b):>12} {fmt(c):>12} {'' if ratio is None else f'{ratio:.2f}x':>7}  "
+            f"{'' if status == 'ok' else status}")
+    flagged = [r[0] for r in rows if r[4] == "REGRESSION"]
+    log(f"{len(flagged)} regression(s) beyond +{threshold:.0%} / {floor_ms} ms" +
+        (": " + ", ".join(flagged) if flagged else ""))
+    return flagged
+
+
+def run(settings, only=("micro", "e2e"), data=None, cases=None, log=print):
+    """Build (or copy) the data set in a temp dir, run the parts in `only`; returns the results document."""
+    doc = {"meta": {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "git": _git_rev(), "machine": _machine(),
+                    "settings": settings},
+           "results": {}}
+    calibration = [micro.calibrate()]
+    with tempfile.TemporaryDirectory() as d:
+        db.DB_PATH = Path(d) / "app.db"
+        if data:
+            shutil.copyfile(data, db.DB_PATH)
+            db.init_db()
+            log(f"data set copied from {data}")
+        else:
+            log("generating data set")
+            t0 = time.perf_counter()
+            datagen.build(db.DB_PATH, settings["songs"], settings["users"], settings["years"],
+                          settings["history"], settings["events"], log=log)
+            doc["meta"]["datagen_s"] = round(time.perf_counter() - t0, 1)
+        ctx = _context(d)
+        doc["meta"]["data"] = ctx["counts"]
+        if "e2e" in only:  # before the micro cases, which add rows and finally empty the catalog
+            log(f"end-to-end: {settings['sessions']} sessions, {settings['concurrency']} concurrent, "
+                f"{settings['rounds']} rounds each")
+            doc["results"].update(e2e.run(settings["sessions"], settings["concurrency"], settings["rounds"],
+                                          len(ctx["users"]), log=log))
+        if "micro" in only:
+            log("micro-benchmarks")
+            doc["results"].update(micro.run(ctx, cases, log=log))
+            doc["uncovered"] = micro.uncovered()
+            if doc["uncovered"]:
+                log("  db functions without a benchmark: " + ", ".join(doc["uncovered"]))
+        db.close_writers()
+        db.close_pool()
+    calibration.append(micro.calibrate())
+    doc["meta"]["calibration_ms"] = min(calibration)
+    doc["meta"]["calibration_runs_ms"] = calibration
+    return doc
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run the benchmark suite and compare with a baseline.")
+    ap.add_argument("--profile", choices=sorted(PROFILES), default="default")
+    for key in ("songs", "users", "history", "events", "sessions", "concurrency", "rounds"):
+        ap.add_argument(f"--{key}", type=int, help=f"override the profile's {key}")
+    ap.add_argument("--years", type=float, help="override the profile's years of history")
+    ap.add_argument("--only", nargs="+", choices=("micro", "e2e"), default=("micro", "e2e"))
+    ap.add_argument("--cases", nargs="+", help="micro cases whose name starts with one of these")
+    ap.add_argument("--data", type=Path, help="use a copy of this datagen database instead of generating")
+    ap.add_argument("--out", type=Path, help="results JSON (default: benchmarks/results/<profile>-<time>.json)")
+    ap.add_argument("--baseline", type=Path, help="default: benchmarks/baselines/<profile>.json")
+    ap.add_argument("--save-baseline", action="store_true", help="store this run as the profile's baseline")
+    ap.add_argument("--results", type=Path, help="compare this results file instead of running")
+    ap.add_argument("--threshold", type=float, default=THRESHOLD)
+    ap.add_argument("--floor-ms", type=float, default=FLOOR_MS)
+    args = ap.parse_args()
+
+    if args.results:
+        doc = json.loads(args.results.read_text())
+    else:
+        settings = dict(PROFILES[args.profile])
+        settings.update({k: v for k, v in vars(args).items() if k in settings and v is not None})
+        doc = run(settings, args.only, args.data, args.cases)
+        doc["meta"]["profile"] = args.profile
+        out = args.out or RESULTS / f"{args.profile}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(json.dumps(doc, indent=1, sort_keys=True))
+        print(f"\nresults written to {out}")
+
+    baseline = args.baseline or BASELINES / f"{doc['meta'].get('profile', args.profile)}.json"
+    if args.save_baseline:
+        baseline.parent.mkdir(parents=True, exist_ok=True)
+        baseline.write_text(json.dumps(doc, indent=1, sort_keys=True))
+        print(f"baseline saved to {baseline}")
+    elif baseline.exists():
+        if report(doc, json.loads(baseline.read_text()), args.threshold, args.floor_ms):
+            sys.exit(1)
+    else:
+        print(f"no baseline at {baseline}; store one with --save-baseline")
+
+
+if __name__ == "__main__":
+    main()
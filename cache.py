@@ -0,0 +1,90 @@
+# cache.py
+"""
+Result caches that survive Streamlit reruns.
+
+Two levels: the caller's session_state remembers the last (key, value) it
+used, and a process-wide LRU shares results between sessions. Keys carry
+whatever invalidates them (e.g. db.library_version()), so a changed catalog
+simply produces a new key and old entries age out of the LRU.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+ENABLED = os.getenv("RESULT_CACHE", "1") != "0"
+PLAYLIST_CACHE_SIZE = 512
+PLAYLIST_TTL_S = 600       # matches the Spotify response TTL
+CHART_CACHE_SIZE = 128    # rendered PNGs are ~100 KB each
+
+_MISSING = object()
+
+class LRUCache:
+    """Thread-safe LRU bounded by entry count, with optional TTL and hit/miss counters."""
+
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize, self.ttl = maxsize, ttl
+        self._data = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+        self.session_hits = 0  # answered from session_state without touching the LRU
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING and self.ttl is not None and time.monotonic() - item[0] > self.ttl:
+                del self._data[key]
+                item = _MISSING
+            if item is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute, store_if=None):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            if store_if is None or store_if(value):
+                self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses,
+                    "session_hits": self.session_hits, "evictions": self.evictions,
+                    "hit_rate": self.hits / total if total else 0.0}
+
+playlist_cache = LRUCache(PLAYLIST_CACHE_SIZE, ttl=PLAYLIST_TTL_S)
+chart_cache = LRUCache(CHART_CACHE_SIZE)
+
+def cached(session, slot, cache, key, compute, store_if=None):
+    """
+    Session-first lookup: session[slot] holds the last (key, value) this session
+    used; otherwise fall back to the shared cache, then to compute(). Values
+    rejected by store_if are returned but cached nowhere.
+    """
+    if not ENABLED:
+        return compute()
+    last = session.get(slot)
+    if last is not None and last[0] == key:
+        cache.session_hits += 1
+        return last[1]
+    value = cache.get_or_compute(key, compute, store_if)
+    if store_if is None or store_if(value):
+        session[slot] = (key, value)
+    return value
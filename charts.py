@@ -0,0 +1,102 @@
+# charts.py
+"""
+Mood analytics charts for the Streamlit page.
+
+A chart is rendered once per (user, latest history id, db.rollups_version(),
+granularity, renderer) and kept in cache.chart_cache, so ordinary reruns only
+hand the finished chart back to Streamlit. ANALYTICS_CHARTS picks the renderer:
+
+  "png"   matplotlib on a standalone Agg Figure. It is never registered
+          with pyplot, so nothing outlives the call; bars are drawn as one
+          PolyCollection per mood instead of one Rectangle per bar.
+  "vega"  a Vega-Lite spec that the browser draws; the server does no
+          rasterization at all.
+"""
+import io
+import os
+
+from db import get_mood_rollup
+
+RENDERER = os.getenv("ANALYTICS_CHARTS", "png")
+DPI = 200           # what st.pyplot used to save at
+FIGSIZE = (6.4, 4.8)
+MAX_TICKS = 12      # period labels shown on the x axis
+LABELS = {"W": "%Y-%m-%d", "M": "%Y-%m"}
+
+def _labels(frame, granularity):
+    return frame.index.strftime(LABELS.get(granularity, "%Y-%m-%d"))
+
+def png_chart(frame, granularity="W") -> bytes:
+    """Grouped bar chart of an analytics.rollup_frame table, as PNG bytes."""
+    import numpy as np
+    from matplotlib.collections import PolyCollection
+    from matplotlib.figure import Figure
+
+    counts = frame.to_numpy()
+    periods, k = counts.shape
+    width = 0.8 / k
+    x = np.arange(periods)
+    # constrained layout fits labels and legend in one draw; bbox_inches="tight" draws twice
+    fig = Figure(figsize=FIGSIZE, dpi=DPI, layout="constrained")
+    ax = fig.subplots()
+    for j, mood in enumerate(frame.columns):
+        left = x - 0.4 + j * width
+        top = counts[:, j]
+        # (periods, 4, 2) rectangle corners for every bar of this mood at once
+        verts = np.stack([np.stack([left, np.zeros(periods)], 1), np.stack([left, top], 1),
+                          np.stack([left + width, top], 1), np.stack([left + width, np.zeros(periods)], 1)], 1)
+        ax.add_collection(PolyCollection(verts, facecolors=f"C{j}", label=mood))
+    ax.autoscale_view()
+    ax.set_ylim(bottom=0)
+    step = -(-periods // MAX_TICKS)
+    ax.set_xticks(x[::step], _labels(frame, granularity)[::step], rotation=90)
+    ax.set_ylabel("Count")
+    # outside the axes: loc="best" tests every bar against every candidate spot
+    ax.legend(title="mood", loc="upper left", bbox_to_anchor=(1, 1))
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    return buf.getvalue()
+
+def vega_spec(frame, granularity="W") -> dict:
+    """The same chart as a Vega-Lite spec with the data inlined."""
+    periods = _labels(frame, granularity)
+    values = [{"period": p, "mood": m, "n": int(n)}
+              for m in frame.columns for p, n in zip(periods, frame[m].to_numpy()) if n]
+    return {
+        "data": {"values": values},
+        "mark": "bar",
+        "encoding": {
+            "x": {"field": "period", "type": "ordinal", "title": None, "sort": None},
+            "xOffset": {"field": "mood"},
+            "y": {"field": "n", "type": "quantitative", "title": "Count"},
+            "color": {"field": "mood", "type": "nominal"},
+            "tooltip": [{"field": "period"}, {"field": "mood"}, {"field": "n", "title": "count"}],
+        },
+    }
+
+def render(frame, granularity="W", renderer=None):
+    """(renderer, chart) for show(); None when there is nothing to draw."""
+    renderer = renderer or RENDERER
+    if frame is None or frame.empty:
+        return None
+    if renderer == "vega":
+        return renderer, vega_spec(frame, granularity)
+    if renderer == "png":
+        return renderer, png_chart(frame, granularity)
+    raise ValueError(f"unknown chart renderer {renderer!r}; expected 'png' or 'vega'")
+
+def mood_chart(user_id, granularity="W", renderer=None):
+    """render() for a user's weekly ("W") or monthly ("M") mood rollups."""
+    from analytics import rollup_frame
+
+    return render(rollup_frame(get_mood_rollup(user_id, granularity)), granularity, renderer)
+
+def show(chart):
+    """Put a render() result on the current Streamlit container."""
+    import streamlit as st
+
+    renderer, body = chart
+    if renderer == "vega":
+        st.vega_lite_chart(body, width="stretch")
+    else:
+        st.image(body, width="stretch")
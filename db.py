@@ -1,31 +1,393 @@
 # db.py
+import atexit
+import difflib
+import os
+import queue
+import random
+import re
 import sqlite3
+import threading
+import time
+import unicodedata
 from contextlib import contextmanager
 from pathlib import Path
 
+import metrics
+from moodlabels import MOODS, MOOD_POINTS, MOOD_SPREAD  # re-exported: db.MOODS etc.
+
 DB_PATH = Path("app.db")
 
+# ---------- Connection pool ----------
+# opened lazily; sized above the recommender's 16 fan-out threads plus the API's
+# 40-thread worker pool (anyio's default) plus Streamlit script threads
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "64"))
+BUSY_TIMEOUT_S = 5.0
+STATEMENT_CACHE = 256
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",      # ~16 MB page cache per connection
+    "PRAGMA mmap_size=268435456",    # 256 MB memory-mapped reads
+    "PRAGMA temp_store=MEMORY",
+    f"PRAGMA busy_timeout={int(BUSY_TIMEOUT_S * 1000)}",
+)
+
+
+def _connect(path):
+    con = sqlite3.connect(path, timeout=BUSY_TIMEOUT_S, check_same_thread=False,
+                          cached_statements=STATEMENT_CACHE)
+    con.row_factory = sqlite3.Row
+    for p in PRAGMAS:
+        con.execute(p)
+    return con
+
+
+class ConnectionPool:
+    """
+    Bounded pool of reusable SQLite connections.
+    Streamlit runs every rerun on a fresh thread, so connections are checked out
+    per call instead of being pinned to a thread; nested calls on the same thread
+    share the connection they already hold.
+    """
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = str(path)
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._closed = False
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("connection pool is closed")
+            if self._created < self.size:
+                self._created += 1
+                new = True
+            else:
+                new = False
+        if new:
+            try:
+                return _connect(self.path)
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=BUSY_TIMEOUT_S)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"connection pool exhausted ({self.size} connections busy for {BUSY_TIMEOUT_S:g}s)") from None
+
+    def _checkin(self, con):
+        if self._closed:
+            con.close()
+            with self._lock:
+                self._created -= 1
+            return
+        self._idle.put(con)
+
+    @contextmanager
+    def connection(self):
+        held = getattr(self._local, "con", None)
+        if held is not None:
+            yield held
+            return
+        con = self._checkout()
+        self._local.con = con
+        try:
+            yield con
+            con.commit()
+        except BaseException:
+            con.rollback()
+            raise
+        finally:
+            self._local.con = None
+            self._checkin(con)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                con = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            con.close()
+            with self._lock:
+                self._created -= 1
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    path = str(DB_PATH)
+    with _pool_lock:
+        if _pool is None or _pool.path != path:
+            if _pool is not None:
+                _pool.close()
+            _pool = ConnectionPool(path)
+        return _pool
+
+
+def close_pool():
+    """Close all idle pooled connections (registered to run at interpreter exit)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+atexit.register(close_pool)
+
+
 @contextmanager
 def conn_cursor():
-    con = sqlite3.connect(DB_PATH)
-    con.row_factory = sqlite3.Row
-    cur = con.cursor()
-    try:
-        yield con, cur
-        con.commit()
-    finally:
-        con.close()
+    with get_pool().connection() as con:
+        cur = con.cursor(metrics.TimedCursor) if metrics.ENABLED else con.cursor()
+        try:
+            yield con, cur
+        finally:
+            cur.close()
 
-def init_db():
-    with conn_cursor() as (con, cur):
-        cur.execute("""
+# ---------- Write-behind ----------
+# "batched": hot-path inserts (insert_mood) return once queued and a background
+# thread commits them together. Readers in the same process flush first and see
+# their own rows; other processes do not see a row until it is committed (up
+# to FLUSH_MS later, or longer under load), and a killed process loses whatever
+# it still had queued. Fine for one Streamlit process; the API, which runs as
+# many workers, defaults to "sync" (see api.py).
+# "sync": every insert commits before returning.
+WRITE_MODE = os.getenv("DB_WRITE_MODE", "batched")
+FLUSH_ROWS = 500      # rows per transaction, at most
+FLUSH_MS = 50         # how long the first queued row waits for company
+QUEUE_ROWS = 10_000   # put() blocks beyond this many pending rows
+FLUSH_TIMEOUT_S = 30  # flush() gives up (OperationalError) rather than hang a reader
+
+_FLUSH, _STOP = object(), object()
+
+
+class WriteBehind:
+    """
+    Buffered writer for one INSERT statement. Rows queued with put() are
+    committed by a daemon thread, one executemany transaction per FLUSH_ROWS
+    rows or FLUSH_MS, whichever comes first. A full queue makes put() block
+    (back-pressure instead of unbounded memory); flush() returns once
+    everything queued so far is committed; close() runs at interpreter exit.
+    Rows that cannot be written are counted in stats["failed"] and dropped;
+    the thread itself never dies on an error, and is restarted if it has.
+    """
+
+    def __init__(self, sql, batch=FLUSH_ROWS, interval_ms=FLUSH_MS, maxsize=QUEUE_ROWS):
+        self.sql = sql
+        self.batch = batch
+        self.interval = interval_ms / 1000
+        self.stats = {"rows": 0, "batches": 0, "failed": 0}
+        self._q = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+    def put(self, row):
+        if self._closed:  # late writes during shutdown go straight to the database
+            self._write([row])
+            return
+        self._ensure_thread()
+        self._q.put(row)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if not self._closed and (self._thread is None or not self._thread.is_alive()):
+                    self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                    self._thread.start()
+
+    def pending(self):
+        return self._q.unfinished_tasks
+
+    def flush(self, timeout=FLUSH_TIMEOUT_S):
+        """Commit everything queued so far without waiting out FLUSH_MS."""
+        if self._thread is None or not self._q.unfinished_tasks:
+            return
+        self._ensure_thread()
+        self._q.put(_FLUSH)
+        deadline = time.monotonic() + timeout
+        with self._q.all_tasks_done:
+            while self._q.unfinished_tasks:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    raise sqlite3.OperationalError(f"write-behind flush timed out after {timeout:g}s "
+                                                   f"({self._q.unfinished_tasks} rows pending)")
+                self._q.all_tasks_done.wait(left)
+
+    def close(self):
+        with self._lock:
+            thread, self._closed = self._thread, True
+        if thread is not None and thread.is_alive():
+            self._q.put(_STOP)
+            thread.join()
+
+    def _run(self):
+        while True:
+            rows, stop, item = [], False, self._q.get()
+            deadline = time.monotonic() + self.interval
+            while True:
+                if item is _STOP:
+                    stop = True
+                if item is _STOP or item is _FLUSH:
+                    break
+                rows.append(item)
+                if len(rows) >= self.batch:
+                    break
+                try:
+                    item = self._q.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            taken = len(rows) + (item is _STOP or item is _FLUSH)
+            try:
+                if rows:
+                    self._write(rows)
+            except Exception:  # never let one batch take the thread (and every flush()) down
+                self.stats["failed"] += len(rows)
+            finally:
+                for _ in range(taken):
+                    self._q.task_done()
+            if stop:
+                return
+
+    def _write(self, rows):
+        try:
+            with conn_cursor() as (con, cur):
+                cur.executemany(self.sql, rows)
+        except sqlite3.Error:
+            # retry row by row so one bad row (or a lock timeout) costs only itself
+            for row in rows:
+                try:
+                    with conn_cursor() as (con, cur):
+                        cur.execute(self.sql, row)
+                except Exception:
+                    self.stats["failed"] += 1
+                else:
+                    self.stats["rows"] += 1
+        else:
+            self.stats["rows"] += len(rows)
+        self.stats["batches"] += 1
+
+
+_writers = []
+
+
+def close_writers():
+    """Drain every WriteBehind queue (registered after close_pool, so it runs first at exit)."""
+    for w in _writers:
+        w.close()
+
+
+atexit.register(close_writers)
+
+# ---------- Mood rollups ----------
+ROLLUP_PERIODS = {
+    "W": "date({col}, 'weekday 0', '-6 days')",  # week starting Monday
+    "M": "date({col}, 'start of month')",
+}
+
+def _rollup_upsert(row, delta):
+    """Trigger body adding `delta` to the counts of mood_history row OLD/NEW."""
+    return "".join(f"""
+            INSERT INTO mood_rollups (user_id, granularity, period_start, mood, n)
+            VALUES ({row}.user_id, '{g}', {expr.format(col=row + ".created_at")}, {row}.detected_mood, {delta})
+            ON CONFLICT(user_id, granularity, period_start, mood) DO UPDATE SET n = n + {delta};"""
+                   for g, expr in ROLLUP_PERIODS.items())
+
+def _rollup_backfill(where=""):
+    return [f"""
+        INSERT INTO mood_rollups (user_id, granularity, period_start, mood, n)
+        SELECT user_id, '{g}', {expr.format(col="created_at")} AS p, detected_mood, COUNT(*)
+        FROM mood_history {where} GROUP BY user_id, p, detected_mood
+        """ for g, expr in ROLLUP_PERIODS.items()]
+
+# ---------- Mood space ----------
+def _point_sql(axis, salt):
+    """A song's stored coordinate, or its label centre plus a stable per-id offset."""
+    centre = " ".join(f"WHEN '{m}' THEN {p[axis]}" for m, p in MOOD_POINTS.items())
+    col = ("valence", "arousal")[axis]
+    return (f"COALESCE({col}, (CASE mood {centre} ELSE 0 END) "
+            f"+ ((id * {salt}) % 1000) * {2 * MOOD_SPREAD / 1000} - {MOOD_SPREAD})")
+
+VALENCE_SQL = _point_sql(0, 7919)
+AROUSAL_SQL = _point_sql(1, 104729)
+
+# ---------- Listening feedback ----------
+# kind codes stored in song_events, and how much each one moves affinity
+EVENT_KINDS = {"play": 0, "skip": 1, "like": 2}
+EVENT_WEIGHTS = {"play": 1.0, "skip": -1.0, "like": 3.0}
+
+def _event_weight(kind_col):
+    whens = " ".join(f"WHEN {EVENT_KINDS[k]} THEN {w}" for k, w in EVENT_WEIGHTS.items())
+    return f"(CASE {kind_col} {whens} ELSE 0 END)"
+
+def artist_key(artist):
+    """
+    The one normalization of artist names, for artist affinity and per-artist
+    caps. Done in Python because SQLite's LOWER() folds ASCII only.
+    """
+    return unicodedata.normalize("NFKC", str(artist)).strip().casefold()
+
+def _add_artist_affinity(cur, rows):
+    """Add (user_id, artist, score) rows to user_artist_affinity, merged by artist_key()."""
+    scores = {}
+    for user_id, artist, score in rows:
+        key = (user_id, artist_key(artist))
+        scores[key] = scores.get(key, 0.0) + score
+    cur.executemany("""
+        INSERT INTO user_artist_affinity (user_id, artist, score) VALUES (?,?,?)
+        ON CONFLICT(user_id, artist) DO UPDATE SET score = score + excluded.score
+    """, [(u, a, sc) for (u, a), sc in scores.items()])
+
+def _rebuild_artist_affinity(cur):
+    cur.execute("DELETE FROM user_artist_affinity")
+    _add_artist_affinity(cur, cur.execute(f"""
+        SELECT e.user_id, s.artist, SUM({_event_weight("e.kind")})
+        FROM song_events e JOIN songs s ON s.id = e.song_id GROUP BY e.user_id, s.artist
+    """).fetchall())
+
+def _scores_upsert(row):
+    """
+    Trigger body folding song_events row NEW into the song affinity and
+    popularity tables (artist affinity is added by record_event in Python).
+    """
+    w = _event_weight(f"{row}.kind")
+    counts = ", ".join(f"{row}.kind = {EVENT_KINDS[k]}" for k in ("play", "skip", "like"))
+    return f"""
+            INSERT INTO user_song_affinity (user_id, song_id, score) VALUES ({row}.user_id, {row}.song_id, {w})
+            ON CONFLICT(user_id, song_id) DO UPDATE SET score = score + excluded.score;
+            INSERT INTO song_popularity (song_id, plays, skips, likes) VALUES ({row}.song_id, {counts})
+            ON CONFLICT(song_id) DO UPDATE SET plays = plays + excluded.plays, skips = skips + excluded.skips,
+                                               likes = likes + excluded.likes;"""
+
+# ---------- Schema migrations ----------
+# Each entry upgrades the schema to `version`; PRAGMA user_version records the
+# last one applied so existing app.db files are upgraded in place.
+MIGRATIONS = [
+    (1, [
+        """
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             username TEXT UNIQUE NOT NULL,
             password_hash TEXT NOT NULL
         );
-        """)
-        cur.execute("""
+        """,
+        """
         CREATE TABLE IF NOT EXISTS songs (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             title TEXT NOT NULL,
@@ -33,8 +395,8 @@ def init_db():
             mood TEXT NOT NULL,
             url TEXT
         );
-        """)
-        cur.execute("""
+        """,
+        """
         CREATE TABLE IF NOT EXISTS mood_history (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             user_id INTEGER NOT NULL,
@@ -43,23 +405,278 @@ def init_db():
             created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY(user_id) REFERENCES users(id)
         );
-        """)
+        """,
+    ]),
+    (2, [
+        # canonical moods: lowercase, trimmed (also enforced for future inserts)
+        "UPDATE songs SET mood = LOWER(TRIM(mood)) WHERE mood <> LOWER(TRIM(mood))",
+        """
+        CREATE TRIGGER IF NOT EXISTS songs_mood_canonical AFTER INSERT ON songs
+        WHEN NEW.mood <> LOWER(TRIM(NEW.mood))
+        BEGIN
+            UPDATE songs SET mood = LOWER(TRIM(NEW.mood)) WHERE id = NEW.id;
+        END;
+        """,
+        # covering indexes for fetch_songs_by_mood / get_mood_history
+        "CREATE INDEX IF NOT EXISTS idx_songs_mood ON songs (mood, title, artist, url)",
+        "CREATE INDEX IF NOT EXISTS idx_mood_history_user_time "
+        "ON mood_history (user_id, created_at, detected_mood)",
+        "ANALYZE",
+    ]),
+    (3, [
+        # (mood, id) lets the playlist sampler seek by id inside a mood partition
+        "CREATE INDEX IF NOT EXISTS idx_songs_mood_id ON songs (mood, id)",
+    ]),
+    (4, [
+        # resume points for offline jobs (reclassify, backfills)
+        """
+        CREATE TABLE IF NOT EXISTS job_checkpoints (
+            name TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+        """,
+    ]),
+    (5, [
+        # per-user weekly ('W', Monday start) and monthly ('M') mood counts,
+        # maintained by triggers so every writer keeps them current
+        """
+        CREATE TABLE IF NOT EXISTS mood_rollups (
+            user_id INTEGER NOT NULL,
+            granularity TEXT NOT NULL,
+            period_start DATE NOT NULL,
+            mood TEXT NOT NULL,
+            n INTEGER NOT NULL,
+            PRIMARY KEY (user_id, granularity, period_start, mood)
+        ) WITHOUT ROWID;
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS mood_history_rollup_insert AFTER INSERT ON mood_history
+        BEGIN
+            {_rollup_upsert("NEW", 1)}
+        END;
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS mood_history_rollup_update
+        AFTER UPDATE OF detected_mood ON mood_history
+        WHEN OLD.detected_mood <> NEW.detected_mood
+        BEGIN
+            {_rollup_upsert("OLD", -1)}
+            {_rollup_upsert("NEW", 1)}
+        END;
+        """,
+        *_rollup_backfill(),
+    ]),
+    (6, [
+        # one row per (title, artist, mood); imports use INSERT OR IGNORE against it
+        """
+        DELETE FROM songs WHERE id NOT IN (
+            SELECT MIN(id) FROM songs GROUP BY title, artist, mood
+        )
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_songs_title_artist_mood ON songs (title, artist, mood)",
+    ]),
+    (7, [
+        # cache invalidation keys: a catalog version counter and a per-user
+        # "latest history row" lookup
+        """
+        CREATE TABLE IF NOT EXISTS app_meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+        """,
+        "INSERT OR IGNORE INTO app_meta (key, value) VALUES ('library_version', 0)",
+        "CREATE INDEX IF NOT EXISTS idx_mood_history_user_id ON mood_history (user_id, id)",
+    ]),
+    (8, [
+        # full-text index over title/artist for search_songs; external content,
+        # so songs stays the only copy of the text
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS songs_fts USING fts5(
+            title, artist, content='songs', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3', detail=column
+        );
+        """,
+        "CREATE VIRTUAL TABLE IF NOT EXISTS songs_fts_vocab USING fts5vocab(songs_fts, row)",
+        """
+        CREATE TRIGGER IF NOT EXISTS songs_fts_insert AFTER INSERT ON songs
+        BEGIN
+            INSERT INTO songs_fts (rowid, title, artist) VALUES (NEW.id, NEW.title, NEW.artist);
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS songs_fts_delete AFTER DELETE ON songs
+        BEGIN
+            INSERT INTO songs_fts (songs_fts, rowid, title, artist) VALUES ('delete', OLD.id, OLD.title, OLD.artist);
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS songs_fts_update AFTER UPDATE OF title, artist ON songs
+        BEGIN
+            INSERT INTO songs_fts (songs_fts, rowid, title, artist) VALUES ('delete', OLD.id, OLD.title, OLD.artist);
+            INSERT INTO songs_fts (rowid, title, artist) VALUES (NEW.id, NEW.title, NEW.artist);
+        END;
+        """,
+        "INSERT INTO songs_fts (songs_fts) VALUES ('rebuild')",
+    ]),
+    (9, [
+        # append-only play/skip/like log; triggers keep the per-user and per-track
+        # scores the ranker reads. Weights are baked into the trigger: after changing
+        # EVENT_WEIGHTS, add a migration recreating it and run rebuild_scores().
+        """
+        CREATE TABLE IF NOT EXISTS song_events (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            song_id INTEGER NOT NULL,
+            kind INTEGER NOT NULL,
+            created_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+        );
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_song_events_user_id ON song_events (user_id, id)",
+        """
+        CREATE TABLE IF NOT EXISTS user_song_affinity (
+            user_id INTEGER NOT NULL,
+            song_id INTEGER NOT NULL,
+            score REAL NOT NULL,
+            PRIMARY KEY (user_id, song_id)
+        ) WITHOUT ROWID;
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS user_artist_affinity (
+            user_id INTEGER NOT NULL,
+            artist TEXT NOT NULL,
+            score REAL NOT NULL,
+            PRIMARY KEY (user_id, artist)
+        ) WITHOUT ROWID;
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS song_popularity (
+            song_id INTEGER PRIMARY KEY,
+            plays INTEGER NOT NULL,
+            skips INTEGER NOT NULL,
+            likes INTEGER NOT NULL
+        );
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS song_events_scores AFTER INSERT ON song_events
+        BEGIN
+            {_scores_upsert("NEW")}
+        END;
+        """,
+    ]),
+    (10, [
+        # (valence, arousal) per song and per input; NULL on songs means "use the
+        # label's region" (VALENCE_SQL / AROUSAL_SQL), so existing rows need no backfill
+        "ALTER TABLE songs ADD COLUMN valence REAL",
+        "ALTER TABLE songs ADD COLUMN arousal REAL",
+        "ALTER TABLE mood_history ADD COLUMN valence REAL",
+        "ALTER TABLE mood_history ADD COLUMN arousal REAL",
+        # bumped by deletes only, so the mood-space index knows when appending is not enough
+        "INSERT OR IGNORE INTO app_meta (key, value) VALUES ('songs_deleted', 0)",
+    ]),
+    (11, [
+        # artist affinity moves out of the trigger: keys are now artist_key(), which
+        # SQL cannot compute, so record_event adds them and existing keys are rebuilt
+        "DROP TRIGGER IF EXISTS song_events_scores",
+        f"""
+        CREATE TRIGGER song_events_scores AFTER INSERT ON song_events
+        BEGIN
+            {_scores_upsert("NEW")}
+        END;
+        """,
+        _rebuild_artist_affinity,
+    ]),
+    (12, [
+        # bumped whenever existing rollups are rewritten rather than appended to
+        # (reclassify, rebuild_mood_rollups), so cached charts can tell
+        "INSERT OR IGNORE INTO app_meta (key, value) VALUES ('rollups_version', 0)",
+        """
+        CREATE TRIGGER IF NOT EXISTS mood_history_rollups_version
+        AFTER UPDATE OF detected_mood ON mood_history
+        WHEN OLD.detected_mood <> NEW.detected_mood
+        BEGIN
+            UPDATE app_meta SET value = value + 1 WHERE key='rollups_version';
+        END;
+        """,
+    ]),
+    (13, [
+        # the energy setting the label and vector were tweaked with, so reclassify.py
+        # can replay it; NULL on rows recorded before this (setting unknown)
+        "ALTER TABLE mood_history ADD COLUMN energy TEXT",
+    ]),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version():
+    with conn_cursor() as (con, cur):
+        return cur.execute("PRAGMA user_version").fetchone()[0]
+
+
+_initialized = set()
+
+def init_db_once():
+    """init_db() the first time this process sees DB_PATH; later calls are free (Streamlit reruns)."""
+    path = str(DB_PATH.resolve())
+    if path not in _initialized:
+        init_db()
+        _initialized.add(path)
+
+def init_db():
+    with conn_cursor() as (con, cur):
+        cur.execute("BEGIN IMMEDIATE")
+        current = cur.execute("PRAGMA user_version").fetchone()[0]
+        for version, statements in MIGRATIONS:
+            if version <= current:
+                continue
+            for sql in statements:
+                sql(cur) if callable(sql) else cur.execute(sql)  # callables: data steps SQL cannot do
+            cur.execute(f"PRAGMA user_version={version}")
+
+
+def normalize_mood(mood):
+    return str(mood).strip().lower()
 
 def add_user(username, password_hash):
+    """Atomic insert; raises sqlite3.IntegrityError if the username is taken."""
     with conn_cursor() as (con, cur):
         cur.execute("INSERT INTO users (username, password_hash) VALUES (?,?)", (username, password_hash))
 
+def update_password_hash(user_id, password_hash):
+    with conn_cursor() as (con, cur):
+        cur.execute("UPDATE users SET password_hash=? WHERE id=?", (password_hash, user_id))
+
 def get_user(username):
     with conn_cursor() as (con, cur):
         cur.execute("SELECT * FROM users WHERE username=?", (username,))
         return cur.fetchone()
 
-def insert_mood(user_id, text_input, detected_mood):
-    with conn_cursor() as (con, cur):
-        cur.execute("INSERT INTO mood_history (user_id, text_input, detected_mood) VALUES (?,?,?)",
-                    (user_id, text_input, detected_mood))
+_history_writes = WriteBehind("INSERT INTO mood_history (user_id, text_input, detected_mood, valence, arousal, "
+                              "energy, created_at) VALUES (?,?,?,?,?,?,?)")
+_writers.append(_history_writes)
+
+def insert_mood(user_id, text_input, detected_mood, vector=None, energy="Auto"):
+    """
+    Queued in WRITE_MODE "batched" (visible to this process's readers, which flush
+    first, but not to other processes until committed), else committed now.
+    `energy` is the service.ENERGY_LEVELS setting already applied to the label and vector.
+    """
+    valence, arousal = vector if vector is not None else (None, None)
+    # stamped now, not at flush time, so batching does not reorder or shift history
+    row = (user_id, text_input, detected_mood, valence, arousal, energy,
+           time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime()))
+    if WRITE_MODE == "sync":
+        with conn_cursor() as (con, cur):
+            cur.execute(_history_writes.sql, row)
+    else:
+        _history_writes.put(row)
+
+def flush_writes():
+    """Commit queued mood_history rows now (cheap when nothing is pending)."""
+    _history_writes.flush()
 
 def get_mood_history(user_id, limit=1000):
+    flush_writes()
     with conn_cursor() as (con, cur):
         cur.execute("""
             SELECT detected_mood, created_at FROM mood_history
@@ -67,24 +684,459 @@ def get_mood_history(user_id, limit=1000):
         """, (user_id, limit))
         return cur.fetchall()
 
-def add_song(title, artist, mood, url=None):
+def _bump_library_version(cur, deleted=False):
+    keys = ("library_version", "songs_deleted") if deleted else ("library_version",)
+    cur.execute(f"UPDATE app_meta SET value = value + 1 WHERE key IN ({','.join('?' * len(keys))})", keys)
+
+def library_version():
+    """Changes whenever the song catalog does (add_song / bulk_add_songs / delete_all_songs)."""
+    with conn_cursor() as (con, cur):
+        cur.execute("SELECT value FROM app_meta WHERE key='library_version'")
+        return cur.fetchone()[0]
+
+def catalog_state():
+    """(library_version, songs_deleted) counters in one read."""
+    with conn_cursor() as (con, cur):
+        rows = dict(cur.execute("SELECT key, value FROM app_meta WHERE key IN "
+                                "('library_version', 'songs_deleted')").fetchall())
+    return rows["library_version"], rows["songs_deleted"]
+
+def rollups_version():
+    """Changes whenever existing mood_rollups are rewritten (reclassify / rebuild_mood_rollups)."""
+    with conn_cursor() as (con, cur):
+        cur.execute("SELECT value FROM app_meta WHERE key='rollups_version'")
+        return cur.fetchone()[0]
+
+def latest_history_id(user_id):
+    flush_writes()
+    with conn_cursor() as (con, cur):
+        # bare MAX() so SQLite answers it with one seek on (user_id, id)
+        cur.execute("SELECT MAX(id) FROM mood_history WHERE user_id=?", (user_id,))
+        return cur.fetchone()[0] or 0
+
+def iter_mood_history(user_id, limit=1000, batch=1000):
+    """Same rows and order as get_mood_history, fetched in keyset-paginated batches."""
+    flush_writes()
+    last = None
+    while limit > 0:
+        with conn_cursor() as (con, cur):
+            if last is None:
+                cur.execute("""
+                    SELECT id, detected_mood, created_at FROM mood_history
+                    WHERE user_id=? ORDER BY created_at DESC, id DESC LIMIT ?
+                """, (user_id, min(batch, limit)))
+            else:
+                cur.execute("""
+                    SELECT id, detected_mood, created_at FROM mood_history
+                    WHERE user_id=? AND (created_at < ? OR (created_at = ? AND id < ?))
+                    ORDER BY created_at DESC, id DESC LIMIT ?
+                """, (user_id, last["created_at"], last["created_at"], last["id"], min(batch, limit)))
+            rows = cur.fetchall()
+        yield from rows
+        if len(rows) < min(batch, limit):
+            return
+        limit -= len(rows)
+        last = rows[-1]
+
+def _song_row(title, artist, mood, url=None, valence=None, arousal=None):
+    return title, artist, normalize_mood(mood), url, valence, arousal
+
+_INSERT_SONG = "INSERT OR IGNORE INTO songs (title, artist, mood, url, valence, arousal) VALUES (?,?,?,?,?,?)"
+
+def add_song(title, artist, mood, url=None, vector=None):
+    """Returns False if the (title, artist, mood) song already exists."""
     with conn_cursor() as (con, cur):
-        cur.execute("INSERT INTO songs (title, artist, mood, url) VALUES (?,?,?,?)",
-                    (title, artist, mood.lower(), url))
+        cur.execute(_INSERT_SONG, _song_row(title, artist, mood, url, *(vector or (None, None))))
+        added = cur.rowcount == 1
+        if added:
+            _bump_library_version(cur)
+        return added
 
 def delete_all_songs():
     with conn_cursor() as (con, cur):
         cur.execute("DELETE FROM songs")
+        _bump_library_version(cur, deleted=True)
 
 def fetch_songs_by_mood(mood, limit=30):
     with conn_cursor() as (con, cur):
         cur.execute("""
-            SELECT title, artist, mood, IFNULL(url,'') as url
-            FROM songs WHERE LOWER(mood)=LOWER(?) LIMIT ?
-        """, (mood, limit))
+            SELECT id, title, artist, mood, IFNULL(url,'') as url
+            FROM songs WHERE mood=? LIMIT ?
+        """, (normalize_mood(mood), limit))
         return cur.fetchall()
 
-def bulk_add_songs(rows):  # rows: list of (title, artist, mood, url)
+def bulk_add_songs(rows):  # rows: list of (title, artist, mood, url[, valence, arousal])
+    """Returns the number of songs inserted; existing (title, artist, mood) rows are skipped."""
+    rows = [_song_row(*r) for r in rows]
+    with conn_cursor() as (con, cur):
+        cur.executemany(_INSERT_SONG, rows)
+        inserted = cur.rowcount
+        if inserted > 0:
+            _bump_library_version(cur)
+        return inserted
+
+def delete_songs(ids):
+    with conn_cursor() as (con, cur):
+        cur.executemany("DELETE FROM songs WHERE id=?", [(i,) for i in ids])
+        deleted = cur.rowcount
+        if deleted > 0:
+            _bump_library_version(cur, deleted=True)
+        return deleted
+
+# ---------- Library search ----------
+SEARCH_WINDOW = 1000   # matches scored per query; very broad prefixes are cut off here
+FUZZY_CUTOFF = 0.75    # difflib ratio for swapping an unknown word for an indexed one
+FUZZY_TERMS = 3
+_WORD = re.compile(r"\w+")
+
+def _search_tokens(text):
+    """Words as the unicode61 tokenizer sees them: lowercase, diacritics removed."""
+    text = str(text).lower()
+    if not text.isascii():
+        text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    return _WORD.findall(text)
+
+def _close_terms(cur, word):
+    """Indexed terms close to `word` (same first letter), or [word] if it already prefixes one."""
+    if cur.execute("SELECT 1 FROM songs_fts_vocab WHERE term >= ? AND term < ? LIMIT 1",
+                   (word, word + "\U0010ffff")).fetchone():
+        return [word]
+    terms = [r[0] for r in cur.execute("SELECT term FROM songs_fts_vocab WHERE term >= ? AND term < ?",
+                                       (word[0], chr(ord(word[0]) + 1)))]
+    return difflib.get_close_matches(word, terms, FUZZY_TERMS, FUZZY_CUTOFF)
+
+def _relevance(groups, row):
+    # every match contains all query words, so rank on where and how they matched:
+    # title over artist, whole word over prefix, then shorter titles
+    title, artist = _search_tokens(row["title"]), _search_tokens(row["artist"])
+    score = 0.0
+    for alts in groups:
+        best = 0.0
+        for a in alts:
+            for words, exact, prefix in ((title, 3.0, 2.0), (artist, 1.5, 1.0)):
+                for w in words:
+                    if w == a:
+                        best = max(best, exact)
+                    elif w.startswith(a):
+                        best = max(best, prefix)
+        score += best
+    return score - 0.01 * len(title)
+
+def search_songs(query, limit=20, mood=None, fuzzy=True):
+    """
+    Title/artist search. Every word matches as a prefix ("upt fun" finds
+    "Uptown Funk"); with fuzzy=True a word that prefixes nothing in the index
+    is replaced by its closest indexed terms, so small typos still match.
+    Title matches rank above artist matches, whole words above prefixes.
+    """
+    words = _search_tokens(query)
+    words = [w for w in words if len(w) > 1] or words
+    if not words:
+        return []
+    with conn_cursor() as (con, cur):
+        groups = []
+        for w in words:
+            alts = _close_terms(cur, w) if fuzzy else [w]
+            if not alts:
+                return []
+            groups.append(alts)
+        match = " AND ".join("(" + " OR ".join(f'"{a}"*' for a in alts) + ")" for alts in groups)
+        sql = f"""
+            SELECT s.id, s.title, s.artist, s.mood, IFNULL(s.url,'') as url
+            FROM songs_fts JOIN songs s ON s.id = songs_fts.rowid
+            WHERE songs_fts MATCH ? {"AND s.mood = ?" if mood else ""} LIMIT ?
+        """
+        args = (match,) + ((normalize_mood(mood),) if mood else ()) + (SEARCH_WINDOW,)
+        rows = cur.execute(sql, args).fetchall()
+    rows.sort(key=lambda r: -_relevance(groups, r))
+    return rows[:limit]
+
+# ---------- Listening feedback ----------
+def record_event(user_id, song_id, kind):
+    """kind: one of EVENT_KINDS ("play", "skip", "like")."""
+    if kind not in EVENT_KINDS:
+        raise ValueError(f"unknown event kind: {kind}")
+    with conn_cursor() as (con, cur):
+        cur.execute("INSERT INTO song_events (user_id, song_id, kind) VALUES (?,?,?)",
+                    (user_id, song_id, EVENT_KINDS[kind]))
+        artist = cur.execute("SELECT artist FROM songs WHERE id=?", (song_id,)).fetchone()
+        if artist is not None:
+            _add_artist_affinity(cur, [(user_id, artist[0], EVENT_WEIGHTS[kind])])
+
+def bulk_record_events(rows):  # rows: list of (user_id, song_id, kind, created_at unix seconds)
+    rows = list(rows)
+    with conn_cursor() as (con, cur):
+        cur.executemany("INSERT INTO song_events (user_id, song_id, kind, created_at) VALUES (?,?,?,?)",
+                        [(u, s, EVENT_KINDS[k], t) for u, s, k, t in rows])
+        ids = list({s for _, s, _, _ in rows})
+        artists = {}
+        for i in range(0, len(ids), 900):  # under SQLite's bound-parameter limit
+            chunk = ids[i:i + 900]
+            artists.update(cur.execute(f"SELECT id, artist FROM songs WHERE id IN ({','.join('?' * len(chunk))})",
+                                       chunk).fetchall())
+        _add_artist_affinity(cur, [(u, artists[s], EVENT_WEIGHTS[k]) for u, s, k, _ in rows if s in artists])
+
+def latest_event_id(user_id):
+    with conn_cursor() as (con, cur):
+        cur.execute("SELECT MAX(id) FROM song_events WHERE user_id=?", (user_id,))
+        return cur.fetchone()[0] or 0
+
+def get_user_affinity(user_id):
+    """(song_ids, scores) and (artists, scores) for one user's feedback so far."""
     with conn_cursor() as (con, cur):
-        cur.executemany("INSERT INTO songs (title, artist, mood, url) VALUES (?,?,?,?)", rows)
+        songs = cur.execute("SELECT song_id, score FROM user_song_affinity WHERE user_id=? ORDER BY song_id",
+                            (user_id,)).fetchall()
+        artists = cur.execute("SELECT artist, score FROM user_artist_affinity WHERE user_id=?",
+                              (user_id,)).fetchall()
+    return songs, artists
 
+def fetch_mood_partition(mood):
+    """Every song of a mood with its play/skip/like counts, in id order (the ranker's candidate pool)."""
+    with conn_cursor() as (con, cur):
+        cur.execute("""
+            SELECT s.id, s.title, s.artist, IFNULL(s.url,'') as url,
+                   IFNULL(p.plays, 0) AS plays, IFNULL(p.skips, 0) AS skips, IFNULL(p.likes, 0) AS likes
+            FROM songs s LEFT JOIN song_popularity p ON p.song_id = s.id
+            WHERE s.mood = ? ORDER BY s.id
+        """, (normalize_mood(mood),))
+        return cur.fetchall()
+
+def rebuild_scores():
+    """Backfill job: recompute affinity and popularity from song_events."""
+    with conn_cursor() as (con, cur):
+        for table in ("user_song_affinity", "song_popularity"):
+            cur.execute(f"DELETE FROM {table}")
+        w = _event_weight("e.kind")
+        cur.execute(f"""
+            INSERT INTO user_song_affinity (user_id, song_id, score)
+            SELECT user_id, song_id, SUM({w}) FROM song_events e GROUP BY user_id, song_id
+        """)
+        _rebuild_artist_affinity(cur)
+        cur.execute(f"""
+            INSERT INTO song_popularity (song_id, plays, skips, likes)
+            SELECT song_id, SUM(kind = {EVENT_KINDS["play"]}), SUM(kind = {EVENT_KINDS["skip"]}),
+                   SUM(kind = {EVENT_KINDS["like"]})
+            FROM song_events GROUP BY song_id
+        """)
+
+
+def get_checkpoint(name):
+    with conn_cursor() as (con, cur):
+        cur.execute("SELECT last_id FROM job_checkpoints WHERE name=?", (name,))
+        row = cur.fetchone()
+        return row["last_id"] if row else None
+
+def set_checkpoint(cur, name, last_id):
+    # takes a cursor so the checkpoint commits in the same transaction as the work
+    cur.execute("""
+        INSERT INTO job_checkpoints (name, last_id, updated_at) VALUES (?,?,CURRENT_TIMESTAMP)
+        ON CONFLICT(name) DO UPDATE SET last_id=excluded.last_id, updated_at=excluded.updated_at
+    """, (name, last_id))
+
+def clear_checkpoint(name):
+    with conn_cursor() as (con, cur):
+        cur.execute("DELETE FROM job_checkpoints WHERE name=?", (name,))
+
+# ---------- Playlist sampling ----------
+SONG_COLS = "id, title, artist, mood, IFNULL(url,'') as url"
+SAMPLE_PROBES = 4         # random seeks per requested track before falling back to a scan
+SMALL_PARTITION = 8       # id spans below k * SMALL_PARTITION are read whole and shuffled
+
+def _mood_bounds(cur, mood):
+    lo = cur.execute("SELECT MIN(id) FROM songs WHERE mood=?", (mood,)).fetchone()[0]
+    if lo is None:
+        return None, None
+    hi = cur.execute("SELECT MAX(id) FROM songs WHERE mood=?", (mood,)).fetchone()[0]
+    return lo, hi
+
+def _scan_from(cur, mood, start, last=None, batch=256):
+    """
+    Walk a mood partition in id order starting at `start`, wrapping around once.
+    Yields (row, last_id) where last_id is the cursor position after that row.
+    """
+    if last is None:
+        sql, args = f"SELECT {SONG_COLS} FROM songs WHERE mood=? AND id>=? ORDER BY id LIMIT ?", (mood, start)
+    elif last >= start:
+        sql, args = f"SELECT {SONG_COLS} FROM songs WHERE mood=? AND id>? ORDER BY id LIMIT ?", (mood, last)
+    else:
+        sql, args = None, None
+    while sql:  # ids >= start
+        rows = cur.execute(sql, args + (batch,)).fetchall()
+        for r in rows:
+            yield r, r["id"]
+        if len(rows) < batch:
+            last = -1
+            break
+        sql, args = f"SELECT {SONG_COLS} FROM songs WHERE mood=? AND id>? ORDER BY id LIMIT ?", (mood, rows[-1]["id"])
+    while True:  # wrapped: ids < start
+        rows = cur.execute(f"SELECT {SONG_COLS} FROM songs WHERE mood=? AND id>? AND id<? ORDER BY id LIMIT ?",
+                           (mood, last, start, batch)).fetchall()
+        for r in rows:
+            yield r, r["id"]
+        if len(rows) < batch:
+            return
+        last = rows[-1]["id"]
+
+def _take(candidates, k, max_per_artist=None, stop_at_cap=False):
+    """
+    Collect up to k distinct rows, at most max_per_artist per artist. Returns
+    (rows, last_pos, exhausted), last_pos being the position of the last row taken.
+    With stop_at_cap the rows end just before the first one over the cap instead
+    of skipping it, so a cursor resuming at last_pos still reaches that row.
+    """
+    out, seen, per_artist, last = [], set(), {}, None
+    for r, pos in candidates:
+        if r["id"] in seen:
+            continue
+        seen.add(r["id"])
+        if max_per_artist:
+            a = artist_key(r["artist"])
+            if per_artist.get(a, 0) >= max_per_artist:
+                if stop_at_cap:
+                    return out, last, False
+                continue
+            per_artist[a] = per_artist.get(a, 0) + 1
+        out.append(r)
+        last = pos
+        if len(out) >= k:
+            return out, last, False
+    return out, last, True
+
+def sample_songs_by_mood(mood, k=50, max_per_artist=None, rng=None):
+    """
+    k random tracks for a mood without sorting the partition: random id seeks
+    on the (mood, id) index, topped up by a wrap-around scan if seeks collide.
+    Cost grows with k, not with catalog size.
+    """
+    mood, rng = normalize_mood(mood), rng or random
+    with conn_cursor() as (con, cur):
+        lo, hi = _mood_bounds(cur, mood)
+        if lo is None:
+            return []
+        if hi - lo < k * SMALL_PARTITION:
+            rows = cur.execute(f"SELECT {SONG_COLS} FROM songs WHERE mood=? AND id BETWEEN ? AND ?",
+                               (mood, lo, hi)).fetchall()
+            rng.shuffle(rows)
+            return _take(((r, None) for r in rows), k, max_per_artist)[0]
+
+        def probes():
+            for _ in range(k * SAMPLE_PROBES):
+                r = cur.execute(f"SELECT {SONG_COLS} FROM songs WHERE mood=? AND id>=? ORDER BY id LIMIT 1",
+                                (mood, rng.randint(lo, hi))).fetchone()
+                yield r, None
+            yield from _scan_from(cur, mood, rng.randint(lo, hi))
+
+        return _take(probes(), k, max_per_artist)[0]
+
+def new_playlist_cursor(mood, rng=None):
+    """Cursor for fetch_songs_page that starts at a random point in the mood partition."""
+    rng = rng or random
+    with conn_cursor() as (con, cur):
+        lo, hi = _mood_bounds(cur, normalize_mood(mood))
+    return None if lo is None else str(rng.randint(lo, hi))
+
+def parse_playlist_cursor(cursor):
+    """(start, last id or None) from a fetch_songs_page cursor; ValueError if it is not one."""
+    if isinstance(cursor, bool) or not isinstance(cursor, (str, int)) \
+            or not re.fullmatch(r"\d+(:\d+)?", str(cursor)):
+        raise ValueError(f"invalid cursor: {cursor!r}")
+    parts = str(cursor).split(":")
+    return int(parts[0]), (int(parts[1]) if len(parts) > 1 else None)
+
+def fetch_songs_page(mood, limit=50, cursor=None, max_per_artist=None):
+    """
+    Keyset pagination over a mood partition ("more like this").
+    Cursor format: "<start>" or "<start>:<last id>"; pages wrap around once.
+    With max_per_artist a page ends early at the first track over the cap, which
+    then opens the next page, so paging to the end still visits every track.
+    Returns (rows, next_cursor); next_cursor is None after the last page.
+    """
+    mood = normalize_mood(mood)
+    with conn_cursor() as (con, cur):
+        if cursor is None:
+            start, last = _mood_bounds(cur, mood)[0], None
+            if start is None:
+                return [], None
+        else:
+            start, last = parse_playlist_cursor(cursor)
+        rows, pos, exhausted = _take(_scan_from(cur, mood, start, last), limit, max_per_artist, stop_at_cap=True)
+    if exhausted or pos is None:
+        return rows, None
+    return rows, f"{start}:{pos}"
+
+# ---------- Mood space ----------
+def iter_song_points(after_id=0, batch=100_000):
+    """(id, valence, arousal) for songs with id > after_id, in id order, in batches."""
+    while True:
+        with conn_cursor() as (con, cur):
+            rows = cur.execute(f"SELECT id, {VALENCE_SQL}, {AROUSAL_SQL} FROM songs WHERE id > ? ORDER BY id LIMIT ?",
+                               (after_id, batch)).fetchall()
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1][0]
+
+def fetch_songs_by_ids(ids):
+    """Rows for `ids` in the same order (missing ids are skipped)."""
+    ids = list(ids)
+    with conn_cursor() as (con, cur):
+        rows = cur.execute(f"SELECT {SONG_COLS} FROM songs WHERE id IN ({','.join('?' * len(ids))})",
+                           ids).fetchall() if ids else []
+    by_id = {r["id"]: r for r in rows}
+    return [by_id[i] for i in ids if i in by_id]
+
+# ---------- Mood analytics ----------
+def get_mood_rollup(user_id, granularity="W"):
+    """Rows of (period_start, mood, n) from the pre-aggregated counts, oldest first."""
+    flush_writes()
+    with conn_cursor() as (con, cur):
+        cur.execute("""
+            SELECT period_start, mood, n FROM mood_rollups
+            WHERE user_id=? AND granularity=? AND n > 0 ORDER BY period_start
+        """, (user_id, granularity))
+        return cur.fetchall()
+
+def history_archive_dir():
+    """Where archive.py moves old mood_history rows: HISTORY_ARCHIVE_DIR, else "<db name>_archive"."""
+    override = os.getenv("HISTORY_ARCHIVE_DIR")
+    return Path(override) if override else DB_PATH.with_name(DB_PATH.stem + "_archive")
+
+def _archived_days(user_id=None):
+    if next(history_archive_dir().glob("month=*/bucket=*/part-*.parquet"), None) is None:
+        return ()
+    import archive  # pyarrow: only loaded once there is an archive to read
+    return archive.archived_day_counts(user_id)
+
+def rebuild_mood_rollups(user_id=None, archived=None):
+    """
+    Backfill job: recompute rollups from mood_history (all users or one) plus
+    the rows archive.py moved out of it. `archived` overrides what is read
+    from the archive, as (user_id, day, mood, n) per-day counts.
+    """
+    if archived is None:
+        archived = _archived_days(user_id)
+    flush_writes()
+    with conn_cursor() as (con, cur):
+        if user_id is None:
+            cur.execute("DELETE FROM mood_rollups")
+            statements = _rollup_backfill()
+            args = ()
+        else:
+            cur.execute("DELETE FROM mood_rollups WHERE user_id=?", (user_id,))
+            statements = _rollup_backfill("WHERE user_id=?")
+            args = (user_id,)
+        for sql in statements:
+            cur.execute(sql, args)
+        cur.execute("CREATE TEMP TABLE IF NOT EXISTS archived_days (user_id INTEGER, day TEXT, mood TEXT, n INTEGER)")
+        cur.execute("DELETE FROM archived_days")
+        cur.executemany("INSERT INTO archived_days VALUES (?,?,?,?)", archived)
+        for g, expr in ROLLUP_PERIODS.items():
+            # WHERE true: SQLite needs it to parse an upsert after INSERT ... SELECT
+            cur.execute(f"""
+                INSERT INTO mood_rollups (user_id, granularity, period_start, mood, n)
+                SELECT user_id, '{g}', {expr.format(col="day")} AS p, mood, SUM(n)
+                FROM archived_days WHERE true GROUP BY user_id, p, mood
+                ON CONFLICT(user_id, granularity, period_start, mood) DO UPDATE SET n = n + excluded.n
+                """)
+        cur.execute("DELETE FROM archived_days")
+        cur.execute("UPDATE app_meta SET value = value + 1 WHERE key='rollups_version'")
@@ -0,0 +1,118 @@
+# dedupe.py
+"""
+Find songs that are the same track under different spellings, e.g.
+"Uptown Funk — Mark Ronson, Bruno Mars" and "Uptown Funk — Mark Ronson ft.
+Bruno Mars". The unique index only catches exact (title, artist, mood)
+repeats; this compares a normalized key instead: case, punctuation and
+accents on Latin letters dropped (other scripts are kept as they are),
+version suffixes ("(Remastered 2011)", "- Radio Edit") removed from titles,
+and artists split on ft./feat./&/,/+/;/and/with/vs and sorted. Songs whose
+title or artist has no letters or digits left are never grouped.
+
+The catalog is streamed by id in chunks, so memory holds one key per
+distinct song rather than the rows themselves.
+
+    python dedupe.py [--per-mood] [--delete] [--chunk 20000]
+"""
+import argparse
+import re
+import time
+import unicodedata
+from pathlib import Path
+
+import db
+
+CHUNK_SIZE = 20_000
+
+_BRACKETS = re.compile(r"[(\[{].*?[)\]}]")
+_VERSION = re.compile(r"\s[-–—]\s.*\b(remaster\w*|edit|version|live|mix|mono|stereo|acoustic|demo)\b.*$")
+_TITLE_FEAT = re.compile(r"[(\[]\s*(?:feat|ft|featuring)\b\.?([^)\]]*)[)\]]"
+                         r"|\s(?:feat|ft|featuring)\b\.?\s(.*?)(?=\s[-–—]\s|$)")
+_ARTIST_SPLIT = re.compile(r"\s*(?:,|&|\+|/|;|\b(?:feat|ft|featuring|and|with|vs)\b\.?)\s*")
+_NON_WORD = re.compile(r"[\W_]+")
+
+def _fold(s):
+    # drop the marks of accented Latin letters only: "й" or "が" without theirs is another letter
+    out = []
+    for c in unicodedata.normalize("NFKD", str(s or "").casefold()):
+        if unicodedata.combining(c) and out and out[-1].isascii():
+            continue
+        out.append(c)
+    return unicodedata.normalize("NFC", "".join(out))
+
+def _words(s):
+    return " ".join(_NON_WORD.sub(" ", s).split())
+
+def song_key(title, artist):
+    """
+    Normalized "title|artist1,artist2" key; equal keys mean the same track.
+    None when the title or the artist folds to nothing, so it matches no other song.
+    """
+    credited = [_fold(artist)]
+
+    def feat(m):  # "Song (feat. X)" / "Song ft. X": X is a credited artist
+        credited.append(m.group(1) or m.group(2))
+        return " "
+
+    title = _TITLE_FEAT.sub(feat, _fold(title))
+    title = _VERSION.sub("", _BRACKETS.sub(" ", title))
+    artists = ",".join(credited)
+    names = {_words(a) for a in _ARTIST_SPLIT.split(artists)}
+    names = sorted(n[4:] if n.startswith("the ") else n for n in names if n)
+    title = _words(title)
+    if not title or not names:
+        return None
+    return f"{title}|{','.join(names)}"
+
+def find_duplicates(per_mood=False, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Groups of duplicate songs, each a list of rows (id, title, artist, mood)
+    in id order; the first row is the one to keep. per_mood=True only groups
+    songs that also share a mood.
+    """
+    first, groups = {}, {}
+    after_id, scanned = 0, 0
+    while True:
+        with db.conn_cursor() as (con, cur):
+            rows = cur.execute("SELECT id, title, artist, mood FROM songs WHERE id > ? ORDER BY id LIMIT ?",
+                               (after_id, chunk_size)).fetchall()
+        if not rows:
+            break
+        for r in rows:
+            key = song_key(r["title"], r["artist"])
+            if key is None:
+                continue
+            if per_mood:
+                key = (key, r["mood"])
+            seen = first.setdefault(key, r)
+            if seen is not r:
+                groups.setdefault(key, [seen]).append(r)
+        after_id = rows[-1]["id"]
+        scanned += len(rows)
+        if progress:
+            progress(scanned, len(groups))
+    return list(groups.values())
+
+def main():
+    ap = argparse.ArgumentParser(description="Report (and optionally remove) duplicate songs.")
+    ap.add_argument("--db", type=Path, default=db.DB_PATH)
+    ap.add_argument("--chunk", type=int, default=CHUNK_SIZE)
+    ap.add_argument("--per-mood", action="store_true", help="only group songs that share a mood")
+    ap.add_argument("--delete", action="store_true", help="keep the oldest song of each group, delete the rest")
+    args = ap.parse_args()
+
+    db.DB_PATH = args.db
+    db.init_db()
+    t0 = time.perf_counter()
+    groups = find_duplicates(args.per_mood, args.chunk)
+    extra = sum(len(g) - 1 for g in groups)
+    for g in groups[:50]:
+        print(" | ".join(f"#{r['id']} {r['title']} — {r['artist']} ({r['mood']})" for r in g))
+    if len(groups) > 50:
+        print(f"... {len(groups) - 50} more groups")
+    print(f"{len(groups)} groups, {extra} duplicate songs ({time.perf_counter() - t0:.1f}s)")
+    if args.delete and extra:
+        print(f"deleted {db.delete_songs([r['id'] for g in groups for r in g[1:]])} songs")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# importer.py
+"""
+Streaming CSV song importer used by the app's CSV upload and from the shell.
+
+The file is read in chunks; each chunk is normalized with vectorized pandas
+ops, rows with an unknown mood or a blank title/artist are rejected, and the
+rest are committed in one transaction per chunk. Songs already in the
+library (same title, artist, mood) are skipped by the unique index.
+
+Optional valence/arousal columns (each in [-1, 1]) place a song in mood
+space; a row with both but no mood takes the label of its region.
+
+    python importer.py catalog.csv [--chunksize 50000] [--db app.db]
+"""
+import argparse
+import time
+from pathlib import Path
+
+import pandas as pd
+
+import db
+from moodspace import region_labels
+
+CHUNK_SIZE = 50_000
+REQUIRED_COLS = ("title", "artist", "mood")
+
+def normalize_chunk(df: pd.DataFrame) -> pd.DataFrame:
+    """Lowercase column names, trim text, canonicalize moods; adds url/valence/arousal columns if missing."""
+    df = df.rename(columns=lambda c: str(c).strip().lower())
+    missing = [c for c in REQUIRED_COLS if c not in df.columns]
+    if missing:
+        raise ValueError("CSV must have columns: title, artist, mood [, url]")
+    out = pd.DataFrame({
+        "title": df["title"].astype("string").str.strip(),
+        "artist": df["artist"].astype("string").str.strip(),
+        "mood": df["mood"].astype("string").str.strip().str.lower(),
+        "url": df["url"].astype("string").str.strip() if "url" in df.columns else pd.NA,
+    })
+    out["url"] = out["url"].replace("", pd.NA)
+    for col in ("valence", "arousal"):
+        out[col] = pd.to_numeric(df[col], errors="coerce") if col in df.columns else float("nan")
+    return out
+
+def import_csv(source, chunksize=CHUNK_SIZE, progress=None):
+    """
+    source: path or file-like. progress(stats) is called after every chunk.
+    Returns stats: rows, inserted, duplicates, invalid, seconds.
+    """
+    stats = {"rows": 0, "inserted": 0, "duplicates": 0, "invalid": 0, "seconds": 0.0}
+    t0 = time.perf_counter()
+    reader = pd.read_csv(source, chunksize=chunksize, dtype=str, keep_default_na=False,
+                         skipinitialspace=True)
+    for raw in reader:
+        df = normalize_chunk(raw)
+        has_vec = df["valence"].between(-1, 1) & df["arousal"].between(-1, 1)
+        vec_given = df["valence"].notna() | df["arousal"].notna()
+        infer = has_vec & df["mood"].fillna("").eq("")
+        if infer.any():
+            df.loc[infer, "mood"] = region_labels(df.loc[infer, ["valence", "arousal"]].to_numpy())
+        ok = df["mood"].isin(db.MOODS) & (df["title"].str.len() > 0) & (df["artist"].str.len() > 0)
+        ok = (ok & (has_vec | ~vec_given)).fillna(False)
+        good = df[ok].drop_duplicates(subset=["title", "artist", "mood"])
+        rows = list(good.astype(object).where(good.notna(), None).itertuples(index=False, name=None))
+        inserted = db.bulk_add_songs(rows) if rows else 0
+
+        stats["rows"] += len(df)
+        stats["invalid"] += int((~ok).sum())
+        stats["inserted"] += inserted
+        stats["duplicates"] += int(ok.sum()) - inserted
+        stats["seconds"] = time.perf_counter() - t0
+        if progress:
+            progress(dict(stats))
+    return stats
+
+def main():
+    ap = argparse.ArgumentParser(description="Import songs from a CSV (title,artist,mood[,url]).")
+    ap.add_argument("csv", type=Path)
+    ap.add_argument("--chunksize", type=int, default=CHUNK_SIZE)
+    ap.add_argument("--db", type=Path, default=db.DB_PATH)
+    args = ap.parse_args()
+
+    db.DB_PATH = args.db
+    db.init_db()
+
+    def report(s):
+        print(f"{s['rows']} rows  {s['inserted']} inserted  {s['duplicates']} duplicates  "
+              f"{s['invalid']} invalid  {s['rows'] / s['seconds'] if s['seconds'] else 0:.0f} rows/s")
+
+    import_csv(args.csv, args.chunksize, progress=report)
+
+if __name__ == "__main__":
+    main()
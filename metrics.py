@@ -0,0 +1,392 @@
+# metrics.py
+"""
+Lightweight instrumentation for the hot paths.
+
+`with span("name"):` or `@timed("name")` records a span's latency into a
+fixed-bucket histogram (exported for Prometheus) and a window of recent
+samples (the admin page's p50/p95/p99), with call, error and DB row counts.
+SQL run through db.conn_cursor is timed per statement, execute() through
+its last fetch, and its rows are charged to every span open on that thread.
+
+With METRICS=0 or set_enabled(False), span() hands back a shared no-op,
+@timed calls straight through and db cursors are plain sqlite3 cursors.
+
+SamplingProfiler is a pure-Python stack sampler for the same process: it
+polls every thread's frame at a fixed interval and counts collapsed stacks
+(flamegraph.pl / speedscope format).
+"""
+import atexit
+import bisect
+import json
+import math
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter, deque
+from functools import wraps
+
+ENABLED = os.getenv("METRICS", "1") != "0"
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # seconds
+RECENT_SAMPLES = 1024   # per span, for quantiles
+SQL_STATEMENTS = 500    # distinct statements tracked; the rest are pooled under "(other)"
+SLOW_SQL_MS = 5.0
+SLOW_SQL_KEEP = 200
+PROFILE_INTERVAL_S = 0.005
+PROFILE_MAX_STACKS = 20_000
+# leaf frames of threads parked waiting for work; their samples are dropped
+IDLE_FRAMES = {("threading.py", "wait"), ("queue.py", "get"), ("thread.py", "_worker"),
+               ("selectors.py", "select"), ("base_events.py", "_run_once")}
+
+_lock = threading.Lock()
+_local = threading.local()
+
+
+class Histogram:
+    __slots__ = ("buckets", "count", "sum", "max", "errors", "rows", "recent")
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)  # last one is +Inf
+        self.count = self.errors = self.rows = 0
+        self.sum = self.max = 0.0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def add(self, seconds, rows=0, error=False):
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+        self.errors += bool(error)
+        self.rows += rows
+        self.recent.append(seconds)
+
+    def quantile(self, q):
+        """Over the last RECENT_SAMPLES calls (nearest rank)."""
+        s = sorted(self.recent)
+        return s[min(len(s) - 1, max(0, math.ceil(q * len(s)) - 1))] if s else 0.0
+
+
+_spans = {}       # name -> Histogram
+_sql = {}         # statement text -> [calls, total s, max s, rows]
+_slow_sql = deque(maxlen=SLOW_SQL_KEEP)  # (unix time, ms, rows, statement)
+
+
+def set_enabled(flag):
+    global ENABLED
+    ENABLED = bool(flag)
+
+
+def reset():
+    with _lock:
+        _spans.clear()
+        _sql.clear()
+        _slow_sql.clear()
+
+
+def observe(name, seconds, rows=0, error=False):
+    with _lock:
+        h = _spans.get(name)
+        if h is None:
+            h = _spans[name] = Histogram()
+        h.add(seconds, rows, error)
+
+
+def _open_spans():
+    stack = getattr(_local, "spans", None)
+    if stack is None:
+        stack = _local.spans = []
+    return stack
+
+
+class _Span:
+    __slots__ = ("name", "rows", "_t0")
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+
+    def __enter__(self):
+        _open_spans().append(self)
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._t0
+        stack = _open_spans()
+        if stack and stack[-1] is self:
+            stack.pop()
+        observe(self.name, elapsed, self.rows, exc_type is not None)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+    rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name):
+    """Context manager timing the enclosed block as `name`."""
+    return _Span(name) if ENABLED else _NOOP
+
+
+def timed(name=None):
+    """Decorator form of span(); the name defaults to module.qualname."""
+    def deco(fn):
+        label = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            with _Span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+def add_rows(n):
+    """Charge n DB rows to every span open on this thread."""
+    for s in getattr(_local, "spans", ()):
+        s.rows += n
+
+
+def record_sql(sql, seconds, rows):
+    add_rows(rows)
+    with _lock:
+        st = _sql.get(sql)
+        if st is None:
+            if len(_sql) >= SQL_STATEMENTS:
+                sql = "(other)"
+            st = _sql.setdefault(sql, [0, 0.0, 0.0, 0])
+        st[0] += 1
+        st[1] += seconds
+        st[2] = max(st[2], seconds)
+        st[3] += rows
+        if seconds * 1e3 >= SLOW_SQL_MS:
+            _slow_sql.append((time.time(), seconds * 1e3, rows, sql))
+        h = _spans.get("db.query")
+        if h is None:
+            h = _spans["db.query"] = Histogram()
+        h.add(seconds, rows)
+
+
+_clock = time.perf_counter
+_execute, _executemany = sqlite3.Cursor.execute, sqlite3.Cursor.executemany
+_fetchone, _fetchmany, _fetchall = sqlite3.Cursor.fetchone, sqlite3.Cursor.fetchmany, sqlite3.Cursor.fetchall
+_next = sqlite3.Cursor.__next__
+
+
+class TimedCursor(sqlite3.Cursor):
+    """
+    sqlite3 cursor that reports each statement to record_sql when the next
+    one starts or it closes. Hot: the base methods are called unbound.
+    """
+    _stmt = None
+    _rows = None  # None until fetched from; DML reports rowcount instead
+
+    def _done(self):
+        rows = self._rows if self._rows is not None else max(self.rowcount, 0)
+        record_sql(self._stmt, self._elapsed, rows)
+        self._stmt = None
+
+    def execute(self, sql, parameters=()):
+        if self._stmt is not None:
+            self._done()
+        t0 = _clock()
+        try:
+            return _execute(self, sql, parameters)
+        finally:
+            self._stmt, self._elapsed, self._rows = sql, _clock() - t0, None
+
+    def executemany(self, sql, seq_of_parameters):
+        if self._stmt is not None:
+            self._done()
+        t0 = _clock()
+        try:
+            return _executemany(self, sql, seq_of_parameters)
+        finally:
+            self._stmt, self._elapsed, self._rows = sql, _clock() - t0, None
+
+    def fetchone(self):
+        t0 = _clock()
+        row = _fetchone(self)
+        self._elapsed += _clock() - t0
+        self._rows = (self._rows or 0) + (row is not None)
+        return row
+
+    def fetchmany(self, *size):
+        t0 = _clock()
+        rows = _fetchmany(self, *size)
+        self._elapsed += _clock() - t0
+        self._rows = (self._rows or 0) + len(rows)
+        return rows
+
+    def fetchall(self):
+        t0 = _clock()
+        rows = _fetchall(self)
+        self._elapsed += _clock() - t0
+        self._rows = (self._rows or 0) + len(rows)
+        return rows
+
+    def __next__(self):
+        t0 = _clock()
+        try:
+            row = _next(self)
+        finally:
+            self._elapsed += _clock() - t0
+        self._rows = (self._rows or 0) + 1
+        return row
+
+    def close(self):
+        if self._stmt is not None:
+            self._done()
+        super().close()
+
+
+# ---------- Sampling profiler ----------
+class SamplingProfiler:
+    """
+    Counts collapsed Python stacks of every other thread, sampled every
+    `interval` seconds; threads idling in IDLE_FRAMES are not counted.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL_S, max_stacks=PROFILE_MAX_STACKS):
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.stacks = Counter()
+        self.samples = 0
+        self.idle = 0
+        self.started = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return
+            self._stop.clear()
+            self.started = time.time()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            thread = self._thread
+            self._stop.set()
+        if thread is not None:
+            thread.join()
+
+    def clear(self):
+        with self._lock:
+            self.stacks.clear()
+            self.samples = self.idle = 0
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    self.idle += 1
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                key = ";".join(reversed(names))
+                with self._lock:
+                    if key in self.stacks or len(self.stacks) < self.max_stacks:
+                        self.stacks[key] += 1
+                    self.samples += 1
+
+    def collapsed(self):
+        """One "root;...;leaf count" line per stack (flamegraph.pl / speedscope input)."""
+        with self._lock:
+            return "".join(f"{k} {n}\n" for k, n in self.stacks.most_common())
+
+    def top(self, n=30):
+        """[(frame, self samples, total samples)] by self time."""
+        own, total = Counter(), Counter()
+        with self._lock:
+            items = list(self.stacks.items())
+        for key, count in items:
+            frames = key.split(";")
+            own[frames[-1]] += count
+            for f in set(frames):
+                total[f] += count
+        return [(f, c, total[f]) for f, c in own.most_common(n)]
+
+
+profiler = SamplingProfiler()
+atexit.register(profiler.stop)  # don't sample while the interpreter tears modules down
+if os.getenv("PROFILER") == "1":
+    profiler.start()
+
+
+# ---------- Exporters ----------
+def snapshot(top_sql=20):
+    """Everything the exporters and the admin page show, JSON-serializable (times in ms)."""
+    with _lock:
+        spans = {name: {"count": h.count, "errors": h.errors, "rows": h.rows,
+                        "mean_ms": h.sum / h.count * 1e3 if h.count else 0.0, "max_ms": h.max * 1e3,
+                        "p50_ms": h.quantile(0.5) * 1e3, "p95_ms": h.quantile(0.95) * 1e3,
+                        "p99_ms": h.quantile(0.99) * 1e3}
+                 for name, h in _spans.items()}
+        statements = sorted(_sql.items(), key=lambda kv: kv[1][1], reverse=True)[:top_sql]
+        slow = sorted(_slow_sql, key=lambda r: r[1], reverse=True)[:top_sql]
+    return {
+        "enabled": ENABLED,
+        "spans": dict(sorted(spans.items())),
+        "sql": [{"statement": " ".join(sql.split()), "calls": c, "total_ms": t * 1e3,
+                 "mean_ms": t / c * 1e3, "max_ms": m * 1e3, "rows": r}
+                for sql, (c, t, m, r) in statements],
+        "slow_sql": [{"at": at, "ms": ms, "rows": rows, "statement": " ".join(sql.split())}
+                     for at, ms, rows, sql in slow],
+        "profiler": {"running": profiler.running, "samples": profiler.samples, "idle": profiler.idle},
+    }
+
+
+def to_json():
+    return json.dumps(snapshot())
+
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def to_prometheus():
+    """Prometheus text exposition format (version 0.0.4)."""
+    with _lock:
+        spans = [(name, list(h.buckets), h.sum, h.count, h.errors, h.rows) for name, h in sorted(_spans.items())]
+    out = ["# HELP app_span_seconds Latency of instrumented spans.", "# TYPE app_span_seconds histogram"]
+    for name, buckets, total, count, _, _ in spans:
+        label, cum = _label(name), 0
+        for bound, n in zip(BUCKETS + (math.inf,), buckets):
+            cum += n
+            le = "+Inf" if bound == math.inf else repr(bound)
+            out.append(f'app_span_seconds_bucket{{span="{label}",le="{le}"}} {cum}')
+        out.append(f'app_span_seconds_sum{{span="{label}"}} {total}')
+        out.append(f'app_span_seconds_count{{span="{label}"}} {count}')
+    for metric, idx, help_ in (("app_span_errors_total", 4, "Spans that raised."),
+                               ("app_span_rows_total", 5, "DB rows read or written inside spans.")):
+        out += [f"# HELP {metric} {help_}", f"# TYPE {metric} counter"]
+        out += [f'{metric}{{span="{_label(s[0])}"}} {s[idx]}' for s in spans]
+    return "\n".join(out) + "\n"
@@ -1,26 +1,132 @@
 # mood.py
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Iterable, List
 
-_an = SentimentIntensityAnalyzer()
+from metrics import timed
+from moodlabels import MOOD_POINTS
+
+_an = None
+_an_lock = threading.Lock()
 
 KEY_HYPE = {"dance","party","hype","excited","pumped","workout","run","gym","energy"}
 KEY_CALM = {"calm","relax","sleep","tired","chill","peace","meditate"}
 
-def detect_mood(text: str) -> str:
-    if not text or not text.strip():
-        return "neutral"
-    t = text.lower()
-    scores = _an.polarity_scores(t)
-    comp = scores["compound"]  # -1..1
+ENERGY_LEVELS = ("Auto", "Relax", "Moderate", "Hype")
+ENERGY_SHIFT = {"Relax": -0.4, "Hype": 0.4}  # arousal nudge, the vector form of apply_energy
+
+CACHE_SIZE = 8192           # distinct normalized texts kept by the result cache
+PARALLEL_MIN_BATCH = 20000  # below this, detect_moods stays in-process
+CHUNK_SIZE = 2000
+
+def _analyzer():
+    """Process-wide VADER analyzer, built on first use (loading its lexicon costs ~40 ms)."""
+    global _an
+    if _an is None:
+        with _an_lock:
+            if _an is None:
+                from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+                _an = SentimentIntensityAnalyzer()
+    return _an
+
+def _matcher(keys):
+    # one alternation scan == any(k in t for k in keys) (plain substring match)
+    return re.compile("|".join(re.escape(k) for k in sorted(keys, key=len, reverse=True)))
+
+_HYPE_RE = _matcher(KEY_HYPE)
+_CALM_RE = _matcher(KEY_CALM)
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _compound(t: str) -> float:
+    """VADER's compound score (-1..1), shared by the label and the vector so a text is scored once."""
+    return _analyzer().polarity_scores(t)["compound"]
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _classify(t: str) -> str:
+    """t is already lowercased and non-blank."""
+    comp = _compound(t)
     # simple arousal nudge
     if comp >= 0.5:
-        if any(k in t for k in KEY_HYPE):
+        if _HYPE_RE.search(t):
             return "energetic"
         return "happy"
     if comp <= -0.4:
         return "sad"
-    if any(k in t for k in KEY_CALM):
+    if _CALM_RE.search(t):
         return "calm"
-    if any(k in t for k in KEY_HYPE):
+    if _HYPE_RE.search(t):
         return "energetic"
     return "neutral"
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _vector(t: str):
+    """
+    (valence, arousal) in [-1, 1]^2: valence is VADER's compound score; arousal
+    rises with its strength and with hype keywords and falls with calm ones.
+    """
+    comp = _compound(t)
+    hype, calm = len(_HYPE_RE.findall(t)), len(_CALM_RE.findall(t))
+    arousal = 0.5 * abs(comp) - 0.2 + 0.45 * min(hype, 2) - 0.45 * min(calm, 2)
+    return comp, max(-1.0, min(1.0, arousal))
+
+def _normalize(text) -> str:
+    if not text or not text.strip():
+        return ""
+    return text.lower()
+
+def _classify_many(keys: List[str]) -> List[str]:
+    return [_classify(k) for k in keys]
+
+@timed("mood.detect")
+def detect_mood(text: str) -> str:
+    t = _normalize(text)
+    return _classify(t) if t else "neutral"
+
+def detect_moods(texts: Iterable[str], processes: int = 0, chunksize: int = CHUNK_SIZE) -> List[str]:
+    """
+    Batch version of detect_mood; results match it element for element.
+    Duplicate texts are scored once. With processes > 0, batches of at least
+    PARALLEL_MIN_BATCH distinct texts are scored on a process pool.
+    """
+    keys = [_normalize(t) for t in texts]
+    unique = [k for k in dict.fromkeys(keys) if k]
+    if processes and len(unique) >= PARALLEL_MIN_BATCH:
+        chunks = [unique[i:i + chunksize] for i in range(0, len(unique), chunksize)]
+        with ProcessPoolExecutor(max_workers=processes) as ex:
+            labels = [m for part in ex.map(_classify_many, chunks) for m in part]
+    else:
+        labels = _classify_many(unique)
+    found = dict(zip(unique, labels))
+    return [found[k] if k else "neutral" for k in keys]
+
+@timed("mood.vector")
+def mood_vector(text: str):
+    """Continuous counterpart of detect_mood; blank input sits at the neutral point."""
+    t = _normalize(text)
+    return _vector(t) if t else MOOD_POINTS["neutral"]
+
+def apply_energy(mood: str, energy: str) -> str:
+    # small manual tweak
+    if energy == "Relax" and mood in {"energetic","happy"}:
+        mood = "calm" if mood == "energetic" else "neutral"
+    if energy == "Hype" and mood in {"neutral","calm"}:
+        mood = "energetic"
+    return mood
+
+def apply_energy_vector(vector, energy: str):
+    valence, arousal = vector
+    arousal = max(-1.0, min(1.0, arousal + ENERGY_SHIFT.get(energy, 0.0)))
+    return round(valence, 3), round(arousal, 3)
+
+def cache_info():
+    return _classify.cache_info()
+
+def clear_cache():
+    """Call after changing KEY_HYPE/KEY_CALM or the score thresholds at runtime."""
+    global _HYPE_RE, _CALM_RE
+    _HYPE_RE, _CALM_RE = _matcher(KEY_HYPE), _matcher(KEY_CALM)
+    _compound.cache_clear()
+    _classify.cache_clear()
+    _vector.cache_clear()
@@ -0,0 +1,16 @@
+# moodlabels.py
+"""
+The canonical mood labels and where each sits in (valence, arousal) space.
+No imports, so the detector (mood.py) can share them without loading the
+database layer; db.py re-exports them.
+"""
+MOODS = ("happy", "sad", "neutral", "calm", "energetic")
+# centre of each label's region in (valence, arousal) space, both in [-1, 1]
+MOOD_POINTS = {
+    "happy": (0.6, 0.3),
+    "sad": (-0.6, -0.3),
+    "neutral": (0.0, 0.0),
+    "calm": (0.3, -0.6),
+    "energetic": (0.5, 0.8),
+}
+MOOD_SPREAD = 0.15  # label-only songs are spread +-MOOD_SPREAD around their centre
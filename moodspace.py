@@ -0,0 +1,165 @@
+# moodspace.py
+"""
+Nearest-neighbour track retrieval in (valence, arousal) space.
+
+Songs are points in [-1, 1]^2 (stored coordinates, or their label's region
+for songs that only have a mood; see db.VALENCE_SQL). MoodIndex keeps them
+in packed float32 arrays bucketed on a GRID x GRID grid, sorted by cell, so
+a query only scans the rings of cells around it and still returns the exact
+k nearest. Songs added since the last compaction sit in an unsorted tail
+that is scanned brute force and merged in once it grows past
+TAIL_FRACTION of the index; deletes trigger a full rebuild.
+"""
+import threading
+
+import numpy as np
+
+import db
+
+GRID = 64
+TAIL_FRACTION = 0.05
+MIN_TAIL = 4096
+
+_LABELS = list(db.MOOD_POINTS)
+_CENTRES = np.array([db.MOOD_POINTS[m] for m in _LABELS], np.float32)
+
+def region_labels(points):
+    """Mood label of each (valence, arousal) row: the nearest MOOD_POINTS centre."""
+    points = np.asarray(points, np.float32).reshape(-1, 2)
+    d = ((points[:, None, :] - _CENTRES[None, :, :]) ** 2).sum(axis=2)
+    return [_LABELS[i] for i in d.argmin(axis=1)]
+
+def mood_for_vector(vector):
+    return region_labels([vector])[0]
+
+class MoodIndex:
+    """Exact kNN over 2-D points; not thread-safe on its own (see nearest_songs)."""
+
+    def __init__(self, grid=GRID):
+        self.grid = grid
+        self.cell = 2.0 / grid
+        self.ids = np.empty(0, np.int64)
+        self.points = np.empty((0, 2), np.float32)
+        self.starts = np.zeros(grid * grid + 1, np.int64)
+        self._tail_ids, self._tail_points = [], []
+        self._tail_n = 0
+
+    def __len__(self):
+        return len(self.ids) + self._tail_n
+
+    @property
+    def nbytes(self):
+        tail = self._tail_n * (8 + 8)
+        return self.ids.nbytes + self.points.nbytes + self.starts.nbytes + tail
+
+    def _cells(self, points):
+        xy = np.clip(((points + 1.0) / self.cell).astype(np.int64), 0, self.grid - 1)
+        return xy[:, 1] * self.grid + xy[:, 0]
+
+    def add(self, ids, points):
+        """Append points (ids: int array, points: (n, 2) float array)."""
+        if not len(ids):
+            return
+        self._tail_ids.append(np.asarray(ids, np.int64))
+        self._tail_points.append(np.asarray(points, np.float32).reshape(-1, 2))
+        self._tail_n += len(ids)
+        if self._tail_n > max(MIN_TAIL, TAIL_FRACTION * len(self.ids)):
+            self.compact()
+
+    def compact(self):
+        """Merge the tail into the sorted grid arrays."""
+        if not self._tail_n:
+            return
+        ids = np.concatenate([self.ids] + self._tail_ids)
+        points = np.concatenate([self.points] + self._tail_points)
+        cells = self._cells(points)
+        order = np.argsort(cells, kind="stable")
+        self.ids, self.points = ids[order], points[order]
+        self.starts = np.concatenate(([0], np.cumsum(np.bincount(cells, minlength=self.grid * self.grid))))
+        self._tail_ids, self._tail_points, self._tail_n = [], [], 0
+
+    def _ring(self, cx, cy, r):
+        """Positions of points in the cells at Chebyshev distance r from (cx, cy)."""
+        g, starts, parts = self.grid, self.starts, []
+        x0, x1 = max(cx - r, 0), min(cx + r, g - 1)
+        for y in range(max(cy - r, 0), min(cy + r, g - 1) + 1):
+            if abs(y - cy) == r:  # top/bottom edge: one contiguous run of cells
+                parts.append((starts[y * g + x0], starts[y * g + x1 + 1]))
+            else:
+                for x in (cx - r, cx + r):
+                    if 0 <= x < g:
+                        parts.append((starts[y * g + x], starts[y * g + x + 1]))
+        return [np.arange(a, b) for a, b in parts if b > a]
+
+    def search(self, query, k):
+        """(ids, distances) of the k nearest points, closest first."""
+        q = np.asarray(query, np.float32)
+        best_ids, best_d = np.empty(0, np.int64), np.empty(0, np.float32)
+        if self._tail_n:
+            tail_ids, tail_points = np.concatenate(self._tail_ids), np.concatenate(self._tail_points)
+            best_ids, best_d = tail_ids, np.sqrt(((tail_points - q) ** 2).sum(axis=1))
+        if len(self.ids):
+            cx, cy = np.clip(((q + 1.0) / self.cell).astype(np.int64), 0, self.grid - 1)
+            for r in range(self.grid):
+                found = self._ring(int(cx), int(cy), r)
+                if found:
+                    pos = np.concatenate(found)
+                    d = np.sqrt(((self.points[pos] - q) ** 2).sum(axis=1))
+                    best_ids, best_d = np.concatenate((best_ids, self.ids[pos])), np.concatenate((best_d, d))
+                    if len(best_d) > k:
+                        keep = np.argpartition(best_d, k - 1)[:k]
+                        best_ids, best_d = best_ids[keep], best_d[keep]
+                # anything outside the scanned square is at least r cells away
+                if len(best_d) >= k and best_d.max() <= r * self.cell:
+                    break
+        order = np.argsort(best_d, kind="stable")[:k]
+        return best_ids[order], best_d[order]
+
+    def search_brute(self, query, k):
+        """Reference linear scan over every point (used by the benchmark)."""
+        self.compact()
+        d = np.sqrt(((self.points - np.asarray(query, np.float32)) ** 2).sum(axis=1))
+        k = min(k, len(d))
+        if not k:
+            return self.ids[:0], d[:0]
+        top = np.argpartition(d, k - 1)[:k]
+        top = top[np.argsort(d[top], kind="stable")]
+        return self.ids[top], d[top]
+
+# ---------- Process-wide index over the songs table ----------
+_index = None
+_state = None   # (db path, library_version, songs_deleted, max indexed id)
+_lock = threading.Lock()
+
+def _load(index, after_id):
+    last = after_id
+    for rows in db.iter_song_points(after_id):
+        arr = np.array(rows, np.float64)
+        index.add(arr[:, 0].astype(np.int64), arr[:, 1:])
+        last = int(arr[-1, 0])
+    return last
+
+def get_index():
+    """The songs index, brought up to date: new songs are appended, deletes rebuild it."""
+    global _index, _state
+    version, deleted = db.catalog_state()
+    path = str(db.DB_PATH)
+    with _lock:
+        if _state is not None and _state[:3] == (path, version, deleted):
+            return _index
+        if _state is None or _state[0] != path or _state[2] != deleted:
+            _index, last = MoodIndex(), 0
+        else:
+            last = _state[3]
+        last = _load(_index, last)
+        _state = (path, version, deleted, last)
+        return _index
+
+def nearest_songs(vector, k=20):
+    """Library songs closest to `vector` (valence, arousal), nearest first, with a `distance` key."""
+    index = get_index()
+    with _lock:
+        ids, dist = index.search(vector, k)
+    rows = db.fetch_songs_by_ids(ids.tolist())
+    by_id = dict(zip(ids.tolist(), dist.tolist()))
+    return [dict(r, distance=by_id[r["id"]]) for r in rows]
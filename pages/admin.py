@@ -0,0 +1,74 @@
+# pages/admin.py
+"""Profiling dashboard: span latency percentiles, slow SQL and the sampling profiler (ADMIN_USERS only)."""
+import time
+
+import streamlit as st
+
+import metrics
+from auth import is_admin
+
+st.set_page_config(page_title="Admin · Profiling", page_icon="🛠", layout="wide")
+st.title("🛠 Profiling")
+
+if not is_admin(st.session_state.get("username")):
+    st.error("Admins only. Log in on the main page with an account listed in ADMIN_USERS.")
+    st.stop()
+
+c1, c2, c3 = st.columns(3)
+with c1:
+    enabled = st.toggle("Instrumentation", value=metrics.ENABLED,
+                        help="Off: spans are no-ops and SQL is not timed (METRICS=0 at startup)")
+    if enabled != metrics.ENABLED:
+        metrics.set_enabled(enabled)
+with c2:
+    profiling = st.toggle("Sampling profiler", value=metrics.profiler.running,
+                          help=f"Samples every thread's stack each {metrics.PROFILE_INTERVAL_S * 1e3:.0f} ms")
+    if profiling and not metrics.profiler.running:
+        metrics.profiler.start()
+    elif not profiling and metrics.profiler.running:
+        metrics.profiler.stop()
+with c3:
+    if st.button("Reset counters"):
+        metrics.reset()
+        metrics.profiler.clear()
+        st.rerun()
+
+snap = metrics.snapshot()
+
+st.subheader("Spans")
+if snap["spans"]:
+    st.dataframe([{"span": name, "calls": s["count"], "errors": s["errors"], "rows": s["rows"],
+                   "p50 ms": round(s["p50_ms"], 2), "p95 ms": round(s["p95_ms"], 2),
+                   "p99 ms": round(s["p99_ms"], 2), "max ms": round(s["max_ms"], 2)}
+                  for name, s in snap["spans"].items()], hide_index=True, width="stretch")
+else:
+    st.caption("Nothing recorded yet — use the app, then come back.")
+
+st.subheader(f"Slowest recent SQL (≥ {metrics.SLOW_SQL_MS:g} ms)")
+if snap["slow_sql"]:
+    st.dataframe([{"when": time.strftime("%H:%M:%S", time.localtime(r["at"])), "ms": round(r["ms"], 2),
+                   "rows": r["rows"], "statement": r["statement"]} for r in snap["slow_sql"]],
+                 hide_index=True, width="stretch")
+else:
+    st.caption("No statement over the threshold.")
+
+with st.expander("SQL by total time"):
+    st.dataframe([{"statement": r["statement"], "calls": r["calls"], "total ms": round(r["total_ms"], 1),
+                   "mean ms": round(r["mean_ms"], 3), "max ms": round(r["max_ms"], 2), "rows": r["rows"]}
+                  for r in snap["sql"]], hide_index=True, width="stretch")
+
+st.subheader("Profiler")
+prof = metrics.profiler
+st.caption(f"{prof.samples} busy samples, {prof.idle} idle" + (" · running" if prof.running else ""))
+top = prof.top()
+if top:
+    st.dataframe([{"frame": f, "self %": round(100 * own / prof.samples, 1),
+                   "total %": round(100 * total / prof.samples, 1)} for f, own, total in top],
+                 hide_index=True, width="stretch")
+    st.download_button("Download collapsed stacks", prof.collapsed(), file_name="profile.folded",
+                       help="Input for flamegraph.pl or speedscope")
+
+with st.expander("Exporters"):
+    st.markdown("The HTTP API serves these at `GET /metrics` (Prometheus) and `GET /metrics?format=json`, "
+                "to requests bearing `METRICS_TOKEN`.")
+    st.code(metrics.to_prometheus()[:5000], language="text")
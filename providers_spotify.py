@@ -1,36 +1,50 @@
 # providers_spotify.py
 import os
-from typing import List, Dict
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import List, Dict, Optional
+
+from metrics import timed
+
+CACHE_TTL_S = 600          # fresh responses are served without going upstream
+STALE_TTL_S = 24 * 3600    # expired entries are kept this long as a timeout/error fallback
+CACHE_SIZE = 256
+CALL_TIMEOUT_S = 1.0       # hard cap on how long a caller waits for Spotify (recommend.DEADLINE_S builds on it)
+REQUEST_TIMEOUT_S = 3.0    # HTTP timeout; a fetch callers gave up on still fills the cache
+
+# simple mapping mood->search query
+QMAP = {
+    "happy": "feel good pop",
+    "sad": "sad acoustic",
+    "calm": "lofi chill",
+    "neutral": "soft pop",
+    "energetic": "workout hits"
+}
 
 def _client():
+    import requests
     import spotipy
+    from spotipy.cache_handler import MemoryCacheHandler
     from spotipy.oauth2 import SpotifyClientCredentials
     cid = os.getenv("SPOTIFY_CLIENT_ID")
     secret = os.getenv("SPOTIFY_CLIENT_SECRET")
     if not cid or not secret:
         return None
-    auth_mgr = SpotifyClientCredentials(client_id=cid, client_secret=secret)
-    sp = spotipy.Spotify(auth_manager=auth_mgr)
+    session = requests.Session()  # shared by token refreshes and API calls
+    auth_mgr = SpotifyClientCredentials(client_id=cid, client_secret=secret, requests_session=session,
+                                        requests_timeout=REQUEST_TIMEOUT_S, cache_handler=MemoryCacheHandler())
+    sp = spotipy.Spotify(auth_manager=auth_mgr, requests_session=session, requests_timeout=REQUEST_TIMEOUT_S,
+                         retries=0, status_retries=0)
+    # overridable so tests/benchmarks can point at a local stub server
+    if os.getenv("SPOTIFY_TOKEN_URL"):
+        auth_mgr.OAUTH_TOKEN_URL = os.environ["SPOTIFY_TOKEN_URL"]
+    if os.getenv("SPOTIFY_API_URL"):
+        sp.prefix = os.environ["SPOTIFY_API_URL"].rstrip("/") + "/"
     return sp
 
-def search_tracks_by_mood(mood: str, limit: int = 10) -> List[Dict]:
-    """
-    Returns: list of dicts: {title, artist, url, preview_url}
-    If credentials missing, returns [] (caller can fallback).
-    """
-    sp = _client()
-    if sp is None:
-        return []
-    # simple mapping mood->search query
-    qmap = {
-        "happy": "feel good pop",
-        "sad": "sad acoustic",
-        "calm": "lofi chill",
-        "neutral": "soft pop",
-        "energetic": "workout hits"
-    }
-    query = qmap.get(mood.lower(), mood)
-    res = sp.search(q=query, type="track", limit=limit)
+def _tracks(res) -> List[Dict]:
     out = []
     for item in res.get("tracks", {}).get("items", []):
         title = item["name"]
@@ -39,3 +53,102 @@ def search_tracks_by_mood(mood: str, limit: int = 10) -> List[Dict]:
         preview = item.get("preview_url")  # can be None
         out.append({"title": title, "artist": artists, "url": url, "preview_url": preview})
     return out
+
+class SpotifyProvider:
+    """
+    One long-lived Spotify client behind a TTL + LRU response cache.
+    Concurrent identical searches share one upstream request (single-flight),
+    and callers never wait longer than `timeout`; on timeout or error they get
+    the last cached (possibly stale) result, or [].
+    """
+
+    def __init__(self, client_factory=_client, ttl=CACHE_TTL_S, stale_ttl=STALE_TTL_S,
+                 size=CACHE_SIZE, timeout=CALL_TIMEOUT_S, workers=4):
+        self.client_factory = client_factory
+        self.ttl, self.stale_ttl, self.size, self.timeout = ttl, stale_ttl, size, timeout
+        self._sp = None
+        self._sp_ready = False
+        self._cache = OrderedDict()   # key -> (stored_at, tracks)
+        self._inflight = {}           # key -> Future
+        self._lock = threading.RLock()  # done-callbacks may run while it is held
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="spotify")
+        self.stats = {"upstream": 0, "hits": 0, "stale": 0, "coalesced": 0, "timeouts": 0, "errors": 0}
+
+    def client(self):
+        with self._lock:
+            if not self._sp_ready:
+                self._sp = self.client_factory()
+                self._sp_ready = True
+            return self._sp
+
+    def _lookup(self, key, max_age):
+        hit = self._cache.get(key)
+        if hit is None or time.monotonic() - hit[0] > max_age:
+            return None
+        self._cache.move_to_end(key)
+        return hit[1]
+
+    def _store(self, key, fut):
+        with self._lock:
+            self._inflight.pop(key, None)
+            if fut.exception() is not None:
+                return
+            self._cache[key] = (time.monotonic(), fut.result())
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.size:
+                self._cache.popitem(last=False)
+
+    def _fetch(self, sp, key):
+        query, limit, market = key
+        with self._lock:
+            self.stats["upstream"] += 1
+        return _tracks(sp.search(q=query, type="track", limit=limit, market=market))
+
+    def search(self, query: str, limit: int = 10, market: Optional[str] = None) -> List[Dict]:
+        sp = self.client()
+        if sp is None:
+            return []
+        key = (query, limit, market)
+        with self._lock:
+            fresh = self._lookup(key, self.ttl)
+            if fresh is not None:
+                self.stats["hits"] += 1
+                return fresh
+            fut = self._inflight.get(key)
+            if fut is None:
+                fut = self._pool.submit(self._fetch, sp, key)
+                self._inflight[key] = fut
+                fut.add_done_callback(lambda f: self._store(key, f))
+            else:
+                self.stats["coalesced"] += 1
+        try:
+            return fut.result(timeout=self.timeout)
+        except FutureTimeout:
+            self.stats["timeouts"] += 1
+        except Exception:
+            self.stats["errors"] += 1
+        with self._lock:
+            stale = self._lookup(key, self.stale_ttl)
+        if stale is not None:
+            self.stats["stale"] += 1
+            return stale
+        return []
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+_provider = SpotifyProvider()
+
+def get_provider() -> SpotifyProvider:
+    return _provider
+
+@timed("spotify.search")
+def search_tracks_by_mood(mood: str, limit: int = 10, market: Optional[str] = None) -> List[Dict]:
+    """
+    Returns: list of dicts: {title, artist, url, preview_url}
+    If credentials missing, returns [] (caller can fallback).
+    Responses are cached; a slow or failing Spotify returns the last cached result or [].
+    """
+    query = QMAP.get(mood.lower(), mood)
+    return _provider.search(query, limit=limit, market=market)
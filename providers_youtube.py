@@ -7,7 +7,8 @@ def youtube_search_link(query: str) -> str:
 
 def tracks_from_db_rows(rows):
     """
-    Convert DB rows to unified track dicts (title, artist, url, preview_url=None).
+    Convert DB rows to unified track dicts (title, artist, url, preview_url=None,
+    id = the library song id, for feedback).
     If a row has no url, we provide a YouTube search link for the title+artist.
     """
     results = []
@@ -15,6 +16,6 @@ def tracks_from_db_rows(rows):
         title, artist, mood, url = r["title"], r["artist"], r["mood"], r["url"]
         if not url:
             url = youtube_search_link(f"{title} {artist}")
-        results.append({"title": title, "artist": artist, "url": url, "preview_url": None})
+        results.append({"title": title, "artist": artist, "url": url, "preview_url": None, "id": r["id"]})
     return results
 
@@ -0,0 +1,118 @@
+# ranking.py
+"""
+Personalized ordering of a mood partition.
+
+Play/skip/like feedback is appended to song_events, and db.record_event
+folds each event into per-user track and artist affinity and per-track
+popularity, so a request only reads precomputed scores. The partition
+itself is held as NumPy arrays per mood, rebuilt when the catalog changes
+or popularity is older than PARTITION_TTL_S, and a candidate window of up
+to MAX_CANDIDATES tracks is scored in one vectorized pass.
+
+    score = track * tanh(song affinity / 3) + artist * tanh(artist affinity / 5)
+          + popularity * log-scaled popularity + explore * Gumbel noise
+"""
+import numpy as np
+
+import db
+from cache import LRUCache
+
+MAX_CANDIDATES = 10_000
+PARTITION_TTL_S = 60
+WEIGHTS = {"track": 0.2, "artist": 1.0, "popularity": 0.5, "explore": 0.02}  # tuned with eval_ranking
+
+_partitions = LRUCache(len(db.MOODS) * 2, ttl=PARTITION_TTL_S)
+
+class Partition:
+    """Columnar copy of one mood's songs: ids sorted ascending, aligned arrays."""
+
+    def __init__(self, rows):
+        n = len(rows)
+        self.rows = rows
+        self.ids = np.fromiter((r["id"] for r in rows), np.int64, n)
+        artist_idx, self.artist_index = np.empty(n, np.int32), {}
+        for i, r in enumerate(rows):
+            artist_idx[i] = self.artist_index.setdefault(db.artist_key(r["artist"]), len(self.artist_index))
+        self.artist_idx = artist_idx
+        # positions grouped by artist: by_artist[starts[a]:starts[a + 1]] are artist a's tracks
+        self.by_artist = np.argsort(artist_idx, kind="stable")
+        self.starts = np.concatenate(([0], np.cumsum(np.bincount(artist_idx, minlength=len(self.artist_index)))))
+        counts = np.array([(r["plays"], r["skips"], r["likes"]) for r in rows], np.float32).reshape(n, 3)
+        raw = np.log1p(np.maximum(counts[:, 0] + 3 * counts[:, 2] - counts[:, 1], 0))
+        self.popularity = raw / raw.max() if n and raw.max() > 0 else raw
+
+    def __len__(self):
+        return len(self.ids)
+
+def partition(mood):
+    mood = db.normalize_mood(mood)
+    return _partitions.get_or_compute((mood, db.library_version()),
+                                      lambda: Partition(db.fetch_mood_partition(mood)))
+
+def _candidates(part, known, liked_artists, max_candidates, rng):
+    """
+    Every track the user has feedback on, tracks by artists they like (up to
+    half the budget), and a random window of the partition for the rest.
+    """
+    n = len(part)
+    if n <= max_candidates:
+        return np.arange(n)
+    liked = np.concatenate([part.by_artist[part.starts[a]:part.starts[a + 1]] for a in liked_artists] or [known])
+    if len(liked) > max_candidates // 2:
+        liked = liked[rng.integers(len(liked), size=max_candidates // 2)]
+    window = (rng.integers(n) + np.arange(max(0, max_candidates - len(liked) - len(known)))) % n
+    return np.unique(np.concatenate((window, known, liked)))
+
+def rank(user_id, mood, k=50, max_per_artist=None, rng=None, weights=None, max_candidates=MAX_CANDIDATES):
+    """
+    Top-k tracks of `mood` for this user, best first: dicts with id, title,
+    artist, mood, url and score. Users without feedback get popularity order
+    (plus exploration noise).
+    """
+    part = partition(mood)
+    if not len(part):
+        return []
+    w = dict(WEIGHTS, **(weights or {}))
+    rng = rng if rng is not None else np.random.default_rng()
+    songs, artists = db.get_user_affinity(user_id) if user_id is not None else ([], [])
+
+    # user's tracks that are in this partition, as positions into part.ids
+    aff_ids = np.fromiter((r["song_id"] for r in songs), np.int64, len(songs))
+    aff_scores = np.fromiter((r["score"] for r in songs), np.float32, len(songs))
+    pos = np.searchsorted(part.ids, aff_ids)
+    hit = pos < len(part)
+    hit[hit] = part.ids[pos[hit]] == aff_ids[hit]
+    track_aff = np.zeros(len(part), np.float32)
+    track_aff[pos[hit]] = aff_scores[hit]
+
+    artist_aff = np.zeros(len(part.artist_index), np.float32)
+    for r in artists:
+        i = part.artist_index.get(r["artist"])
+        if i is not None:
+            artist_aff[i] = r["score"]
+
+    cand = _candidates(part, pos[hit], np.flatnonzero(artist_aff > 0), max_candidates, rng)
+    score = (w["track"] * np.tanh(track_aff[cand] / 3)
+             + w["artist"] * np.tanh(artist_aff[part.artist_idx[cand]] / 5)
+             + w["popularity"] * part.popularity[cand])
+    if w["explore"]:
+        score += w["explore"] * rng.gumbel(size=len(cand)).astype(np.float32)
+
+    m = min(len(cand), k * 4 if max_per_artist else k)
+    top = np.argpartition(-score, m - 1)[:m]
+    top = top[np.argsort(-score[top])]
+
+    out, per_artist = [], {}
+    for i in top:
+        j = cand[i]
+        if max_per_artist:
+            a = part.artist_idx[j]
+            if per_artist.get(a, 0) >= max_per_artist:
+                continue
+            per_artist[a] = per_artist.get(a, 0) + 1
+        r = part.rows[j]
+        out.append({"id": r["id"], "title": r["title"], "artist": r["artist"], "mood": db.normalize_mood(mood),
+                    "url": r["url"], "score": float(score[i])})
+        if len(out) >= k:
+            break
+    return out
@@ -0,0 +1,119 @@
+# reclassify.py
+"""
+Re-run the mood detector over mood_history after KEY_HYPE/KEY_CALM or the
+score thresholds in mood.py change.
+
+Rows are streamed by id (keyset pagination) in fixed-size chunks, scored on a
+process pool and written back one transaction per chunk together with a
+checkpoint, so a crashed run resumes where it stopped and memory stays flat.
+The checkpoint is cleared once a run completes.
+
+Both the label and the (valence, arousal) vector are rewritten, with the
+energy setting each row was recorded with (Relax / Hype) applied again, so a
+run with unchanged rules changes nothing. Rows recorded before that setting
+was stored (energy IS NULL) are skipped unless --assume-auto says they had
+none. Rows already moved to the Parquet archive (archive.py) are not revisited.
+
+    python reclassify.py [--chunk 5000] [--workers 4] [--dry-run] [--restart] [--assume-auto]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import db
+from mood import apply_energy, apply_energy_vector, detect_moods, mood_vector
+
+JOB_NAME = "reclassify_mood_history"
+
+def _split(seq, parts):
+    step = max(1, -(-len(seq) // parts))
+    return [seq[i:i + step] for i in range(0, len(seq), step)]
+
+def _score(items):
+    """(label, valence, arousal) per (text, energy), as service.detect_user_mood stores them."""
+    texts = [t for t, _ in items]
+    return [(apply_energy(m, e), *apply_energy_vector(mood_vector(t), e))
+            for (t, e), m in zip(items, detect_moods(texts))]
+
+def _read_chunk(after_id, upto_id, size):
+    with db.conn_cursor() as (con, cur):
+        cur.execute("""
+            SELECT id, text_input, detected_mood, valence, arousal, energy FROM mood_history
+            WHERE id > ? AND id <= ? ORDER BY id LIMIT ?
+        """, (after_id, upto_id, size))
+        return cur.fetchall()
+
+def _write_chunk(updates, last_id, job, dry_run):
+    with db.conn_cursor() as (con, cur):
+        if not dry_run:
+            cur.executemany("UPDATE mood_history SET detected_mood=?, valence=?, arousal=? WHERE id=?", updates)
+        db.set_checkpoint(cur, job, last_id)
+
+def reclassify(chunk_size=5000, workers=0, job=JOB_NAME, restart=False, dry_run=False, assume_auto=False,
+               progress=print):
+    """
+    Returns dict(rows, changed, skipped, seconds). workers=0 scores in-process.
+    assume_auto=True rescores rows with no stored energy setting as "Auto".
+    """
+    if dry_run:
+        job += ":dry-run"
+    if restart:
+        db.clear_checkpoint(job)
+    after_id = db.get_checkpoint(job) or 0
+    with db.conn_cursor() as (con, cur):
+        upto_id = cur.execute("SELECT IFNULL(MAX(id), 0) FROM mood_history").fetchone()[0]
+
+    ex = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+    rows_done = changed = skipped = 0
+    t0 = time.perf_counter()
+    try:
+        while True:
+            rows = _read_chunk(after_id, upto_id, chunk_size)
+            if not rows:
+                break
+            after_id = rows[-1]["id"]
+            known = [r for r in rows if r["energy"] is not None or assume_auto]
+            items = [(r["text_input"], r["energy"] or "Auto") for r in known]
+            if ex:
+                scored = [s for part in ex.map(_score, _split(items, workers)) for s in part]
+            else:
+                scored = _score(items)
+            updates = [(*new, r["id"]) for r, new in zip(known, scored)
+                       if new != (r["detected_mood"], r["valence"], r["arousal"])]
+            _write_chunk(updates, after_id, job, dry_run)
+
+            rows_done += len(rows)
+            skipped += len(rows) - len(known)
+            changed += len(updates)
+            if progress:
+                dt = time.perf_counter() - t0
+                progress(f"id<={after_id}/{upto_id}  rows={rows_done}  changed={changed}  skipped={skipped}  "
+                         f"{rows_done / dt if dt else 0:.0f} rows/s")
+    finally:
+        if ex:
+            ex.shutdown()
+    db.clear_checkpoint(job)  # finished: the next run starts from the beginning
+    return {"rows": rows_done, "changed": changed, "skipped": skipped, "seconds": time.perf_counter() - t0}
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--db", type=Path, default=db.DB_PATH)
+    ap.add_argument("--chunk", type=int, default=5000)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--restart", action="store_true", help="ignore the saved checkpoint")
+    ap.add_argument("--dry-run", action="store_true", help="count changes without writing them")
+    ap.add_argument("--assume-auto", action="store_true",
+                    help="rescore rows recorded before the energy setting was stored as if it was Auto")
+    args = ap.parse_args()
+
+    db.DB_PATH = args.db
+    db.init_db()
+    stats = reclassify(args.chunk, args.workers, restart=args.restart, dry_run=args.dry_run,
+                       assume_auto=args.assume_auto)
+    print(f"done: {stats['rows']} rows, {stats['changed']} changed, {stats['skipped']} skipped, "
+          f"{stats['rows'] / stats['seconds'] if stats['seconds'] else 0:.0f} rows/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# recommend.py
+"""
+Recommendation fan-out: every registered provider is queried in parallel,
+results that arrive within the latency budget are merged and de-duplicated
+by normalized (title, artist); late providers are skipped for this request.
+"""
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from db import fetch_songs_page
+from metrics import span
+from providers_spotify import search_tracks_by_mood, CALL_TIMEOUT_S
+from providers_youtube import tracks_from_db_rows, youtube_search_link
+from moodspace import nearest_songs
+from ranking import rank
+
+# past Spotify's own timeout, so a slow Spotify answers from its (stale) cache
+# instead of timing out here
+DEADLINE_S = CALL_TIMEOUT_S + 0.5
+FOR_YOU_SIZE = 10
+NEARBY_SIZE = 10
+_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="recommend")
+
+# name -> fn(mood, limit, **ctx) returning a list of track dicts, or a dict
+# {"tracks": [...], ...extra} when the provider has more to hand back (e.g. a cursor)
+PROVIDERS = OrderedDict()
+_stats = {}
+_stats_lock = threading.Lock()
+
+def register_provider(name, fn):
+    """Register (or replace) a provider; earlier providers win when tracks collide."""
+    PROVIDERS[name] = fn
+
+_NON_WORD = re.compile(r"[\W_]+")
+_FEAT = re.compile(r"\b(feat|ft|featuring|and|with|x)\b")
+
+def normalize_text(s):
+    """Casefolded words of s in any script, single-spaced."""
+    s = unicodedata.normalize("NFKC", str(s or "")).casefold()
+    return " ".join(_NON_WORD.sub(" ", s).split())
+
+def track_key(t):
+    """(title, artist) for de-duplication; joining words ("feat", "and", "x") only drop out of the artist."""
+    return normalize_text(t["title"]), " ".join(_FEAT.sub(" ", normalize_text(t["artist"])).split())
+
+def _record(name, ms, ok):
+    with _stats_lock:
+        s = _stats.setdefault(name, {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0})
+        s["calls"] += 1
+        s["errors"] += 0 if ok else 1
+        s["total_ms"] += ms
+        s["max_ms"] = max(s["max_ms"], ms)
+        s["last_ms"] = ms
+
+def provider_stats():
+    with _stats_lock:
+        return {n: dict(s, mean_ms=s["total_ms"] / s["calls"]) for n, s in _stats.items()}
+
+def _call(name, fn, mood, limit, ctx):
+    t0 = time.perf_counter()
+    try:
+        with span(f"recommend.{name}"):
+            out = fn(mood, limit, **ctx)
+    except Exception:
+        _record(name, (time.perf_counter() - t0) * 1e3, False)
+        raise
+    ms = (time.perf_counter() - t0) * 1e3
+    _record(name, ms, True)
+    return out, ms
+
+def recommend(mood, limit=50, deadline_s=DEADLINE_S, providers=None, **ctx):
+    """
+    Returns {
+        "by_provider": {name: [tracks]},  # de-duplicated across providers
+        "merged": [tracks],               # all of them, each with a "source" key
+        "extra": {name: {...}},           # non-track fields a provider returned
+        "latency_ms": {name: ms},         # providers that answered in time
+        "timed_out": [names], "errors": {name: message}, "elapsed_ms": ms,
+    }
+    """
+    providers = PROVIDERS if providers is None else providers
+    t0 = time.perf_counter()
+    futs = {_pool.submit(_call, name, fn, mood, limit, ctx): name for name, fn in providers.items()}
+    done, late = wait(futs, timeout=deadline_s)
+    for fut in late:
+        fut.cancel()  # still queued: drop it rather than let it hold a pool thread later
+
+    answered, latency, errors, extra = {}, {}, {}, {}
+    for fut in done:
+        name = futs[fut]
+        try:
+            out, latency[name] = fut.result()
+        except Exception as e:
+            errors[name] = str(e)
+            continue
+        if isinstance(out, dict):
+            extra[name] = {k: v for k, v in out.items() if k != "tracks"}
+            out = out.get("tracks", [])
+        answered[name] = out
+
+    seen, by_provider, merged = set(), {}, []
+    for name in providers:  # registration order decides which duplicate survives
+        kept = by_provider[name] = []
+        for t in answered.get(name, []):
+            key = track_key(t)
+            if all(key):  # a title or artist with no letters left matches nothing
+                if key in seen:
+                    continue
+                seen.add(key)
+            kept.append(t)
+            merged.append(dict(t, source=name))
+    return {
+        "by_provider": by_provider,
+        "merged": merged,
+        "extra": extra,
+        "latency_ms": latency,
+        "timed_out": [futs[f] for f in futs if f not in done],
+        "errors": errors,
+        "elapsed_ms": (time.perf_counter() - t0) * 1e3,
+    }
+
+# ---------- Built-in providers ----------
+def _for_you(mood, limit, user_id=None, max_per_artist=None, **_):
+    if user_id is None:
+        return []
+    return tracks_from_db_rows(rank(user_id, mood, k=min(limit, FOR_YOU_SIZE), max_per_artist=max_per_artist))
+
+def _nearby(mood, limit, vector=None, **_):
+    if vector is None:
+        return []
+    return tracks_from_db_rows(nearest_songs(vector, k=min(limit, NEARBY_SIZE)))
+
+def _library(mood, limit, cursor=None, max_per_artist=None, **_):
+    rows, next_cursor = fetch_songs_page(mood, limit=limit, cursor=cursor, max_per_artist=max_per_artist)
+    return {"tracks": tracks_from_db_rows(rows), "next_cursor": next_cursor}
+
+def _spotify(mood, limit, **_):
+    return search_tracks_by_mood(mood, limit=min(limit, 10))
+
+def _youtube(mood, limit, **_):
+    return [{"title": f"{mood} music playlist", "artist": "YouTube search",
+             "url": youtube_search_link(mood + " music playlist"), "preview_url": None}]
+
+register_provider("for_you", _for_you)
+register_provider("nearby", _nearby)
+register_provider("library", _library)
+register_provider("spotify", _spotify)
+register_provider("youtube", _youtube)
@@ -0,0 +1,64 @@
+# service.py
+"""
+The recommendation flow without any UI: detect mood, apply the energy tweak,
+record it, fetch a playlist page. Shared by appp.py and api.py.
+"""
+from db import insert_mood, new_playlist_cursor, normalize_mood, parse_playlist_cursor, MOODS
+from metrics import timed
+from mood import detect_mood, mood_vector
+# the energy tweak lives next to the detector so reclassify.py can replay it
+from mood import apply_energy, apply_energy_vector, ENERGY_LEVELS  # re-exported: service.ENERGY_LEVELS etc.
+from recommend import recommend
+
+MAX_PER_ARTIST = 3  # cap tracks per artist in one playlist page
+PAGE_SIZE = 50
+
+@timed("service.detect_user_mood")
+def detect_user_mood(user_id, text: str, energy: str = "Auto", record: bool = True):
+    """Returns (mood label, (valence, arousal)), both with the energy tweak applied."""
+    mood = apply_energy(detect_mood(text), energy)
+    vector = apply_energy_vector(mood_vector(text), energy)
+    if record:
+        insert_mood(user_id, text, mood, vector, energy)
+    return mood, vector
+
+@timed("service.playlist")
+def playlist(mood: str, cursor=None, limit: int = PAGE_SIZE, user_id=None, vector=None) -> dict:
+    """
+    One page of recommendations for `mood`; pass the returned next_cursor for more.
+    With a user_id, the "for_you" provider adds tracks ranked from their feedback;
+    with a (valence, arousal) vector, "nearby" adds the closest tracks in mood space.
+    """
+    rec = recommend(mood, limit=limit, cursor=cursor, max_per_artist=MAX_PER_ARTIST, user_id=user_id,
+                    vector=vector)
+    return {
+        "mood": mood,
+        "vector": vector,
+        "cursor": cursor,
+        "next_cursor": rec["extra"].get("library", {}).get("next_cursor"),
+        "by_provider": rec["by_provider"],
+        "tracks": rec["merged"],
+        "latency_ms": rec["latency_ms"],
+        "timed_out": rec["timed_out"],
+        "errors": rec["errors"],
+    }
+
+def recommend_for_user(user_id, text: str = "", energy: str = "Auto", mood: str = None, cursor=None,
+                       limit: int = PAGE_SIZE, vector=None) -> dict:
+    """
+    New request: detect + record the mood from `text` and start at a random page.
+    Continuation ("more like this"): pass the previous `mood`, `cursor` and `vector`.
+    """
+    if mood is None or cursor is None:
+        mood, vector = detect_user_mood(user_id, text, energy)
+        cursor = new_playlist_cursor(mood)
+    else:
+        parse_playlist_cursor(cursor)  # reject a bad cursor here, not inside the provider fan-out
+        mood = normalize_mood(mood)
+        if mood not in MOODS:
+            raise ValueError(f"unknown mood: {mood}")
+        if vector is not None:
+            vector = tuple(float(x) for x in vector)
+            if len(vector) != 2 or not all(-1.0 <= x <= 1.0 for x in vector):
+                raise ValueError("vector must be [valence, arousal], each in [-1, 1]")
+    return playlist(mood, cursor=cursor, limit=limit, user_id=user_id, vector=vector)
@@ -0,0 +1,22 @@
+# tests/conftest.py
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))  # the app's modules live at the top level, not in a package
+
+
+@pytest.fixture
+def fresh_db(tmp_path, monkeypatch):
+    """An empty, migrated database in tmp_path; the shipped app.db is never touched."""
+    import db
+
+    db.flush_writes()
+    db.close_pool()
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "app.db")
+    db.init_db()
+    yield db.DB_PATH
+    db.flush_writes()
+    db.close_pool()
@@ -0,0 +1,22 @@
+# tests/test_affinity.py
+import db
+
+
+def test_artist_key_folds_case_width_and_spacing():
+    assert db.artist_key(" BEYONCÉ ") == db.artist_key("beyoncé") == db.artist_key("Beyoncé")
+    assert db.artist_key("Straße") == db.artist_key("STRASSE")
+    assert db.artist_key("ＡＢＢＡ") == "abba"
+
+
+def test_affinity_merges_spellings_of_one_artist(fresh_db):
+    db.bulk_add_songs([("One", "Sigur Rós", "calm", None), ("Two", "SIGUR RÓS", "calm", None)])
+    with db.conn_cursor() as (con, cur):
+        ids = [r[0] for r in cur.execute("SELECT id FROM songs ORDER BY id")]
+    db.record_event(1, ids[0], "like")
+    db.record_event(1, ids[1], "play")
+    _, artists = db.get_user_affinity(1)
+    assert [(a, s) for a, s in artists] == [("sigur rós", 4.0)]
+
+    db.rebuild_scores()
+    _, rebuilt = db.get_user_affinity(1)
+    assert [tuple(r) for r in rebuilt] == [("sigur rós", 4.0)]
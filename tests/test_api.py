@@ -0,0 +1,138 @@
+# tests/test_api.py
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from starlette.requests import Request
+
+import api
+from conftest import ROOT
+
+
+def _request(path="/", headers=(), client="203.0.113.9", query=b"", body=None, method="GET"):
+    chunks = [body[i:i + 64] for i in range(0, len(body), 64)] if body else []
+
+    async def receive():
+        chunk = chunks.pop(0) if chunks else b""
+        return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+
+    return Request({
+        "type": "http", "method": method, "path": path, "query_string": query,
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers],
+        "client": (client, 50000),
+    }, receive)
+
+
+def _post(handler, payload, headers=()):
+    body = json.dumps(payload).encode()
+    return asyncio.run(handler(_request(headers=[("Content-Type", "application/json"), *headers], body=body,
+                                        method="POST")))
+
+
+# ---------- client address ----------
+def test_forwarded_for_is_ignored_from_untrusted_peers(monkeypatch):
+    monkeypatch.setattr(api, "TRUSTED_PROXIES", frozenset({"10.0.0.2"}))
+    assert api._client_ip(_request(headers=[("X-Forwarded-For", "1.2.3.4")])) == "203.0.113.9"
+
+
+def test_forwarded_for_from_a_trusted_proxy_skips_proxy_hops(monkeypatch):
+    monkeypatch.setattr(api, "TRUSTED_PROXIES", frozenset({"10.0.0.2", "10.0.0.3"}))
+    req = _request(headers=[("X-Forwarded-For", "6.6.6.6, 1.2.3.4, 10.0.0.3")], client="10.0.0.2")
+    assert api._client_ip(req) == "1.2.3.4"
+
+
+# ---------- /metrics ----------
+def _metrics(**kw):
+    return asyncio.run(api.metrics_endpoint(_request("/metrics", **kw)))
+
+
+def test_metrics_are_off_without_a_token(monkeypatch):
+    monkeypatch.setattr(api, "METRICS_TOKEN", None)
+    assert _metrics(headers=[("Authorization", "Bearer anything")]).status_code == 404
+
+
+@pytest.mark.parametrize("headers", [(), [("Authorization", "Bearer wrong")], [("Authorization", "s3cret")]])
+def test_metrics_reject_a_missing_or_wrong_token(monkeypatch, headers):
+    monkeypatch.setattr(api, "METRICS_TOKEN", "s3cret")
+    assert _metrics(headers=headers).status_code == 401
+
+
+def test_metrics_with_the_token(monkeypatch):
+    monkeypatch.setattr(api, "METRICS_TOKEN", "s3cret")
+    resp = _metrics(headers=[("Authorization", "Bearer s3cret")], query=b"format=json")
+    assert resp.status_code == 200
+    json.loads(resp.body)
+
+
+# ---------- /token ----------
+@pytest.mark.parametrize("payload", [
+    {"username": "alice", "password": 123},
+    {"username": ["alice"], "password": "pw"},
+    {"username": "alice", "password": {"a": 1}},
+    {"username": "alice", "password": ""},
+    {"username": "alice"},
+    ["alice", "pw"],
+])
+def test_token_needs_string_credentials(payload):
+    resp = _post(api.token, payload)
+    assert resp.status_code == 400
+
+
+# ---------- /songs:bulk size ----------
+@pytest.fixture
+def bearer(monkeypatch):
+    monkeypatch.setenv("API_SECRET", "test-secret")
+    monkeypatch.setattr(api, "MAX_BULK_BYTES", 200)
+    return ("Authorization", f"Bearer {api.auth.issue_token(1)}")
+
+
+def test_json_bulk_over_the_limit_is_refused_while_streaming(bearer):
+    songs = [{"title": f"Song {i}", "artist": "Band", "mood": "happy"} for i in range(20)]
+    assert _post(api.songs_bulk, songs, [bearer]).status_code == 413
+
+
+def test_json_bulk_under_the_limit_is_imported(fresh_db, bearer):
+    resp = _post(api.songs_bulk, [{"title": "Song", "artist": "Band", "mood": "happy"}], [bearer])
+    assert resp.status_code == 200 and json.loads(resp.body)["inserted"] == 1
+
+
+def test_json_bulk_declared_over_the_limit_is_refused_up_front(bearer):
+    assert _post(api.songs_bulk, [], [bearer, ("Content-Length", "5000")]).status_code == 413
+
+
+# ---------- /songs:bulk rows ----------
+def test_song_row_accepts_a_labelled_or_placed_song():
+    assert api._song_row({"title": "A", "artist": "B", "mood": "happy"}) == ("A", "B", "happy", None, None, None)
+    title, artist, mood, url, valence, arousal = api._song_row(
+        {"title": "A", "artist": "B", "url": "https://x", "valence": -0.8, "arousal": -0.5})
+    assert mood in api.db.MOODS and (valence, arousal) == (-0.8, -0.5) and url == "https://x"
+
+
+@pytest.mark.parametrize("song", [
+    "not an object",
+    {"title": 1, "artist": "B", "mood": "happy"},
+    {"title": "A", "artist": ["B"], "mood": "happy"},
+    {"title": "A", "artist": "B", "mood": 3},
+    {"title": "A", "artist": "B", "mood": "happy", "url": 5},
+    {"title": "A", "artist": "B", "valence": True, "arousal": 0.1},
+    {"title": "A", "artist": "B", "valence": "0.1", "arousal": 0.1},
+    {"title": "A", "artist": "B"},
+    {"artist": "B", "mood": "happy"},
+])
+def test_song_row_rejects_bad_fields(song):
+    with pytest.raises((KeyError, TypeError)):
+        api._song_row(song)
+
+
+# ---------- write mode ----------
+@pytest.mark.parametrize("env, mode", [(None, "sync"), ("batched", "batched")])
+def test_api_commits_history_per_insert_unless_told_otherwise(env, mode):
+    environ = {k: v for k, v in os.environ.items() if k != "DB_WRITE_MODE"}
+    if env:
+        environ["DB_WRITE_MODE"] = env
+    out = subprocess.run([sys.executable, "-c", "import api, db; print(db.WRITE_MODE)"], cwd=ROOT, env=environ,
+                         capture_output=True, text=True, check=True)
+    assert out.stdout.split()[-1] == mode
@@ -0,0 +1,48 @@
+# tests/test_archive.py
+from datetime import datetime
+
+import pytest
+
+import db
+
+archive = pytest.importorskip("archive")  # needs pyarrow
+
+NOW = datetime(2025, 6, 15)
+
+
+@pytest.fixture
+def history(fresh_db, tmp_path, monkeypatch):
+    monkeypatch.setenv("HISTORY_ARCHIVE_DIR", str(tmp_path / "archive"))
+    rows = [(1, f"text {i}", "happy" if i % 3 else "sad", f"2025-{1 + i % 5:02d}-{1 + i % 27:02d} 12:00:00")
+            for i in range(40)]
+    with db.conn_cursor() as (con, cur):
+        cur.executemany("INSERT INTO mood_history (user_id, text_input, detected_mood, created_at) VALUES (?,?,?,?)",
+                        rows)
+
+
+def _monthly(user_id=1):
+    return {(p, m): n for p, m, n in db.get_mood_rollup(user_id, "M")}
+
+
+def test_compact_keeps_rollups(history):
+    before = _monthly()
+    assert archive.compact(hot_days=60, now=NOW)["rows"] > 0
+    assert _monthly() == before
+
+
+@pytest.mark.parametrize("rebuild", [lambda: db.rebuild_mood_rollups(), lambda: db.rebuild_mood_rollups(1),
+                                     lambda: archive.rebuild_rollups()])
+def test_rebuilding_rollups_after_compact_keeps_archived_counts(history, rebuild):
+    before = _monthly()
+    moved = archive.compact(hot_days=60, now=NOW)["rows"]
+    with db.conn_cursor() as (con, cur):
+        assert cur.execute("SELECT COUNT(*) FROM mood_history").fetchone()[0] == 40 - moved
+    rebuild()
+    assert _monthly() == before
+    assert sum(before.values()) == 40
+
+
+def test_archived_rows_stay_readable(history):
+    archive.compact(hot_days=60, now=NOW)
+    assert sum(archive.mood_counts(1).values()) == 40
+    assert len(list(archive.iter_mood_history(1, limit=100))) == 40
@@ -0,0 +1,69 @@
+# tests/test_auth.py
+import time
+
+import pytest
+
+import auth
+
+
+@pytest.fixture
+def fast_auth(fresh_db, monkeypatch):
+    monkeypatch.setattr(auth, "BCRYPT_ROUNDS", 4)
+    monkeypatch.setattr(auth, "_throttle", auth.Throttle())
+    monkeypatch.setattr(auth, "_signups", auth.Throttle(max_attempts=3))
+
+
+def test_signups_have_their_own_budget(fast_auth):
+    for i in range(3):
+        assert auth.signup(f"user{i}", "pw", ip="10.0.0.1")[0]
+    ok, message = auth.signup("user3", "pw", ip="10.0.0.1")
+    assert not ok and message.startswith("Too many attempts")
+    # another address, and logins from the same one, are not affected
+    assert auth.signup("user3", "pw", ip="10.0.0.2")[0]
+    assert auth.login("user0", "pw", ip="10.0.0.1")[0]
+
+
+def test_taken_usernames_count_as_failures(fast_auth):
+    assert auth.signup("taken", "pw", ip="10.0.0.1")[0]
+    for _ in range(auth.MAX_ATTEMPTS):
+        assert auth.signup("taken", "pw", ip="10.0.0.1") == (False, "Username already exists.")
+    ok, message = auth.signup("fresh", "pw", ip="10.0.0.1")
+    assert not ok and message.startswith("Too many attempts")
+
+
+def test_login_throttles_a_username_after_failed_passwords(fast_auth):
+    assert auth.signup("alice", "right", ip="10.0.0.1")[0]
+    for _ in range(auth.MAX_ATTEMPTS):
+        assert auth.login("alice", "wrong", ip=f"10.0.1.{_}") == (False, "Invalid password.")
+    ok, message = auth.login("alice", "right", ip="10.0.2.1")
+    assert not ok and message.startswith("Too many attempts")
+
+
+def test_tokens_round_trip_and_reject_tampering(monkeypatch):
+    monkeypatch.setenv("API_SECRET", "test-secret")
+    token = auth.issue_token(42)
+    assert auth.verify_token(token) == 42
+    user, expires, sig = token.split(".")
+    assert auth.verify_token(f"43.{expires}.{sig}") is None
+    assert auth.verify_token(auth.issue_token(42, ttl=-1)) is None
+
+
+def test_throttle_forgets_expired_addresses():
+    t = auth.Throttle(window_s=0.05)
+    for i in range(1000):
+        t.fail(f"ip:10.0.{i // 256}.{i % 256}")
+    assert len(t) == 1000
+    time.sleep(0.1)
+    t.fail("ip:192.0.2.1")
+    assert len(t) == 1
+
+
+def test_throttle_keeps_at_most_max_keys():
+    t = auth.Throttle(max_attempts=2, max_keys=100)
+    for _ in range(2):
+        t.fail("user:target")
+    for i in range(99):
+        t.fail(f"ip:10.0.0.{i}")
+    assert len(t) == 100 and t.retry_after("user:target") > 0
+    t.fail("ip:10.0.1.1")
+    assert len(t) == 100 and t.retry_after("user:target") == 0  # least recently failed went first
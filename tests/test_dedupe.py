@@ -0,0 +1,49 @@
+# tests/test_dedupe.py
+import pytest
+
+import db
+from dedupe import find_duplicates, song_key
+
+
+@pytest.mark.parametrize("a, b", [
+    (("Uptown Funk", "Mark Ronson ft. Bruno Mars"), ("Uptown Funk", "Mark Ronson, Bruno Mars")),
+    (("La Vie en Rose", "Édith Piaf"), ("La vie en rose (Remastered 2011)", "Edith PIAF")),
+    (("Song (feat. Guest)", "The Band"), ("song", "Band & Guest")),
+    (("Кукла", "Сплин"), ("КУКЛА", "сплин")),
+    (("ＡＢＣ", "ＡＢＢＡ"), ("ABC", "abba")),
+])
+def test_spellings_of_one_track_share_a_key(a, b):
+    assert song_key(*a) == song_key(*b) is not None
+
+
+@pytest.mark.parametrize("a, b", [
+    (("봄날", "방탄소년단"), ("Кукла", "Сплин")),
+    (("봄날", "방탄소년단"), ("피 땀 눈물", "방탄소년단")),
+    (("Мой", "Сплин"), ("Мои", "Сплин")),
+    (("Αγάπη", "Χ"), ("Ελπίδα", "Χ")),
+    (("Me and You", "Band"), ("Me You", "Band")),
+])
+def test_different_tracks_keep_different_keys(a, b):
+    assert song_key(*a) != song_key(*b)
+
+
+def test_no_key_without_letters_or_digits():
+    assert song_key("!!!", "Band") is None
+    assert song_key("Song", " & ") is None
+
+
+def test_non_latin_songs_are_not_grouped(fresh_db):
+    db.bulk_add_songs([
+        ("봄날", "방탄소년단", "sad", None),
+        ("피 땀 눈물", "방탄소년단", "sad", None),
+        ("Кукла", "Сплин", "sad", None),
+        ("Αγάπη", "Χ", "sad", None),
+        ("!!!", "???", "sad", None),
+        ("...", "???", "sad", None),
+        ("La Vie en Rose", "Édith Piaf", "sad", None),
+        ("La vie en rose - Remastered", "Edith Piaf", "sad", None),
+        ("Кукла (Live)", "СПЛИН", "sad", None),
+    ])
+    groups = find_duplicates()
+    assert sorted(sorted(r["title"] for r in g) for g in groups) == [
+        ["La Vie en Rose", "La vie en rose - Remastered"], ["Кукла", "Кукла (Live)"]]
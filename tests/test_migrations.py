@@ -0,0 +1,31 @@
+# tests/test_migrations.py
+import shutil
+import sqlite3
+
+import db
+from conftest import ROOT
+
+
+def test_migrations_upgrade_the_shipped_database(tmp_path, monkeypatch):
+    shutil.copy(ROOT / "app.db", tmp_path / "app.db")
+    before = sqlite3.connect(tmp_path / "app.db")
+    counts = {t: before.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+              for t in ("users", "songs", "mood_history")}
+    before.close()
+
+    db.close_pool()
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "app.db")
+    try:
+        db.init_db()
+        assert db.schema_version() == db.SCHEMA_VERSION
+        db.init_db()  # a second run is a no-op
+        assert db.schema_version() == db.SCHEMA_VERSION
+        with db.conn_cursor() as (con, cur):
+            for table, n in counts.items():
+                assert cur.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == n
+            # the rollup backfill covers every history row
+            rolled = cur.execute("SELECT SUM(n) FROM mood_rollups WHERE granularity='W'").fetchone()[0]
+            assert rolled == counts["mood_history"]
+            assert cur.execute("SELECT COUNT(*) FROM songs_fts").fetchone()[0] == counts["songs"]
+    finally:
+        db.close_pool()
@@ -0,0 +1,38 @@
+# tests/test_mood.py
+import mood
+
+TEXTS = [
+    "I feel amazing, let's dance all night!",
+    "so tired, I just want to sleep",
+    "This is the worst day of my life.",
+    "meh",
+    "",
+    "   ",
+    None,
+    "Great workout at the gym today",
+    "I feel amazing, let's dance all night!",
+    "I FEEL AMAZING, LET'S DANCE ALL NIGHT!",
+]
+
+
+def test_detect_moods_matches_detect_mood():
+    mood.clear_cache()
+    assert mood.detect_moods(TEXTS) == [mood.detect_mood(t) for t in TEXTS]
+
+
+def test_detect_moods_on_a_process_pool_matches_detect_mood(monkeypatch):
+    monkeypatch.setattr(mood, "PARALLEL_MIN_BATCH", 2)
+    texts = [t for t in TEXTS if t] + [f"day {i} was good" for i in range(20)]
+    assert mood.detect_moods(texts, processes=2, chunksize=4) == [mood.detect_mood(t) for t in texts]
+
+
+def test_blank_input_is_neutral():
+    assert mood.detect_moods(["", "  ", None]) == ["neutral"] * 3
+
+
+
+def test_vector_valence_follows_the_label():
+    valence, _ = mood.mood_vector("This is the worst day of my life.")
+    assert mood.detect_mood("This is the worst day of my life.") == "sad" and valence < 0
+    valence, arousal = mood.mood_vector("I feel amazing, let's dance all night!")
+    assert valence > 0 and -1 <= arousal <= 1
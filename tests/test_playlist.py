@@ -0,0 +1,50 @@
+# tests/test_playlist.py
+import pytest
+
+import db
+
+
+def test_pages_with_an_artist_cap_reach_every_song(fresh_db):
+    rows = [(f"Track {i}", "Prolific", "happy", None) for i in range(50)]
+    rows += [(f"Other {i}", f"Artist {i}", "happy", None) for i in range(5)]
+    db.bulk_add_songs(rows)
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        page, cursor = db.fetch_songs_page("happy", limit=5, cursor=cursor, max_per_artist=2)
+        assert page or cursor is None
+        assert sum(r["artist"] == "Prolific" for r in page) <= 2
+        seen += [r["id"] for r in page]
+        pages += 1
+        if cursor is None:
+            break
+        assert pages < 100
+    assert len(seen) == len(set(seen)) == 55
+
+
+def test_pages_wrap_around_from_a_random_start(fresh_db):
+    db.bulk_add_songs([(f"Track {i}", f"Artist {i}", "calm", None) for i in range(30)])
+    cursor = db.new_playlist_cursor("calm")
+    seen = []
+    while cursor is not None:
+        page, cursor = db.fetch_songs_page("calm", limit=7, cursor=cursor)
+        seen += [r["id"] for r in page]
+    assert len(seen) == len(set(seen)) == 30
+
+
+def test_sample_respects_the_artist_cap(fresh_db):
+    db.bulk_add_songs([(f"Track {i}", f"Artist {i % 3}", "sad", None) for i in range(30)])
+    rows = db.sample_songs_by_mood("sad", k=10, max_per_artist=2)
+    assert len(rows) == 6
+    assert len({r["id"] for r in rows}) == 6
+
+
+@pytest.mark.parametrize("cursor, parsed", [("12", (12, None)), ("12:40", (12, 40)), (7, (7, None))])
+def test_parse_playlist_cursor(cursor, parsed):
+    assert db.parse_playlist_cursor(cursor) == parsed
+
+
+@pytest.mark.parametrize("cursor", ["", "abc", "1:", ":2", "1:2:3", "-1", True, 1.5, None, ["1"]])
+def test_parse_playlist_cursor_rejects_garbage(cursor):
+    with pytest.raises(ValueError):
+        db.parse_playlist_cursor(cursor)
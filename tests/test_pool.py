@@ -0,0 +1,59 @@
+# tests/test_pool.py
+import sqlite3
+import threading
+
+import pytest
+
+import db
+
+
+def test_connections_are_wal_and_reused(tmp_path):
+    pool = db.ConnectionPool(tmp_path / "p.db", size=2)
+    with pool.connection() as con:
+        assert con.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    with pool.connection() as again:
+        assert again is con
+    pool.close()
+
+
+def test_nested_calls_share_the_held_connection(tmp_path):
+    pool = db.ConnectionPool(tmp_path / "p.db", size=1)
+    with pool.connection() as outer, pool.connection() as inner:
+        assert inner is outer
+    pool.close()
+
+
+def test_an_exception_rolls_back(tmp_path):
+    pool = db.ConnectionPool(tmp_path / "p.db", size=1)
+    with pool.connection() as con:
+        con.execute("CREATE TABLE t (x INTEGER)")
+    with pytest.raises(RuntimeError):
+        with pool.connection() as con:
+            con.execute("INSERT INTO t VALUES (1)")
+            raise RuntimeError
+    with pool.connection() as con:
+        assert con.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    pool.close()
+
+
+def test_an_exhausted_pool_raises_operational_error(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "BUSY_TIMEOUT_S", 0.1)
+    pool = db.ConnectionPool(tmp_path / "p.db", size=1)
+    held, release = threading.Event(), threading.Event()
+
+    def hold():
+        with pool.connection():
+            held.set()
+            release.wait(5)
+
+    t = threading.Thread(target=hold)
+    t.start()
+    held.wait(5)
+    try:
+        with pytest.raises(sqlite3.OperationalError, match="exhausted"):
+            with pool.connection():
+                pass
+    finally:
+        release.set()
+        t.join()
+    pool.close()
@@ -0,0 +1,60 @@
+# tests/test_reclassify.py
+import pytest
+
+import db
+import mood
+import service
+from reclassify import reclassify
+
+INPUTS = [
+    ("I feel amazing today", "Relax"),        # happy -> neutral
+    ("let's dance, best party ever", "Relax"),  # energetic -> calm
+    ("meh, nothing much", "Hype"),            # neutral -> energetic
+    ("time to chill and relax", "Hype"),       # calm -> energetic
+    ("worst day of my life", "Moderate"),
+    ("just another day", "Auto"),
+]
+
+
+@pytest.fixture
+def history(fresh_db, monkeypatch):
+    monkeypatch.setattr(db, "WRITE_MODE", "sync")
+    for text, energy in INPUTS:
+        service.detect_user_mood(1, text, energy)
+
+
+def _rows():
+    with db.conn_cursor() as (con, cur):
+        return [tuple(r) for r in cur.execute(
+            "SELECT detected_mood, valence, arousal, energy FROM mood_history ORDER BY id")]
+
+
+def test_unchanged_rules_change_nothing(history):
+    before = _rows()
+    assert {m for m, *_ in before} >= {"neutral", "calm", "energetic"}
+    stats = reclassify(progress=None)
+    assert (stats["rows"], stats["changed"], stats["skipped"]) == (len(INPUTS), 0, 0)
+    assert _rows() == before
+
+
+def test_changed_rules_keep_the_energy_setting(history):
+    calm = mood.KEY_CALM
+    mood.KEY_CALM = calm | {"nothing"}
+    mood.clear_cache()
+    try:
+        stats = reclassify(progress=None)
+    finally:
+        mood.KEY_CALM = calm
+        mood.clear_cache()
+    assert stats["changed"] == 1
+    # "meh, nothing much" is calm now, and Hype still turns calm into energetic
+    assert _rows()[2][0] == "energetic"
+
+
+def test_rows_without_an_energy_setting_are_skipped(history):
+    with db.conn_cursor() as (con, cur):
+        cur.execute("UPDATE mood_history SET energy=NULL WHERE id IN (1, 2)")
+    stats = reclassify(progress=None)
+    assert (stats["changed"], stats["skipped"]) == (0, 2)
+    stats = reclassify(progress=None, assume_auto=True)
+    assert stats["changed"] == 2 and stats["skipped"] == 0
@@ -0,0 +1,96 @@
+# tests/test_recommend.py
+import threading
+import time
+
+import providers_spotify
+import recommend as fanout
+from recommend import recommend
+
+
+def _tracks(*pairs):
+    return [{"title": t, "artist": a, "url": None, "preview_url": None} for t, a in pairs]
+
+
+def test_merges_in_registration_order_and_dedupes():
+    providers = {
+        "first": lambda mood, limit, **_: _tracks(("Song A", "Band"), ("Song B", "Band")),
+        "second": lambda mood, limit, **_: _tracks(("song a", "BAND"), ("Song C", "Other")),
+    }
+    out = recommend("happy", providers=providers, deadline_s=5)
+    assert [t["title"] for t in out["by_provider"]["first"]] == ["Song A", "Song B"]
+    assert [t["title"] for t in out["by_provider"]["second"]] == ["Song C"]
+    assert [(t["title"], t["source"]) for t in out["merged"]] == [
+        ("Song A", "first"), ("Song B", "first"), ("Song C", "second")]
+    assert out["timed_out"] == [] and out["errors"] == {}
+    assert set(out["latency_ms"]) == {"first", "second"}
+
+
+def test_passes_context_and_keeps_extra_fields():
+    seen = {}
+
+    def paged(mood, limit, cursor=None, **_):
+        seen.update(mood=mood, limit=limit, cursor=cursor)
+        return {"tracks": _tracks(("Song A", "Band")), "next_cursor": "7:9"}
+
+    out = recommend("calm", limit=3, providers={"paged": paged}, cursor="1:2")
+    assert seen == {"mood": "calm", "limit": 3, "cursor": "1:2"}
+    assert out["extra"] == {"paged": {"next_cursor": "7:9"}}
+    assert [t["title"] for t in out["merged"]] == ["Song A"]
+
+
+def test_slow_provider_times_out_without_holding_the_request():
+    def slow(mood, limit, **_):
+        time.sleep(1.0)
+        return _tracks(("Late", "Band"))
+
+    providers = {"fast": lambda mood, limit, **_: _tracks(("Quick", "Band")), "slow": slow}
+    t0 = time.perf_counter()
+    out = recommend("sad", providers=providers, deadline_s=0.2)
+    assert time.perf_counter() - t0 < 0.8
+    assert out["timed_out"] == ["slow"]
+    assert out["by_provider"]["slow"] == []
+    assert [t["title"] for t in out["merged"]] == ["Quick"]
+    assert "slow" not in out["latency_ms"]
+
+
+def test_failing_provider_is_reported_not_raised():
+    def broken(mood, limit, **_):
+        raise RuntimeError("quota exceeded")
+
+    providers = {"broken": broken, "ok": lambda mood, limit, **_: _tracks(("Fine", "Band"))}
+    out = recommend("neutral", providers=providers, deadline_s=5)
+    assert out["errors"] == {"broken": "quota exceeded"}
+    assert [t["title"] for t in out["merged"]] == ["Fine"]
+
+
+def test_non_latin_and_accented_tracks_are_not_merged():
+    providers = {
+        "first": lambda mood, limit, **_: _tracks(("봄날", "방탄소년단"), ("Me and You", "Band"), ("?!", "")),
+        "second": lambda mood, limit, **_: _tracks(("Кукла", "Сплин"), ("Me You", "Band"), ("...", "")),
+        "third": lambda mood, limit, **_: _tracks(("La Vie en Rose", "Édith Piaf"), ("la vie en rose", "dith piaf"),
+                                                  ("КУКЛА", "сплин"), ("Song", "Ａｒｔｉｓｔ x Guest")),
+        "fourth": lambda mood, limit, **_: _tracks(("song", "artist feat. guest")),
+    }
+    out = recommend("sad", providers=providers, deadline_s=5)
+    assert [t["title"] for t in out["merged"]] == [
+        "봄날", "Me and You", "?!", "Кукла", "Me You", "...", "La Vie en Rose", "la vie en rose", "Song"]
+
+
+def test_spotify_gives_up_before_the_fan_out_does():
+    assert providers_spotify.CALL_TIMEOUT_S < fanout.DEADLINE_S
+
+
+def test_queued_providers_are_cancelled_at_the_deadline():
+    ran, lock = [], threading.Lock()
+
+    def slow(mood, limit, **_):
+        with lock:
+            ran.append(1)
+        time.sleep(0.5)
+        return []
+
+    n = fanout._pool._max_workers + 4
+    out = recommend("calm", providers={f"p{i}": slow for i in range(n)}, deadline_s=0.1)
+    assert len(out["timed_out"]) == n
+    time.sleep(0.6)  # the running ones finish; the cancelled ones never start
+    assert len(ran) <= fanout._pool._max_workers
@@ -0,0 +1,19 @@
+# tests/test_rollups.py
+import db
+
+
+def test_rollups_version_changes_when_rollups_are_rewritten(fresh_db, monkeypatch):
+    monkeypatch.setattr(db, "WRITE_MODE", "sync")
+    db.insert_mood(1, "great day", "happy")
+    v0 = db.rollups_version()
+    db.insert_mood(1, "another", "happy")  # appended, not rewritten
+    assert db.rollups_version() == v0
+
+    with db.conn_cursor() as (con, cur):
+        cur.execute("UPDATE mood_history SET detected_mood='sad' WHERE id=1")
+    v1 = db.rollups_version()
+    assert v1 > v0
+    assert {(m, n) for _, m, n in db.get_mood_rollup(1)} == {("happy", 1), ("sad", 1)}
+
+    db.rebuild_mood_rollups()
+    assert db.rollups_version() > v1
@@ -0,0 +1,43 @@
+# tests/test_voice.py
+import io
+import os
+import shutil
+import wave
+
+import pytest
+
+import voice
+
+needs_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not on PATH")
+
+
+def _seconds(pcm):
+    return len(pcm) / (voice.SAMPLE_RATE * voice.SAMPLE_WIDTH)
+
+
+def test_matching_wav_is_read_without_ffmpeg():
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(voice.SAMPLE_WIDTH)
+        w.setframerate(voice.SAMPLE_RATE)
+        w.writeframes(b"\0\0" * voice.SAMPLE_RATE * 3)
+    assert _seconds(voice.decode_to_pcm(buf.getvalue())) == 3
+
+
+def test_mp4_family_containers_need_a_seekable_input():
+    assert voice._needs_seek(b"\0\0\0\x20ftypM4A ")
+    assert voice._needs_seek(b"\0\0\0\x08wide\0\0\0\0mdat")
+    assert not voice._needs_seek(b"ID3\x04\0\0\0\0\0\0")
+    assert not voice._needs_seek(b"RIFF\0\0\0\0WAVE")
+
+
+@needs_ffmpeg
+@pytest.mark.parametrize("fmt", ["m4a", "mp3"])
+@pytest.mark.parametrize("memfd", [True, False])
+def test_a_10s_clip_decodes_to_10s_of_pcm(tmp_path, monkeypatch, fmt, memfd):
+    from benchmarks.bench_voice_decode import _make_clip
+    if not memfd:
+        monkeypatch.delattr(os, "memfd_create", raising=False)
+    clip = _make_clip(tmp_path / "clip", 10, fmt).read_bytes()
+    assert _seconds(voice.decode_to_pcm(clip)) == pytest.approx(10, abs=0.1)
@@ -0,0 +1,71 @@
+# tests/test_write_behind.py
+import sqlite3
+import threading
+
+import pytest
+
+import db
+
+
+@pytest.fixture
+def history_writer(fresh_db):
+    w = db.WriteBehind("INSERT INTO mood_history (user_id, text_input, detected_mood) VALUES (?,?,?)",
+                       interval_ms=10_000)
+    yield w
+    w.close()
+
+
+def _history_count():
+    with db.conn_cursor() as (con, cur):
+        return cur.execute("SELECT COUNT(*) FROM mood_history").fetchone()[0]
+
+
+def test_write_behind_flush_commits_without_waiting_for_the_interval(history_writer):
+    for i in range(25):
+        history_writer.put((1, f"text {i}", "happy"))
+    history_writer.flush(timeout=5)
+    assert history_writer.pending() == 0
+    assert _history_count() == 25
+    assert history_writer.stats["rows"] == 25 and history_writer.stats["failed"] == 0
+
+
+def test_write_behind_close_drains_the_queue_and_later_puts_write_through(history_writer):
+    for i in range(10):
+        history_writer.put((1, f"text {i}", "calm"))
+    history_writer.close()
+    assert _history_count() == 10
+    history_writer.put((1, "after close", "calm"))
+    assert _history_count() == 11
+    history_writer.flush()  # nothing queued: returns at once
+
+
+def test_write_behind_counts_bad_rows_and_keeps_going(history_writer):
+    history_writer.put((1, "ok", "sad"))
+    history_writer.put((1, "too few columns"))
+    history_writer.put((1, "ok again", "sad"))
+    history_writer.flush(timeout=5)
+    assert _history_count() == 2
+    assert history_writer.stats["failed"] == 1
+    assert history_writer._thread.is_alive()
+
+
+def test_write_behind_restarts_a_dead_thread(history_writer):
+    history_writer.put((1, "first", "happy"))
+    history_writer.flush(timeout=5)
+    history_writer._q.put(db._STOP)  # stop the thread behind the writer's back
+    history_writer._thread.join(timeout=5)
+    history_writer.put((1, "second", "happy"))
+    history_writer.flush(timeout=5)
+    assert _history_count() == 2
+
+
+def test_write_behind_flush_times_out_instead_of_hanging(history_writer, monkeypatch):
+    release = threading.Event()
+    write = history_writer._write
+    monkeypatch.setattr(history_writer, "_write", lambda rows: (release.wait(5), write(rows)))
+    history_writer.put((1, "slow", "happy"))
+    with pytest.raises(sqlite3.OperationalError, match="timed out"):
+        history_writer.flush(timeout=0.2)
+    release.set()
+    history_writer.flush(timeout=5)
+    assert _history_count() == 1
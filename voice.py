@@ -1,35 +1,196 @@
 # voice  .py
-import speech_recognition as sr
-from pydub import AudioSegment
-from pathlib import Path
+import hashlib
+import io
+import os
+import shutil
+import subprocess
 import tempfile
+import threading
+import time
+import wave
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
-def transcribe_audio(file_bytes: bytes, filename: str) -> str:
+from metrics import timed
+
+MAX_CONCURRENT = 2        # transcriptions running at once (each holds ffmpeg + a network call)
+JOB_CACHE_SIZE = 256      # finished jobs remembered by content hash
+RETRY_EMPTY_AFTER_S = 30  # an empty/failed result may be retried after this long
+
+SAMPLE_RATE = 16000       # recognizers expect 16 kHz mono 16-bit PCM
+SAMPLE_WIDTH = 2
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+MAX_CLIP_S = 120          # longer clips are truncated
+CHUNK_S = 30              # recognized piecewise; Google's free endpoint rejects long requests
+DECODE_TIMEOUT_S = 30
+
+# Speech backends: fn(recognizer, audio_data) -> transcript. "sphinx" works offline
+# (needs pocketsphinx); tests can register a stub.
+BACKENDS = {
+    "google": lambda r, audio: r.recognize_google(audio),
+    "sphinx": lambda r, audio: r.recognize_sphinx(audio),
+}
+DEFAULT_BACKEND = os.getenv("VOICE_BACKEND", "google")
+
+def _resolve(backend):
+    if backend is None:
+        backend = DEFAULT_BACKEND
+    return BACKENDS[backend] if isinstance(backend, str) else backend
+
+def _wav_pcm(file_bytes: bytes):
+    """PCM frames of a WAV that is already 16 kHz mono 16-bit, else None."""
+    try:
+        with wave.open(io.BytesIO(file_bytes)) as w:
+            if (w.getframerate(), w.getnchannels(), w.getsampwidth()) != (SAMPLE_RATE, 1, SAMPLE_WIDTH):
+                return None
+            return w.readframes(min(w.getnframes(), MAX_CLIP_S * SAMPLE_RATE))
+    except (wave.Error, EOFError):
+        return None
+
+# top-level atoms an MP4-family file (mp4/m4a/mov/3gp) can start with
+_MP4_ATOMS = {b"ftyp", b"moov", b"mdat", b"wide", b"free", b"skip"}
+
+def _needs_seek(file_bytes: bytes) -> bool:
+    """
+    MP4-family input: ffmpeg can only read it from a pipe when the moov atom
+    comes before mdat, which ffmpeg's own output and many recorders do not do.
+    """
+    return file_bytes[4:8] in _MP4_ATOMS
+
+@contextmanager
+def _seekable(file_bytes: bytes):
+    """(ffmpeg input path, fds to pass) for a seekable copy: a memfd on Linux, else a temp file."""
+    if hasattr(os, "memfd_create"):
+        fd = os.memfd_create("voice-upload")
+        try:
+            with open(fd, "wb", closefd=False) as f:
+                f.write(file_bytes)
+            yield f"/dev/fd/{fd}", (fd,)
+        finally:
+            os.close(fd)
+        return
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "upload")
+        with open(path, "wb") as f:
+            f.write(file_bytes)
+        yield path, ()
+
+def decode_to_pcm(file_bytes: bytes) -> bytes:
+    """
+    Upload bytes -> 16 kHz mono s16le PCM: matching WAVs are read directly,
+    anything else goes through ffmpeg, piped in (stdin -> stdout) or, for
+    MP4-family containers, from a seekable in-memory file (see _needs_seek).
+    Output is capped at MAX_CLIP_S seconds.
+    """
+    if len(file_bytes) > MAX_UPLOAD_BYTES:
+        raise ValueError(f"audio upload larger than {MAX_UPLOAD_BYTES} bytes")
+    pcm = _wav_pcm(file_bytes)
+    if pcm is not None:
+        return pcm
+
+    def ffmpeg(src, stdin=None, pass_fds=()):
+        cmd = [shutil.which("ffmpeg") or "ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error", "-i", src,
+               "-t", str(MAX_CLIP_S), "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(SAMPLE_RATE),
+               "pipe:1"]
+        return subprocess.run(cmd, input=stdin, capture_output=True, timeout=DECODE_TIMEOUT_S, check=True,
+                              pass_fds=pass_fds).stdout
+
+    if _needs_seek(file_bytes):
+        with _seekable(file_bytes) as (src, fds):
+            return ffmpeg(src, pass_fds=fds)
+    return ffmpeg("pipe:0", stdin=file_bytes)
+
+def _chunks(pcm: bytes):
+    import speech_recognition as sr  # deferred: only paid once someone uploads audio
+    step = CHUNK_S * SAMPLE_RATE * SAMPLE_WIDTH
+    for i in range(0, len(pcm), step):
+        yield sr.AudioData(pcm[i:i + step], SAMPLE_RATE, SAMPLE_WIDTH)
+
+@timed("voice.transcribe")
+def transcribe_audio(file_bytes: bytes, filename: str, backend=None) -> str:
     """
-    Accepts uploaded audio (mp3/wav/m4a). Uses Google Web Speech (no key needed).
+    Accepts uploaded audio (mp3/wav/m4a). Uses Google Web Speech (no key needed)
+    unless another backend name/callable is given. Long clips are recognized in
+    CHUNK_S pieces and joined.
     Returns transcript string or '' on failure.
     """
     try:
-        suffix = Path(filename).suffix.lower()
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_in:
-            tmp_in.write(file_bytes)
-            tmp_in.flush()
-            tmp_in_path = Path(tmp_in.name)
-
-        # Convert to wav if needed (SpeechRecognition prefers wav)
-        wav_path = tmp_in_path
-        if suffix != ".wav":
-            audio = AudioSegment.from_file(tmp_in_path)
-            wav_path = tmp_in_path.with_suffix(".wav")
-            audio.export(wav_path, format="wav")
-
+        import speech_recognition as sr
+        recognize = _resolve(backend)
+        pcm = decode_to_pcm(file_bytes)
         r = sr.Recognizer()
-        with sr.AudioFile(str(wav_path)) as source:
-            audio_data = r.record(source)
-        try:
-            text = r.recognize_google(audio_data)
-            return text
-        except Exception:
-            return ""
+        parts = []
+        for audio_data in _chunks(pcm):
+            try:
+                text = recognize(r, audio_data)
+            except sr.UnknownValueError:  # silence / unintelligible chunk
+                continue
+            if text:
+                parts.append(text)
+        return " ".join(parts)
     except Exception:
         return ""
+
+class TranscriptionQueue:
+    """
+    Background transcription worker pool. Jobs are keyed by the SHA-256 of the
+    upload, so resubmitting identical audio returns the running or finished job
+    instead of transcribing it again. The UI submits, then polls get().
+    """
+
+    def __init__(self, workers=MAX_CONCURRENT, size=JOB_CACHE_SIZE, backend=None):
+        self.size = size
+        self.backend = backend
+        self._jobs = OrderedDict()  # job_id -> {"status", "text", "submitted", "finished"}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transcribe")
+
+    def submit(self, file_bytes: bytes, filename: str) -> str:
+        job_id = hashlib.sha256(file_bytes).hexdigest()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                self._jobs.move_to_end(job_id)
+                stale_empty = (job["status"] in ("done", "failed") and not job["text"]
+                               and time.time() - job["finished"] > RETRY_EMPTY_AFTER_S)
+                if not stale_empty:
+                    return job_id
+            self._jobs[job_id] = {"status": "pending", "text": "", "submitted": time.time(), "finished": None}
+            self._evict()
+        self._pool.submit(self._run, job_id, file_bytes, filename)
+        return job_id
+
+    def _evict(self):
+        for old in list(self._jobs):
+            if len(self._jobs) <= self.size:
+                break
+            if self._jobs[old]["status"] in ("done", "failed"):
+                del self._jobs[old]
+
+    def _set(self, job_id, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def _run(self, job_id, file_bytes, filename):
+        self._set(job_id, status="running")
+        try:
+            text = transcribe_audio(file_bytes, filename, backend=self.backend)
+            self._set(job_id, status="done", text=text, finished=time.time())
+        except Exception:
+            self._set(job_id, status="failed", finished=time.time())
+
+    def get(self, job_id: str):
+        """Copy of the job dict, or None if unknown/evicted."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+_queue = TranscriptionQueue()
+
+def submit_transcription(file_bytes: bytes, filename: str) -> str:
+    return _queue.submit(file_bytes, filename)
+
+def get_transcription(job_id: str):
+    return _queue.get(job_id)